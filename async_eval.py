@@ -0,0 +1,205 @@
+import os
+import tempfile
+import multiprocessing as mp
+from functools import partial
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from experiments import evaluate
+
+WEIGHTS = b'w' # (명령, 타임스텝, state_dict) 평가 요청
+CLOSE = b'c'
+
+
+# 평가 프로세스: 정책을 한 번 만들어 두고, 가중치를 받을 때마다 자기 VecEnv에서 평가해 결과를 돌려줌
+# env_class가 있으면 env_class(**env_kwargs) n_envs개의 DummyVecEnv (환경 i는 seed(seed + i)), 없으면 VideoStreamingVecEnv
+def _eval_worker(conn, policy_class, policy_path, env_class, env_kwargs, n_envs, n_eval_episodes, deterministic, seed, best_path):
+    import torch
+
+    torch.set_num_threads(1)
+    policy = policy_class.load(policy_path, device='cpu')
+    policy.set_training_mode(False)
+    if env_class is not None:
+        from stable_baselines3.common.vec_env import DummyVecEnv
+        env = DummyVecEnv([partial(env_class, **env_kwargs)] * n_envs)
+    else:
+        from streaming_vec_env import VideoStreamingVecEnv
+        env = VideoStreamingVecEnv(n_envs, seed=seed, **env_kwargs)
+    best_mean_reward = -np.inf
+
+    try:
+        while True:
+            command, timesteps, state = conn.recv()
+            if command == CLOSE:
+                break
+
+            policy.load_state_dict({name: torch.as_tensor(value) for name, value in state.items()})
+            # 모든 평가를 같은 에피소드들로 비교
+            if env_class is not None:
+                for i, sub_env in enumerate(env.envs):
+                    sub_env.seed(None if seed is None else seed + i)
+            else:
+                env.seed(seed)
+            returns, lengths = evaluate(policy, env, n_eval_episodes, deterministic)
+            mean_reward = float(np.mean(returns))
+
+            new_best = mean_reward > best_mean_reward
+            if new_best:
+                best_mean_reward = mean_reward
+                if best_path is not None:
+                    policy.save(os.path.join(best_path, 'best_policy.pth'))
+            conn.send((timesteps, returns, lengths, new_best))
+    finally:
+        env.close()
+        conn.close()
+
+
+class AsyncEvalCallback(BaseCallback):
+    # EvalCallback 대신 별도 프로세스에서 정책을 평가하는 콜백
+    # eval_freq번 호출마다 정책 가중치 스냅샷을 보내고 결과는 다음 호출들에서 확인만 하므로 model.learn이 멈추지 않음
+    # 평가 프로세스가 아직 이전 스냅샷을 평가 중이면 새 스냅샷은 대기시키고 가장 최근 것만 보냄
+    # 가장 좋은 평가 결과의 정책은 best_model_save_path/best_policy.pth (정책 클래스의 load로 읽음)에 저장하고,
+    # 기록은 log_path/evaluations.npz (EvalCallback과 같은 timesteps/results/ep_lengths)에 남김
+    # 평가 환경은 학습 환경과 같아야 하므로 학습에 쓰는 환경 클래스(또는 환경을 만드는 모듈 수준 함수)를 env_class로 넘김
+    # (평가 프로세스로 pickle해서 보내므로 람다는 안 됨), 없으면 VideoStreamingVecEnv(n_envs, **env_kwargs)
+    # env_class의 환경은 자기 난수를 다시 시드하는 seed(seed)가 있어야 함 (평가마다 같은 에피소드로 비교하도록)
+    def __init__(self, env_class=None, env_kwargs=None, eval_freq=10000, n_eval_episodes=10, n_envs=4, deterministic=True,
+                 best_model_save_path=None, log_path=None, callback_on_new_best=None, seed=0,
+                 wait_on_end=True, start_method=None, verbose=1):
+        super(AsyncEvalCallback, self).__init__(verbose)
+        self.env_class = env_class
+        self.env_kwargs = env_kwargs or {}
+        self.eval_freq = eval_freq
+        self.n_eval_episodes = n_eval_episodes
+        self.n_envs = n_envs
+        self.deterministic = deterministic
+        self.best_model_save_path = best_model_save_path
+        self.log_path = log_path
+        self.callback_on_new_best = callback_on_new_best
+        self.seed = seed
+        self.wait_on_end = wait_on_end
+        self.start_method = start_method
+
+        self.best_mean_reward = -np.inf
+        self.best_timesteps = None
+        self.last_mean_reward = -np.inf
+        self.evaluations_timesteps = []
+        self.evaluations_results = []
+        self.evaluations_length = []
+
+        self.process = None
+        self.conn = None
+        self.busy = False
+        self.queued = None # 평가 프로세스가 바쁠 때 대기 중인 (타임스텝, state_dict)
+        self.sent_timesteps = None # 마지막으로 보낸 스냅샷의 타임스텝
+
+    def _init_callback(self):
+        for path in (self.best_model_save_path, self.log_path):
+            if path is not None:
+                os.makedirs(path, exist_ok=True)
+        if self.callback_on_new_best is not None:
+            # StopTrainingOnRewardThreshold 등은 parent.best_mean_reward를 읽음
+            self.callback_on_new_best.parent = self
+            self.callback_on_new_best.init_callback(self.model)
+
+        # 정책 구조는 한 번만 파일로 넘기고, 이후에는 가중치만 보냄
+        fd, self.policy_path = tempfile.mkstemp(suffix='.pth')
+        os.close(fd)
+        self.model.policy.save(self.policy_path)
+
+        if self.start_method is not None:
+            ctx = mp.get_context(self.start_method)
+        else:
+            ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_eval_worker, daemon=True,
+                                   args=(child, type(self.model.policy), self.policy_path, self.env_class, self.env_kwargs, self.n_envs,
+                                         self.n_eval_episodes, self.deterministic, self.seed, self.best_model_save_path))
+        self.process.start()
+        child.close()
+
+    def _snapshot(self):
+        return {name: value.detach().cpu().numpy() for name, value in self.model.policy.state_dict().items()}
+
+    def _send(self, timesteps, state):
+        self.conn.send((WEIGHTS, timesteps, state))
+        self.busy = True
+        self.sent_timesteps = timesteps
+
+    def _on_step(self):
+        continue_training = self._poll()
+
+        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
+            if self.busy:
+                self.queued = (self.num_timesteps, self._snapshot())
+            else:
+                self._send(self.num_timesteps, self._snapshot())
+
+        return continue_training
+
+    # 도착한 평가 결과 처리 (block이면 결과가 올 때까지 기다림)
+    def _poll(self, block=False):
+        continue_training = True
+        while self.busy and (block or self.conn.poll()):
+            timesteps, returns, lengths, new_best = self.conn.recv()
+            self.busy = False
+            continue_training = self._on_result(timesteps, returns, lengths, new_best) and continue_training
+
+            if self.queued is not None:
+                self._send(*self.queued)
+                self.queued = None
+            elif block:
+                break
+        return continue_training
+
+    def _on_result(self, timesteps, returns, lengths, new_best):
+        mean_reward, std_reward = float(np.mean(returns)), float(np.std(returns))
+        self.last_mean_reward = mean_reward
+        self.evaluations_timesteps.append(timesteps)
+        self.evaluations_results.append(returns)
+        self.evaluations_length.append(lengths)
+        if self.log_path is not None:
+            np.savez(os.path.join(self.log_path, 'evaluations'), timesteps=self.evaluations_timesteps,
+                     results=self.evaluations_results, ep_lengths=self.evaluations_length)
+
+        self.logger.record('eval/mean_reward', mean_reward)
+        self.logger.record('eval/mean_ep_length', float(np.mean(lengths)))
+        self.logger.record('eval/timesteps', timesteps)
+        if self.verbose >= 1:
+            print(f"Eval num_timesteps={timesteps}, episode_reward={mean_reward:.2f} +/- {std_reward:.2f}")
+
+        if new_best:
+            self.best_mean_reward = mean_reward
+            self.best_timesteps = timesteps
+            if self.verbose >= 1:
+                print("New best mean reward!")
+            if self.callback_on_new_best is not None:
+                return self.callback_on_new_best.on_step()
+        return True
+
+    def _on_training_end(self):
+        if self.process is None:
+            return
+        if self.wait_on_end:
+            # 마지막 가중치까지 평가하고 종료
+            if self.sent_timesteps != self.num_timesteps:
+                if self.busy:
+                    self.queued = (self.num_timesteps, self._snapshot())
+                else:
+                    self._send(self.num_timesteps, self._snapshot())
+            self._poll(block=True)
+        self.close()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send((CLOSE, None, None))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=30)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        self.process = None
+        os.remove(self.policy_path)
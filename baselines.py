@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from bitrate_ladder import DEFAULT_LADDER
+from channel import PathLossModel
+from vectorized_streaming import VectorizedVideoStreaming
+from eval_cache import EvalCache, get_eval_cache
+
+
+class BaselinePolicy:
+    # 비교용 고정 정책: 관측값 행렬 (배치, 4 * 사용자 수) -> 액션 행렬 (배치, 3 * 사용자 수)
+    # 관측값은 사용자별 [이전 화질, 이전 버퍼, 잔여 데이터, 거리], 액션은 사용자별 [대역폭, 전력, 화질] 넘버
+    # (다운로드를 끝낸 사용자의 관측값은 모두 0)
+    def __init__(self, num_users, ladder=None):
+        self.num_users = num_users
+        self.ladder = ladder if ladder is not None else DEFAULT_LADDER
+
+    def __call__(self, obs):
+        return self.predict(obs)
+
+    # 난수를 쓰는 정책은 평가 작업마다 다른 시드로 다시 초기화
+    def seed(self, seed=None):
+        pass
+
+    # 에피소드가 끝난 환경의 내부 상태 초기화 (mask: 환경별 bool)
+    def reset(self, mask=Ellipsis):
+        pass
+
+    def predict(self, obs):
+        raise NotImplementedError
+
+    def _users(self, obs):
+        obs = np.asarray(obs, dtype=np.float64)
+        return obs.reshape((len(obs), self.num_users, 4))
+
+    def _actions(self, bandwidth, power, quality):
+        actions = np.empty(bandwidth.shape + (3,), dtype=np.int64)
+        actions[..., 0] = bandwidth
+        actions[..., 1] = power
+        actions[..., 2] = quality
+        return actions.reshape((len(actions), 3 * self.num_users))
+
+    # 화질(p) -> 액션 넘버
+    def _quality_action(self, quality):
+        return np.searchsorted(self.ladder.resolutions, quality)
+
+
+class FixedEqualSplit(BaselinePolicy):
+    # 모든 사용자에게 같은 대역폭/전력, 고정 화질
+    def __init__(self, num_users, quality_action=2, ladder=None):
+        super(FixedEqualSplit, self).__init__(num_users, ladder)
+        self.quality_action = quality_action
+
+    def predict(self, obs):
+        shape = (len(obs), self.num_users)
+        return self._actions(np.full(shape, 9), np.full(shape, 9), np.full(shape, self.quality_action))
+
+
+class RandomPolicy(BaselinePolicy):
+    # 모든 액션을 균일하게 (buffer.py의 기존 임의 할당)
+    def __init__(self, num_users, seed=None, ladder=None):
+        super(RandomPolicy, self).__init__(num_users, ladder)
+        self.rng = np.random.default_rng(seed)
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def predict(self, obs):
+        high = np.array([10, 10, len(self.ladder)] * self.num_users)
+        return self.rng.integers(0, high, size=(len(obs), len(high)))
+
+
+class ThroughputGreedy(BaselinePolicy):
+    # 데이터 사용량을 고려하지 않는 처리량 최대화: BS에 가까운 사용자일수록 대역폭/전력을 많이 주고,
+    # 예상 Data Rate (직전 거리와 경로 손실 모델로 계산)가 감당할 수 있는 가장 높은 화질 선택
+    # 거리를 아직 모르는 사용자 (첫 스텝)는 default_distance로 가정
+    def __init__(self, num_users, ladder=None, model=None, default_distance=500):
+        super(ThroughputGreedy, self).__init__(num_users, ladder)
+        self.model = model if model is not None else PathLossModel()
+        self.default_distance = default_distance
+
+    def _allocate(self, users):
+        distance = np.where(users[..., 3] > 0, users[..., 3], self.default_distance)
+        active = users.any(axis=2)
+
+        # 가까운 순서대로 9 -> 0 단계 (다운로드를 끝낸 사용자는 0)
+        rank = np.argsort(np.argsort(np.where(active, distance, np.inf), axis=1), axis=1)
+        level = np.rint(9 * (self.num_users - 1 - rank) / max(self.num_users - 1, 1)).astype(np.int64)
+        level = np.where(active, level, 0)
+        return level, level, distance
+
+    def _estimated_rate(self, bandwidth_level, power_level, distance):
+        bandwidth_weight = 0.1 * bandwidth_level + 0.05
+        power_weight = 0.1 * power_level + 0.05
+        bandwidth = bandwidth_weight / bandwidth_weight.sum(axis=1, keepdims=True)
+        power = power_weight / power_weight.sum(axis=1, keepdims=True)
+        return np.floor(self.model.data_rate(bandwidth, power, distance))
+
+    def predict(self, obs):
+        users = self._users(obs)
+        bandwidth, power, distance = self._allocate(users)
+        quality = self.ladder.rate_quality(self._estimated_rate(bandwidth, power, distance))
+        return self._actions(bandwidth, power, self._quality_action(quality))
+
+
+class DataBudgetGreedy(ThroughputGreedy):
+    # ThroughputGreedy와 같은 할당이지만, 화질은 잔여 데이터로 남은 청크를 모두 받을 수 있는 범위로 제한
+    # (청크당 예산 = 잔여 데이터 / max_chunk_num, 남은 청크 수를 모르므로 보수적으로 잡음)
+    def __init__(self, num_users, max_chunk_num=20, chunk_length=5, ladder=None, model=None, default_distance=500):
+        super(DataBudgetGreedy, self).__init__(num_users, ladder, model, default_distance)
+        self.max_chunk_num = max_chunk_num
+        self.chunk_length = chunk_length
+
+    def predict(self, obs):
+        users = self._users(obs)
+        bandwidth, power, distance = self._allocate(users)
+        rate_action = self._quality_action(self.ladder.rate_quality(self._estimated_rate(bandwidth, power, distance)))
+
+        # 청크당 예산(MB) 안에 들어가는 가장 높은 화질
+        budget = users[..., 2] / self.max_chunk_num
+        chunk_mb = self.ladder.kbps * self.chunk_length / 8000
+        budget_action = np.maximum(np.searchsorted(chunk_mb, budget, side='right') - 1, 0)
+        return self._actions(bandwidth, power, np.minimum(rate_action, budget_action))
+
+
+class RateBasedABR(ThroughputGreedy):
+    # 기존 ABR의 rate-based 방식: 대역폭/전력은 균등 분배,
+    # 최근 window 스텝의 예상 Data Rate 조화 평균에 safety를 곱한 값으로 화질 선택
+    def __init__(self, num_users, window=5, safety=0.9, ladder=None, model=None, default_distance=500):
+        super(RateBasedABR, self).__init__(num_users, ladder, model, default_distance)
+        self.window = window
+        self.safety = safety
+        self.history = None # (배치, 사용자 수, window) 최근 예상 Data Rate
+        self.count = None
+
+    def reset(self, mask=Ellipsis):
+        if self.history is not None:
+            self.history[mask] = 0
+            self.count[mask] = 0
+
+    def predict(self, obs):
+        users = self._users(obs)
+        if self.history is None or len(self.history) != len(users):
+            self.history = np.zeros((len(users), self.num_users, self.window))
+            self.count = np.zeros(len(users), dtype=np.int64)
+
+        shape = (len(users), self.num_users)
+        level = np.full(shape, 9)
+        distance = np.where(users[..., 3] > 0, users[..., 3], self.default_distance)
+        rate = np.maximum(self._estimated_rate(level, level, distance), 1)
+
+        self.history[np.arange(len(users)), :, self.count % self.window] = rate
+        self.count += 1
+        filled = np.minimum(self.count, self.window)[:, None]
+        used = np.arange(self.window) < filled[..., None]
+        harmonic = filled / np.where(used, 1 / np.where(used, self.history, 1), 0).sum(axis=2)
+
+        quality = self.ladder.rate_quality(self.safety * harmonic)
+        return self._actions(level, level, self._quality_action(quality))
+
+
+# 이름 -> 정책 (평가 하네스와 CLI에서 사용)
+def make_baselines(num_users, max_chunk_num=20, ladder=None, seed=None):
+    return {
+        'fixed_equal_split': FixedEqualSplit(num_users, ladder=ladder),
+        'random': RandomPolicy(num_users, seed=seed, ladder=ladder),
+        'throughput_greedy': ThroughputGreedy(num_users, ladder=ladder),
+        'data_budget_greedy': DataBudgetGreedy(num_users, max_chunk_num=max_chunk_num, ladder=ladder),
+        'rate_based_abr': RateBasedABR(num_users, ladder=ladder),
+    }
+
+
+# 한 프로세스에서 num_envs개 환경을 한꺼번에 돌려 n_episodes개 에피소드의 통계 (합계만 유지)
+# 환경마다 정해진 개수의 에피소드만 세므로 (SB3 evaluate_policy와 같은 방식) 빨리 끝나는 에피소드로 치우치지 않음
+def run_episodes(policy, n_episodes, num_envs=256, env_kwargs=None, seed=None):
+    env_kwargs = dict(env_kwargs or {})
+    num_envs = max(1, min(num_envs, n_episodes))
+    quota = n_episodes // num_envs + (np.arange(num_envs) < n_episodes % num_envs)
+    counts = np.zeros(num_envs, dtype=np.int64)
+    engine = VectorizedVideoStreaming(num_envs=num_envs, seed=seed, **env_kwargs)
+    policy.seed(seed)
+    policy.reset()
+    obs = engine._get_state()
+    episode_return = np.zeros(num_envs)
+    episode_length = np.zeros(num_envs, dtype=np.int64)
+    stats = {'episodes': 0, 'reward_sum': 0.0, 'reward_sumsq': 0.0, 'length_sum': 0,
+             'reward_min': np.inf, 'reward_max': -np.inf}
+
+    while (counts < quota).any():
+        obs, reward, done = engine.step_batch(policy(obs), out=obs)
+        episode_return += reward
+        episode_length += 1
+        if done.any():
+            finished = np.flatnonzero(done & (counts < quota))
+            if len(finished):
+                counts[finished] += 1
+                returns = episode_return[finished]
+                stats['episodes'] += len(finished)
+                stats['reward_sum'] += float(returns.sum())
+                stats['reward_sumsq'] += float(np.square(returns).sum())
+                stats['length_sum'] += int(episode_length[finished].sum())
+                stats['reward_min'] = min(stats['reward_min'], float(returns.min()))
+                stats['reward_max'] = max(stats['reward_max'], float(returns.max()))
+
+            engine.reset_envs(done)
+            policy.reset(done)
+            episode_return[done] = 0
+            episode_length[done] = 0
+            engine._get_state(obs, envs=done)
+
+    return stats
+
+
+def _run_task(task):
+    name, policy, n_episodes, num_envs, env_kwargs, seed = task
+    return name, run_episodes(policy, n_episodes, num_envs, env_kwargs, seed)
+
+
+# 정책마다 n_episodes개 에피소드를 workers * chunks_per_worker개 작업으로 나눠 workers개 프로세스에서 평가
+# 작업별 시드는 seed에서 파생되므로 seed와 workers가 같으면 결과가 같음
+# 정책/설정/시드가 같고 시뮬레이터 코드가 그대로인 정책은 평가 캐시(eval_cache, 기본값은 get_eval_cache())의 결과를 씀
+# 반환값: 이름 -> {episodes, reward_mean, reward_std, reward_min, reward_max, length_mean}
+def evaluate_baselines(policies, n_episodes, env_kwargs=None, num_envs=256, workers=None, seed=0, chunks_per_worker=4, cache=None):
+    workers = workers or os.cpu_count() or 1
+    n_chunks = max(1, min(workers * chunks_per_worker, n_episodes))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    cache = cache if cache is not None else get_eval_cache()
+    keys = {name: cache.key('baseline', policy=policy, n_episodes=n_episodes, env_kwargs=env_kwargs, num_envs=num_envs,
+                            n_chunks=n_chunks, seed=seed) for name, policy in policies.items()}
+    report = {}
+    for name in policies:
+        stats = cache.get(keys[name])
+        if stats is not None:
+            report[name] = stats
+
+    tasks = []
+    for name, policy in policies.items():
+        if name in report:
+            continue
+        for k in range(n_chunks):
+            count = n_episodes // n_chunks + (k < n_episodes % n_chunks)
+            if count:
+                tasks.append((name, policy, count, num_envs, env_kwargs, int(seeds[k].generate_state(1)[0])))
+
+    totals = {}
+    if workers == 1 or not tasks:
+        results = map(_run_task, tasks)
+    else:
+        ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+        pool = ctx.Pool(workers)
+        results = pool.imap_unordered(_run_task, tasks)
+    try:
+        for name, stats in results:
+            total = totals.setdefault(name, {'episodes': 0, 'reward_sum': 0.0, 'reward_sumsq': 0.0, 'length_sum': 0,
+                                             'reward_min': np.inf, 'reward_max': -np.inf})
+            for key in ('episodes', 'reward_sum', 'reward_sumsq', 'length_sum'):
+                total[key] += stats[key]
+            total['reward_min'] = min(total['reward_min'], stats['reward_min'])
+            total['reward_max'] = max(total['reward_max'], stats['reward_max'])
+    finally:
+        if workers != 1 and tasks:
+            pool.close()
+            pool.join()
+
+    for name in totals:
+        total = totals[name]
+        n = total['episodes']
+        mean = total['reward_sum'] / n
+        report[name] = {
+            'episodes': n,
+            'reward_mean': mean,
+            'reward_std': float(np.sqrt(max(total['reward_sumsq'] / n - mean * mean, 0))),
+            'reward_min': total['reward_min'],
+            'reward_max': total['reward_max'],
+            'length_mean': total['length_sum'] / n,
+        }
+        cache.put(keys[name], report[name], 'baseline')
+    return {name: report[name] for name in policies}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="비교용 고정 정책 대량 평가")
+    parser.add_argument('--policies', nargs='+', help="평가할 정책 (기본값은 전부)")
+    parser.add_argument('--episodes', type=int, default=100000, help="정책별 에피소드 수")
+    parser.add_argument('--num-envs', type=int, default=256, help="프로세스당 동시에 진행할 환경 수")
+    parser.add_argument('--workers', type=int, help="프로세스 수 (기본값은 CPU 수)")
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--data-availability', type=float, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="결과 JSON 경로 (없으면 표준 출력)")
+    parser.add_argument('--no-cache', action='store_true', help="평가 캐시를 쓰지 않고 다시 평가")
+    args = parser.parse_args(argv)
+
+    policies = make_baselines(args.users, args.chunks, seed=args.seed)
+    if args.policies:
+        policies = {name: policies[name] for name in args.policies}
+    env_kwargs = {'max_chunk_num': args.chunks, 'num_users': args.users, 'data_availability': args.data_availability}
+
+    start = time.perf_counter()
+    cache = EvalCache(None) if args.no_cache else None
+    report = evaluate_baselines(policies, args.episodes, env_kwargs, args.num_envs, args.workers, args.seed, cache=cache)
+    elapsed = time.perf_counter() - start
+    print(f"{args.episodes * len(policies)} episodes in {elapsed:.1f} s", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+import video_streaming
+import vectorized_streaming
+import buffer
+
+# 높을수록 좋은 지표 (기준값과 비교할 때 사용)
+HIGHER_IS_BETTER = ('steps_per_sec', 'episodes_per_sec', 'resets_per_sec', 'timesteps_per_sec')
+# 없으면 해당 측정만 건너뛰는 선택 패키지 (그 밖의 ImportError는 그대로 실패)
+OPTIONAL_MODULES = ('stable_baselines3', 'torch')
+
+
+# fn을 min_time초 이상 반복 실행하고 (반복 횟수, 걸린 시간) 중 가장 빠른 결과를 반환
+def measure(fn, min_time, repeat):
+    best = None
+    for _ in range(repeat):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            count += fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = count / elapsed
+        best = rate if best is None else max(best, rate)
+    return best
+
+
+def random_actions(num_users, size, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, [10, 10, 6] * num_users, size=(size, 3 * num_users))
+
+
+# VideoStreaming 계열 환경의 스텝/에피소드 처리량
+def bench_env(make_env, num_users, min_time, repeat):
+    env = make_env()
+    env.reset()
+    actions = random_actions(num_users, 4096)
+    state = {'t': 0, 'episodes': 0}
+
+    def run():
+        steps = 0
+        for _ in range(256):
+            _, _, done, _ = env.step(actions[state['t'] % len(actions)])
+            state['t'] += 1
+            steps += 1
+            if done:
+                state['episodes'] += 1
+                env.reset()
+        return steps
+
+    state['episodes'] = 0
+    start = time.perf_counter()
+    steps_per_sec = measure(run, min_time, repeat)
+    elapsed = time.perf_counter() - start
+
+    return {'steps_per_sec': steps_per_sec, 'episodes_per_sec': state['episodes'] / elapsed}
+
+
+def bench_reset(make_env, min_time, repeat):
+    env = make_env()
+
+    def run():
+        for _ in range(256):
+            env.reset()
+        return 256
+
+    return {'resets_per_sec': measure(run, min_time, repeat)}
+
+
+# buffer.py 이산 사건 시뮬레이터의 에피소드 처리량 (임의 액션)
+def bench_buffer(num_users, max_chunk_num, min_time, repeat):
+    env = buffer.VideoStreaming(max_chunk_num, num_users, seed=0)
+
+    def run():
+        env.run()
+        return 1
+
+    return {'episodes_per_sec': measure(run, min_time, repeat)}
+
+
+def bench_vec_env(num_envs, num_users, min_time, repeat):
+    from streaming_vec_env import VideoStreamingVecEnv
+
+    env = VideoStreamingVecEnv(num_envs, num_users=num_users, seed=0)
+    env.reset()
+    actions = random_actions(num_users, num_envs * 64).reshape(64, num_envs, -1)
+    state = {'t': 0}
+
+    def run():
+        for _ in range(16):
+            env.step(actions[state['t'] % len(actions)])
+            state['t'] += 1
+        return 16 * num_envs
+
+    return {'steps_per_sec': measure(run, min_time, repeat)}
+
+
+# VideoStreamingVecEnv 환경 하나로 PPO 롤아웃 + 학습 한 번의 처리량 (stable_baselines3가 있을 때만)
+def bench_ppo(timesteps, num_users):
+    from stable_baselines3 import PPO
+    from streaming_vec_env import VideoStreamingVecEnv
+
+    env = VideoStreamingVecEnv(1, num_users=num_users, seed=0)
+    model = PPO("MlpPolicy", env, n_steps=timesteps, batch_size=timesteps, n_epochs=1, seed=0, verbose=0)
+    start = time.perf_counter()
+    model.learn(total_timesteps=timesteps)
+    return {'timesteps_per_sec': timesteps / (time.perf_counter() - start)}
+
+
+def run_benchmarks(args):
+    results = {}
+    min_time, repeat = args.min_time, args.repeat
+    users_list = [3] if args.quick else args.users
+    chunks_list = [20] if args.quick else args.chunks
+
+    def record(name, fn):
+        try:
+            results[name] = fn()
+        except ImportError as e:
+            if (e.name or '').split('.')[0] not in OPTIONAL_MODULES:
+                raise
+            results[name] = {'skipped': str(e)}
+        print(f"{name}: {results[name]}", file=sys.stderr)
+
+    for num_users in users_list:
+        for max_chunk_num in chunks_list:
+            tag = f"users={num_users},chunks={max_chunk_num}"
+            make_dict = lambda: video_streaming.VideoStreaming(max_chunk_num, num_users, args.data_availability, seed=0)
+            make_vector = lambda: vectorized_streaming.VectorizedVideoStreaming(max_chunk_num, num_users, args.data_availability, seed=0)
+
+            record(f"video_streaming.step[{tag}]", lambda: bench_env(make_dict, num_users, min_time, repeat))
+            record(f"video_streaming.reset[{tag}]", lambda: bench_reset(make_dict, min_time, repeat))
+            record(f"vectorized_streaming.step[{tag}]", lambda: bench_env(make_vector, num_users, min_time, repeat))
+            record(f"vectorized_streaming.reset[{tag}]", lambda: bench_reset(make_vector, min_time, repeat))
+            record(f"buffer.episode[{tag}]", lambda: bench_buffer(num_users, max_chunk_num, min_time, repeat))
+
+    for num_users in users_list:
+        for num_envs in args.num_envs:
+            record(f"streaming_vec_env.step[envs={num_envs},users={num_users}]", lambda: bench_vec_env(num_envs, num_users, min_time, repeat))
+
+    if args.ppo_timesteps:
+        record(f"ppo.rollout[envs=1,users=3,timesteps={args.ppo_timesteps}]", lambda: bench_ppo(args.ppo_timesteps, 3))
+
+    return results
+
+
+# 기준 결과와 비교해서 tolerance보다 많이 느려진 항목 목록 반환
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, metrics in results.items():
+        for key, value in list(metrics.items()):
+            if key not in HIGHER_IS_BETTER:
+                continue
+            base = baseline.get(name, {}).get(key)
+            if base is None or base <= 0:
+                continue
+            ratio = value / base
+            metrics[key + '_vs_baseline'] = ratio
+            if ratio < 1 - tolerance:
+                regressions.append(f"{name} {key}: {value:.1f} vs baseline {base:.1f} ({(ratio - 1) * 100:+.1f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VideoStreaming 시뮬레이터/학습 루프 처리량 벤치마크")
+    parser.add_argument('--output', help="결과 JSON 경로 (없으면 표준 출력)")
+    parser.add_argument('--baseline', help="비교할 기준 결과 JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="허용하는 처리량 감소 비율")
+    parser.add_argument('--min-time', type=float, default=0.5, help="측정 한 번의 최소 시간(초)")
+    parser.add_argument('--repeat', type=int, default=3, help="측정 반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument('--users', type=int, nargs='+', default=[3, 100, 1000])
+    parser.add_argument('--chunks', type=int, nargs='+', default=[20, 50, 100])
+    parser.add_argument('--num-envs', type=int, nargs='+', default=[16, 256])
+    parser.add_argument('--data-availability', type=float, default=2000)
+    parser.add_argument('--ppo-timesteps', type=int, default=2048, help="0이면 PPO 측정 생략")
+    parser.add_argument('--quick', action='store_true', help="users=3, chunks=20만 측정")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'baseline': args.baseline,
+            'tolerance': args.tolerance,
+        },
+        'results': results,
+        'regressions': regressions,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if regressions:
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import json
+from bisect import bisect_left
+import numpy as np
+
+class BitrateLadder:
+    # 화질(p) / 비트레이트(kbps) 테이블
+    # resolutions: 화질 목록 (오름차순), kbps: 화질별 청크 비트레이트
+    # rate_bins: Data Rate(kbps) -> 화질 변환 구간의 상한 (마지막 화질은 상한 없음, len(resolutions) - 1개)
+    def __init__(self, resolutions, kbps, rate_bins):
+        if not (len(resolutions) == len(kbps) == len(rate_bins) + 1):
+            raise ValueError("ladder needs one kbps per resolution and one rate bin fewer than resolutions")
+
+        self.resolutions = np.asarray(resolutions, dtype=np.int64)
+        self.kbps = np.asarray(kbps, dtype=np.int64)
+        self.rate_bins = np.asarray(rate_bins, dtype=np.float64)
+        self.numbers = np.arange(1, len(self.resolutions) + 1) # 화질 -> 숫자 (1부터)
+
+        # 스칼라 호출용 파이썬 테이블
+        self._resolution_list = self.resolutions.tolist()
+        self._kbps_list = self.kbps.tolist()
+        self._rate_bin_list = self.rate_bins.tolist()
+        self._kbps_by_resolution = dict(zip(self._resolution_list, self._kbps_list))
+        self._number_by_resolution = dict(zip(self._resolution_list, self.numbers.tolist()))
+
+    def __len__(self):
+        return len(self.resolutions)
+
+    # 매니페스트 예) {"ladder": [{"resolution": 240, "kbps": 700, "max_rate": 400}, ..., {"resolution": 1440, "kbps": 13000}]}
+    @classmethod
+    def from_manifest(cls, path):
+        with open(path) as f:
+            manifest = json.load(f)
+
+        ladder = sorted(manifest['ladder'], key=lambda rung: rung['resolution'])
+        return cls([rung['resolution'] for rung in ladder],
+                   [rung['kbps'] for rung in ladder],
+                   [rung['max_rate'] for rung in ladder[:-1]])
+
+    def to_manifest(self, path):
+        ladder = []
+        for k in range(len(self)):
+            rung = {'resolution': self._resolution_list[k], 'kbps': self._kbps_list[k]}
+            if k < len(self) - 1:
+                rung['max_rate'] = self._rate_bin_list[k]
+            ladder.append(rung)
+
+        with open(path, 'w') as f:
+            json.dump({'ladder': ladder}, f, indent=2)
+
+    # 액션으로 받은 화질 넘버 -> 실제 화질(p), 범위 밖의 넘버는 가장 높은 화질
+    def action_quality(self, action):
+        top = len(self) - 1
+        if np.isscalar(action):
+            return self._resolution_list[action] if 0 <= action < top else self._resolution_list[top]
+
+        action = np.asarray(action)
+        return self.resolutions[np.where((action >= 0) & (action < top), action, top)]
+
+    # 액션으로 받은 화질 넘버 -> kbps
+    def action_kbps(self, action):
+        top = len(self) - 1
+        if np.isscalar(action):
+            return self._kbps_list[action] if 0 <= action < top else self._kbps_list[top]
+
+        action = np.asarray(action)
+        return self.kbps[np.where((action >= 0) & (action < top), action, top)]
+
+    # 화질(p) -> kbps, 테이블에 없는 화질은 가장 높은 비트레이트
+    def quality_kbps(self, quality):
+        if np.isscalar(quality):
+            return self._kbps_by_resolution.get(quality, self._kbps_list[-1])
+
+        index, found = self._lookup(quality)
+        return np.where(found, self.kbps[index], self.kbps[-1])
+
+    # 화질(p) -> 숫자 (1부터), 테이블에 없는 화질은 0
+    def quality_number(self, quality):
+        if np.isscalar(quality):
+            return self._number_by_resolution.get(quality, 0)
+
+        index, found = self._lookup(quality)
+        return np.where(found, self.numbers[index], 0)
+
+    # Data Rate(kbps) -> 화질(p), 구간 상한을 포함하는 searchsorted
+    def rate_quality(self, rate):
+        if np.isscalar(rate):
+            return self._resolution_list[bisect_left(self._rate_bin_list, rate)]
+
+        return self.resolutions[np.searchsorted(self.rate_bins, rate, side='left')]
+
+    def _lookup(self, quality):
+        quality = np.asarray(quality)
+        index = np.minimum(np.searchsorted(self.resolutions, quality), len(self) - 1)
+        return index, self.resolutions[index] == quality
+
+
+# 기존 if/elif 분기와 같은 기본 테이블
+DEFAULT_LADDER = BitrateLadder(
+    resolutions=[240, 360, 480, 720, 1080, 1440],
+    kbps=[700, 1000, 2000, 4000, 6000, 13000],
+    rate_bins=[400, 1000, 2000, 4000, 6000],
+)
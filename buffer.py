@@ -1,435 +1,376 @@
-import random
+import heapq
 import numpy as np
-import math
-from queue import Queue
+from playback_buffer import PlaybackBuffer
+from bitrate_ladder import DEFAULT_LADDER
+from channel import ChannelSampler, CounterDiscPlacement, PathLossModel
+from counter_rng import stream_key, counter_uniform
+from step_trace import StepTracer
+from population import PopulationPlacement, quality_cap, user_ids
+
+# 카운터 기반 난수의 용도별 스트림 번호
+DATA_STREAM = 1 # 데이터 가용량 (스텝 0)
+ACTION_STREAMS = (2, 3) # 임의 액션 (대역폭/전력, 화질)
+
+# 이벤트 종류 (같은 시각이면 번호가 작은 이벤트부터 처리)
+DOWNLOAD_DONE = 0 # 청크 다운로드 완료
+STALL_END = 1 # 재생 멈춤 해제 (멈춘 동안 청크가 도착)
+PLAYBACK_TICK = 2 # 재생 중인 청크 하나가 끝남
+STALL_START = 3 # 재생할 청크가 없어 재생 멈춤
+
+EVENT_NAMES = {DOWNLOAD_DONE: 'download_done', STALL_END: 'stall_end', PLAYBACK_TICK: 'playback_tick', STALL_START: 'stall_start'}
+
+# 보상 종류 (baseline: 기존 buffer.py의 보상, qoe: 청크 QoE)
+REWARDS = ('baseline', 'qoe')
+
+
+class BufferPathLossModel(PathLossModel):
+    # 기존 buffer.py의 Data Rate 식 (잡음으로 1 + 신호 전체를 나눔, video_streaming의 log2(1 + 신호 / 잡음)과 다름)
+    def data_rate(self, bandwidth, power, distance, interference=0):
+        transmit_channel_gain = self.gain(distance)
+
+        data_rate = bandwidth * np.log2((1 + power * transmit_channel_gain) / (self.transmit_n0 + interference)) # Mbps
+        return data_rate * 1000 # Kbps
+
 
 class VideoStreaming:
-    def __init__(self, max_chunk_num, num_users):
+    # 부분 다운로드(Residual) 모델을 이산 사건 시뮬레이터로 구현
+    # 고정된 5초 격자 대신 이벤트 큐(heapq)에 다음 사건 시각만 넣고 순서대로 처리하므로
+    # 비용은 시간 구간 수가 아니라 사건 수(청크 다운로드/재생 횟수)에 비례
+    #
+    # 사용자는 청크를 하나씩 다운로드하고, 다운로드가 끝날 때마다 다음 청크의 대역폭/전력/화질을 정하는 결정 시점이 됨
+    # step(action)은 결정 시점에 있는 사용자들에게 action을 적용하고, 다음 결정 시점(또는 에피소드 끝)까지 진행
+    # 재생은 대기열에 startup_chunks개 (기본값은 기존처럼 buffer_capacity개)가 모이면 시작하고, 대기열이 가득 차면 다운로드를 멈춤 (buffer off)
+    # action 없이 step을 부르면 기존처럼 대역폭 (0~1), 전력 (1~1000mW), 청크 비트레이트 (300~13000kbps)를 연속값으로 뽑음
+    #
+    # reward='baseline' (기본값): 청크마다 기존 보상 (화질 + 버퍼 + 화질 변화 + 버퍼 변화 + 지연 시간)의 평균
+    #   지연 시간 = 다운로드 시간 + buffer off 시간 + 리버퍼링 시간 (기존 식 그대로 더함)
+    # reward='qoe': 청크마다 화질 넘버 - 화질 변화 - 리버퍼링 시간의 평균
+    # 두 경우 모두 Data Rate로 감당할 수 없는 화질을 고르거나 데이터 가용량을 다 쓰면 -100
+    def __init__(self, max_chunk_num, num_users, ladder=None, channel=None, seed=None,
+                 buffer_capacity=10, startup_chunks=None, tracer=None, population=None, reward='baseline'):
+        if reward not in REWARDS:
+            raise ValueError(f"unknown reward {reward!r}, expected one of {REWARDS}")
+
         # BS의 위치
         self.BS_x = 0
         self.BS_y = 0
-        
-        self.chunk_length = 5
-        self.buffer_capacity = 10
+
+        self.chunk_length = 5 # 청크 재생 시간 (초)
+        self.buffer_capacity = buffer_capacity # 대기열에 담을 수 있는 최대 청크 수
+        self.startup_chunks = startup_chunks if startup_chunks is not None else buffer_capacity # 재생을 시작하는 대기열 청크 수
+        self.reward = reward
         self.max_chunk_num = max_chunk_num
         self.num_users = num_users
-        self.time_step = 0
+        self.ladder = ladder if ladder is not None else DEFAULT_LADDER # 화질/비트레이트 테이블
+        # 사용자 모집단 (population.Population, 있으면 에피소드마다 데이터 가용량/거리/단말 화질 제한을 새 사용자로 뽑음)
+        self.population = population
+        if channel is None:
+            placement = PopulationPlacement(self.BS_x, self.BS_y) if population is not None else CounterDiscPlacement(1000, self.BS_x, self.BS_y)
+            channel = ChannelSampler(placement, BufferPathLossModel(), seed=seed)
+        self.channel = channel
+        # 데이터 가용량과 임의 액션용 카운터 기반 난수 키 ((사용자, 결정 시점, 에피소드)로 정해지므로 호출 순서와 무관)
+        self.key = stream_key(seed)
+        # 디버그 출력 (기본값은 환경 변수 STREAMING_TRACE로 설정, debug면 이벤트마다 메시지 출력)
+        self.tracer = tracer if tracer is not None else StepTracer.from_env()
+
+        self.play_wait = PlaybackBuffer(self.num_users, self.buffer_capacity)
         self.users = {}
-        
+        self.episode = -1 # 에피소드 번호 (reset마다 1 증가)
+        self.reset()
+
+    def reset(self):
+        self.play_wait.reset()
+        self.channel.reset()
+
+        self.now = 0.0 # 시뮬레이션 시각 (초)
+        self.events = [] # (시각, 종류, 순번, 사용자), 같은 시각이면 종류 순서, 종류도 같으면 넣은 순서
+        self.sequence = 0
+        self.event_count = 0
+        self.time_step = 0 # 결정 시점 수
+        self.ready = np.ones(self.num_users, dtype=bool) # 다음 청크의 액션을 기다리는 사용자
+        self.ready_count = self.num_users
+        self.state = np.zeros((self.num_users, 4)) # 사용자별 관측값
+        self.exhausted = False # 데이터 가용량을 다 쓴 사용자가 있는지
+        self.episode += 1
+
+        population = self._draw_users() if self.population is not None else None
+        budget = 500 + np.floor(501 * counter_uniform(self.key, 0, np.arange(self.num_users), 0, self.episode, DATA_STREAM)[:, 0])
         for i in range(self.num_users):
+            if population is None:
+                data_availability = budget[i].item()
+            else:
+                data_availability = population['data_availability'][i].item()
             self.users[i] = {
-                'data_availability': random.randint(500, 1000),
-                'user_bandwidth': [],
-                'user_power': [],
-                'user_DR': [],
-                'user_distance': [],
-                'download_time': [],
-                'video_quality': [],
-                'transmit_quality': [],
-                'step_percentage': [],
-                'buffer': [],
-                'rebuffering_time': [],
-                'buffer_off_time': [],
-                'monitor_data_availability': [],
-                'play_wait': Queue(self.buffer_capacity),
-                'videobuffer': 0,
-                'Residual': 0,
-                'current_data_availability': 0,
-                'current_chunk_num': 0
+                'data_availability': data_availability, # 시작 데이터 가용량 (MB)
+                'remaining_data': data_availability, # 잔여 데이터 가용량 (MB)
+                'current_chunk_num': 0, # 다음에 다운로드할 청크 번호
+                'played_chunk_num': 0, # 재생을 끝낸 청크 수
+                'downloading': False,
+                'blocked': False, # 대기열이 가득 차서 다운로드 대기 중
+                'blocked_since': 0.0,
+                'playing': False, # 청크 하나를 재생 중
+                'started': False, # 한 번이라도 재생을 시작했는지
+                'stalled': False, # 재생 시작 후 대기열이 비어 멈춘 상태
+                'stall_start': 0.0,
+                'pending': None, # 대기열이 찰 때 미뤄 둔 다운로드 (청크 크기, 다운로드 시간, 화질)
+                'quality': 0, # 마지막으로 다운로드한 청크 화질 (p)
+                'prev_quality_number': 0,
+                'buffer': 0.0, # 직전 청크를 받았을 때의 버퍼량 (초)
+                'chunk_buffer_off_time': 0.0, # 다운로드 중인 청크가 대기열 자리를 기다린 시간
+                'distance': 0.0,
+                'user_DR': 0.0,
+                'download_time': 0.0,
+                'rebuffering_time': 0.0, # 누적 리버퍼링 시간
+                'buffer_off_time': 0.0, # 누적 buffer off 시간
+                'startup_delay': 0.0, # 첫 재생까지 걸린 시간
+                'quality_cap': population['quality_cap'][i].item() if population is not None else len(self.ladder) - 1, # 단말이 재생할 수 있는 가장 높은 화질 액션 넘버
             }
-            
-    def reset(self):
-        for i in range(self.num_users):
-            while not self.users[i]['play_wait'].empty():
-                self.users[i]['play_wait'].get()
-                
-            self.users[i]['data_availability'] = random.randint(500, 1000)
-            self.users[i]['user_bandwidth'] = []
-            self.users[i]['user_power'] = []
-            self.users[i]['user_DR'] = []
-            self.users[i]['user_distance'] = []
-            self.users[i]['download_time'] = []
-            self.users[i]['video_quality'] = []
-            self.users[i]['transmit_quality'] = []
-            self.users[i]['step_percentage'] = []
-            self.users[i]['buffer'] = []
-            self.users[i]['rebuffering_time'] = []
-            self.users[i]['buffer_off_time'] = []
-            self.users[i]['monitor_data_availability'] = []
-            self.users[i]['videobuffer'] = 0
-            self.users[i]['Residual'] = 0
-            self.users[i]['current_data_availability'] = 0
-            self.users[i]['current_chunk_num'] = 0
-            
-        self.time_step = 0
+            self._update_state(i)
+
+        # 이번 step에서 끝난 청크들의 QoE
+        self.step_qoe = []
         return self._get_state()
-            
-    def reset_user_location(self, current_user):
-        theta = random.uniform(0, 2 * math.pi)
-        r = random.uniform(0, 1000)
-
-        user_x = r * math.cos(theta)
-        user_y = r * math.sin(theta)
-    
-        distance = math.sqrt((self.BS_x - user_x)**2 + (self.BS_y - user_y)**2)
-        self.users[current_user]['user_distance'].append(distance)
-        return distance
-    
-    def calculate_user_data_rate(self, bandwidth, power, current_user):
-        distance = self.reset_user_location(current_user)
-        
-        g0 = -50 # dB
-        n0 = -174 # dBm
-        θ = 2
-        
-        transmit_g0 = self.transmit_mW(g0)
-        transmit_n0 = self.transmit_mW(n0)
-        
-        channel_gain = transmit_g0 / (distance**θ) # dBm
-        transmit_channel_gain = self.transmit_mW(channel_gain)
-        
-        data_rate = bandwidth * (math.log2((1 + power * transmit_channel_gain) / transmit_n0)) # Mbps
-        transmit_data_rate = data_rate * 1000 # kbps
-        
-        print(f"User{current_user} distance is {distance} m")
-        return transmit_data_rate
-    
-    def transmit_mW(self, value):
-        transmit_value = 10 ** (value / 10)
-        return transmit_value
-    
-    def transmit_qualities(self, quality):
-        transmit_quality = None
-        if 300 <= quality <= 400 or quality < 300:
-            transmit_quality = 240
-        elif 400 < quality <= 1000:
-            transmit_quality = 360
-        elif 1000 < quality <= 2000:
-            transmit_quality = 480
-        elif 2000 < quality <= 4000:
-            transmit_quality = 720
-        elif 4000 < quality <= 6000:
-            transmit_quality = 1080
-        elif 6000 < quality <= 13000 or quality > 13000:
-            transmit_quality = 1440
-        return transmit_quality
-    
+
+    # 이번 에피소드의 사용자를 모집단에서 뽑음 (grid 엔진과 같은 사용자 번호 규칙)
+    def _draw_users(self):
+        users = self.population.take(user_ids(self.episode, 0, 1, self.num_users))
+        users['quality_cap'] = quality_cap(self.ladder, users['max_quality'])
+        placement = getattr(self.channel, 'placement', None)
+        if hasattr(placement, 'assign'):
+            placement.allocate((self.num_users,))
+            placement.assign(Ellipsis, users['distance'])
+        return users
+
+    # 사용자별 임의 대역폭 (0~1), 전력 (1~1000mW), 청크 비트레이트 (300~13000kbps) (이번 결정 시점의 카운터로 뽑음)
+    def _random_action(self):
+        users = np.arange(self.num_users)
+        weights = counter_uniform(self.key, 0, users, self.time_step, self.episode, ACTION_STREAMS[0])
+        rate = counter_uniform(self.key, 0, users, self.time_step, self.episode, ACTION_STREAMS[1])[:, 0]
+        bandwidth = weights[:, 0]
+        power = 1 + np.floor(1000 * weights[:, 1])
+        kbps = 300 + np.floor(12701 * rate)
+        return bandwidth, power, kbps
+
+    def _push(self, time, kind, user):
+        heapq.heappush(self.events, (time, kind, self.sequence, user))
+        self.sequence += 1
+
+    def transmit_qualities(self, rate):
+        return self.ladder.rate_quality(rate)
+
     def transmit_number(self, quality):
-        transmit_number = None
-        if quality == 240:
-            transmit_number = 1
-        elif quality == 360:
-            transmit_number = 2
-        elif quality == 480:
-            transmit_number = 3
-        elif quality == 720:
-            transmit_number = 4
-        elif quality == 1080:
-            transmit_number = 5
-        elif quality == 1440:
-            transmit_number = 6
-        return transmit_number
-    
-    def calculate_reward(self):
-        done = False
-        active_users = 0
-        penalty = 0
-        
-        total_reward = []
-        total_bandwidth = []
-        total_power = []
-        
-        sum_reward = 0
-        sum_bandwidth = 0
-        sum_power = 0
-        
-        for i in range(self.num_users):
-            if self.users[i]['current_chunk_num'] > self.max_chunk_num:
-                print(f"User{i} has downloaded all chunks. Skipping reward calculation for this user...")
-                continue
-            
-            active_users += 1
-            
-            current_quality = self.users[i]['video_quality'][self.time_step]
-            prev_quality = self.users[i]['video_quality'][self.time_step - 1]
-            
-            current_transmit_quality = self.users[i]['transmit_quality'][self.time_step]
-            prev_transmit_quality = self.users[i]['transmit_quality'][self.time_step - 1]
-            
-            current_quality_number = self.transmit_number(current_transmit_quality)
-            prev_quality_number = self.transmit_number(prev_transmit_quality)
-            
-            current_buffer = self.users[i]['buffer'][self.time_step]
-            prev_buffer = self.users[i]['buffer'][self.time_step - 1] if self.time_step > 0 else 0
-            
-            download_time = self.users[i]['download_time'][self.time_step]
-            buffer_off_time = self.users[i]['buffer_off_time'][self.time_step]
-            rebuffering_time = self.users[i]['rebuffering_time'][self.time_step]
-            data_availability = self.users[i]['monitor_data_availability'][self.time_step]
-            
-            low = 0.4 * data_availability
-            
-            user_dr = self.users[i]['user_DR'][self.time_step]
-            transmit_user_dr = self.transmit_qualities(user_dr)
-            
-            quality_diff = -abs(prev_quality_number - current_quality_number)
-            buffer_diff = prev_buffer - current_buffer
-            
-            bandwidth = self.users[i]['user_bandwidth'][self.time_step]
-            total_bandwidth.append(bandwidth)
-            power = self.users[i]['user_power'][self.time_step]
-            total_power.append(power)
-            
-            if transmit_user_dr < current_transmit_quality:
-                penalty += -100
-                done = True
-                
-            if data_availability < low:
-                penalty += -100
-                done = True
-            
-            qoe = current_transmit_quality + current_buffer + quality_diff + buffer_diff
-            latency = download_time + buffer_off_time + rebuffering_time
-            reward = qoe + latency + penalty
-            
-            total_reward.append(reward)
-            
-        if active_users == 0:
-            done = True
-            reward = 0
+        return self.ladder.quality_number(quality)
+
+    # 청크 크기 (kbit)와 다운로드 시간 (초, 최소 1초)
+    def calculate_download(self, user_dr, quality_kbps):
+        chunk_size = quality_kbps * self.chunk_length
+        download_time = max(chunk_size / user_dr, 1) if user_dr > 0 else float('inf')
+        return chunk_size, download_time
+
+    # action: 사용자별 [대역폭, 전력, 화질] 넘버 (다른 환경과 같은 형식), None이면 임의 연속값
+    def step(self, action=None):
+        ready = self.ready.copy()
+        if action is None:
+            bandwidth, power, kbps = self._random_action()
+            bandwidth = bandwidth[ready]
+            power = power[ready]
         else:
-            for i in range(active_users):
-                sum_reward += total_reward[i]
-                sum_bandwidth += total_bandwidth[i]
-                sum_power += total_power[i]
-            
-            if sum_bandwidth > 1 or sum_power > 1000:
-                reward += -100
-                done = True
-                
-            average_reward = sum_reward / active_users
-            
-            print(f"sum bandwidth: {sum_bandwidth}, sum power: {sum_power}")
-            print(f"reward: {average_reward}")
-            
-        return average_reward, done
-    
-    def step(self):
-        # 전 스텝에서 청크를 완전히 다운로드 받았을 경우
-        done_user = 0
-        while done_user < 3:
-            for i in range(self.num_users):
-                current_user = i
-                semi_done_user = 0
-                if self.users[i]['current_chunk_num'] >= self.max_chunk_num:
-                    print(f"User{i} has downloaded all chunks, Skipping...")
-                    done_user += 1
-                    continue
-                if self.users[i]['Residual'] == 0:
-                    bandwidth = random.random()
-                    power = random.randint(1, 1000)
-                    chunk_quality = random.randint(300, 13000) 
-                    transmit_quality = self.transmit_qualities(chunk_quality)
-                    
-                    user_dr = self.calculate_user_data_rate(bandwidth, power, current_user)
-                    transmit_user_dr = self.transmit_qualities(user_dr)
-                    self.users[i]['user_DR'].append(user_dr)
-                    
-                    self.users[i]['user_bandwidth'].append(bandwidth)
-                    self.users[i]['user_power'].append(power)
-                    self.users[i]['video_quality'].append(chunk_quality)
-                    self.users[i]['transmit_quality'].append(transmit_quality)
-                    play_time = self.chunk_length
-                    
-                    print(f"User{i} Bandwidth: {bandwidth}, Power:{power}")
-                    print(f"User{i} DR: {user_dr, transmit_user_dr}, Chunk Quality: {chunk_quality, transmit_quality}")
-                    print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] Download Start")
-                    
-                    chunk_size, download_time, Residual, current_download_percentage  = self.calculate_download(user_dr, chunk_quality, play_time, current_user)
-                    
-                    print(f"User{i} Download Time: {download_time} sec, Residual: {Residual}")
-                    self.users[i]['download_time'].append(download_time)
-                    
-                    if current_download_percentage >= 100:
-                        print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] Download Complete")
-                        self.users[i]['videobuffer'] += self.chunk_length
-                        
-                        print(f"User{i} Current Buffer is {self.users[i]['videobuffer']}")
-                        print(f"User{i} Current Data Availability is {self.users[i]['monitor_data_availability'][self.time_step]}")
-                        
-                        if self.users[i]['current_chunk_num'] == 0:
-                            buffer_off_time = max(max((self.users[i]['videobuffer'] - download_time), 0) + self.chunk_length - self.buffer_capacity, 0)
-                        else:
-                            buffer_off_time = 0
-                        self.users[i]['buffer_off_time'].append(buffer_off_time)
-                        
-                        rebuffering_time = max((download_time - self.users[i]['videobuffer']), 0)
-                        self.users[i]['rebuffering_time'].append(rebuffering_time)
-                        
-                        self.users[i]['buffer'].append(self.users[i]['videobuffer'])
-                        self.users[i]['play_wait'].put(self.users[i]['current_chunk_num'])
-                        self.users[i]['current_chunk_num'] += 1
-                        self.users[i]['Residual'] = 0
-                        semi_done_user += 1
-                    else:
-                        print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] is {current_download_percentage} % downloaded")
-                        self.users[i]['videobuffer'] += (self.chunk_length * (current_download_percentage/100))
-                        
-                        print(f"User{i} Current Buffer is {self.users[i]['videobuffer']}")
-                        print(f"User{i} Current Data Availability is {self.users[i]['monitor_data_availability'][self.time_step]}")
-                        
-                        self.users[i]['Residual'] += Residual
-                        self.users[i]['buffer'].append(self.users[i]['videobuffer'])
-                        
-                        if self.users[i]['current_chunk_num'] == 0:
-                            buffer_off_time = max(max((self.users[i]['videobuffer'] - download_time), 0) + self.chunk_length - self.buffer_capacity, 0)
-                        else:
-                            buffer_off_time = 0
-                        self.users[i]['buffer_off_time'].append(buffer_off_time)
-                        
-                        rebuffering_time = max((download_time - self.users[i]['videobuffer']), 0)
-                        self.users[i]['rebuffering_time'].append(rebuffering_time)
-                        semi_done_user += 1
-                # 전 스텝에서 청크를 완전히 다운받지 않았을 경우
+            reshape_action = np.asarray(action).reshape((self.num_users, 3))
+            bandwidth_weight = 0.1 * reshape_action[:, 0] + 0.05
+            power_weight = 0.1 * reshape_action[:, 1] + 0.05
+            bandwidth = (bandwidth_weight / bandwidth_weight.sum())[ready]
+            power = (power_weight / power_weight.sum())[ready]
+
+        self.step_qoe = []
+        penalty = 0
+        if ready.any():
+            rates, distances = self.channel.sample(bandwidth, power, ready)
+            for i, user_dr, distance in zip(np.flatnonzero(ready).tolist(), rates.tolist(), distances.tolist()):
+                user = self.users[i]
+                if action is None:
+                    chunk_kbps = kbps[i].item()
+                    if self.population is not None:
+                        chunk_kbps = min(chunk_kbps, self.ladder.action_kbps(user['quality_cap']))
+                    quality = self.transmit_qualities(chunk_kbps)
                 else:
-                    bandwidth = random.random()
-                    power = random.randint(1, 1000)
-                    chunk_quality = random.randint(300, 13000) 
-                    transmit_quality = self.transmit_qualities(chunk_quality)
-                    
-                    user_dr = self.calculate_user_data_rate(bandwidth, power, current_user)
-                    transmit_user_dr = self.transmit_qualities(user_dr)
-                    self.users[i]['user_DR'].append(user_dr)
-                    
-                    self.users[i]['user_bandwidth'].append(bandwidth)
-                    self.users[i]['user_power'].append(power)
-                    self.users[i]['video_quality'].append(chunk_quality)
-                    self.users[i]['transmit_quality'].append(transmit_quality)
-                    
-                    print(f"User{i} Bandwidth: {bandwidth}, Power:{power}")
-                    print(f"User{i} DR: {user_dr, transmit_user_dr}, Chunk Quality: {chunk_quality, transmit_quality}")
-                    print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] Redownload Start")
-                    
-                    play_time = self.chunk_length - (self.chunk_length * (self.users[i]['step_percentage'][self.time_step - 1] / 100))
-                    
-                    chunk_size, download_time, Residual, current_download_percentage = self.calculate_download(user_dr, chunk_quality, play_time, current_user)
-                    
-                    print(f"User{i} Download Time: {download_time} sec, Residual: {Residual}")
-                    
-                    if current_download_percentage >= 100:
-                        print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] Download Complete")
-                        self.users[i]['videobuffer'] += play_time
-                        self.users[i]['Residual'] = 0
-                        self.users[i]['buffer'].append(self.users[i]['videobuffer'])
-                        self.users[i]['play_wait'].put(self.users[i]['current_chunk_num'])
-                        
-                        print(f"User{i} Current Buffer is {self.users[i]['videobuffer']}")
-                        print(f"User{i} Current Data Availability is {self.users[i]['monitor_data_availability'][self.time_step]}")
-                        
-                        if self.users[i]['current_chunk_num'] == 0:
-                            buffer_off_time = max(max((self.users[i]['videobuffer'] - download_time), 0) + self.chunk_length - self.buffer_capacity, 0)
-                        else:
-                            buffer_off_time = 0
-                        self.users[i]['buffer_off_time'].append(buffer_off_time)
-                        
-                        rebuffering_time = max((download_time - self.users[i]['videobuffer']), 0)
-                        self.users[i]['rebuffering_time'].append(rebuffering_time)
-                        
-                        self.users[i]['current_chunk_num'] += 1
-                        semi_done_user += 1
-                    else:
-                        print(f"User{i} Chunk[{self.users[i]['current_chunk_num']}] is {current_download_percentage} % downloadad")
-                        self.users[i]['videobuffer'] += play_time
-                        self.users[i]['Residual'] += Residual
-                        self.users[i]['buffer'].append(self.users[i]['videobuffer'])
-                        
-                        print(f"User{i} Current Buffer is {self.users[i]['videobuffer']}")
-                        print(f"User{i} Current Data Availability is {self.users[i]['monitor_data_availability'][self.time_step]}")
-                        
-                        if self.users[i]['current_chunk_num'] == 0:
-                            buffer_off_time = max(max((self.users[i]['videobuffer'] - download_time), 0) + self.chunk_length - self.buffer_capacity, 0)
-                        else:
-                            buffer_off_time = 0
-                        self.users[i]['buffer_off_time'].append(buffer_off_time)
-                        
-                        rebuffering_time = max((download_time - self.users[i]['videobuffer']), 0)
-                        self.users[i]['rebuffering_time'].append(rebuffering_time)
-                        semi_done_user += 1
-                    
-                if self.users[i]['videobuffer']:
-                    if self.users[i]['play_wait'].qsize() >= self.buffer_capacity:
-                        current_chunk = self.users[i]['play_wait'].get()
-                        self.users[i]['videobuffer'] -= 5
-                        print(f"User{i} Chunk[{current_chunk}] is Playing...")
-                        
-                # reward, done = self.calculate_reward()
-                
-                if semi_done_user == 3:
-                    self.time_step += 1
-                    
-                if done == False:
-                    if done_user == 3:
-                        done = True       
-                # return self._get_state(), reward, done, {}
-    
-    def calculate_download(self, user_dr, chunk_quality, play_time, current_user):
-        chunk_size = chunk_quality * play_time
-        download_time = chunk_size / user_dr
-        
-        if download_time <= 1:
-            download_time = 1
-        else:
-            download_time = chunk_size / user_dr
-        self.users[current_user]['download_time'].append(download_time)
-        
-        download_in_sec = chunk_size / download_time
-        
-        if download_in_sec * 5 > chunk_size:
-            download_in_current_step = chunk_size
+                    action_quality = min(reshape_action[i, 2], user['quality_cap'])
+                    chunk_kbps = self.ladder.action_kbps(action_quality)
+                    quality = self.ladder.action_quality(action_quality)
+                penalty += self._start_download(i, chunk_kbps, quality, user_dr, distance)
+
+        self._run_until_decision()
+        self.time_step += 1
+
+        # 데이터 가용량을 다 쓴 사용자가 있으면 페널티와 함께 종료
+        exhausted = self.exhausted
+        done = exhausted or not self.events and self.ready_count == 0
+
+        reward = (sum(self.step_qoe) / len(self.step_qoe) if self.step_qoe else 0) + penalty
+        if exhausted:
+            reward += -100
+
+        info = {'time': self.now, 'events': self.event_count,
+                'ready': np.flatnonzero(self.ready).tolist()}
+        if done:
+            info['rebuffering_time'] = [self.users[i]['rebuffering_time'] for i in range(self.num_users)]
+            info['startup_delay'] = [self.users[i]['startup_delay'] for i in range(self.num_users)]
+        return self._get_state(), reward, done, info
+
+    # 임의 액션으로 에피소드 하나를 끝까지 진행하고 보상 합계 반환
+    def run(self, policy=None):
+        self.reset()
+        total_reward = 0
+        done = False
+        while not done:
+            action = policy(self._get_state()) if policy is not None else None
+            _, reward, done, _ = self.step(action)
+            total_reward += reward
+        return total_reward
+
+    # 결정 시점의 사용자 i가 비트레이트 kbps, 화질 quality인 다음 청크 다운로드를 시작 (대기열이 가득 차면 자리가 날 때까지 미룸)
+    def _start_download(self, i, kbps, quality, user_dr, distance):
+        user = self.users[i]
+        self.ready[i] = False
+        self.ready_count -= 1
+        user['distance'] = distance
+        user['user_DR'] = user_dr
+        user['chunk_buffer_off_time'] = 0.0
+
+        chunk_size, download_time = self.calculate_download(user_dr, kbps)
+        user['pending'] = (chunk_size, download_time, quality)
+        self._update_state(i)
+        if self.tracer.debug:
+            print(f"User{i} DR: {user_dr}, Chunk[{user['current_chunk_num']}] Quality: {quality}, Download Time: {download_time}")
+
+        if self.play_wait.qsize(i) >= self.buffer_capacity:
+            user['blocked'] = True
+            user['blocked_since'] = self.now
         else:
-            download_in_current_step = download_in_sec * 5
-        
-        if download_in_current_step >= chunk_size:
-            Residual = 0
+            self._resume_download(i)
+
+        # Data Rate로 감당할 수 없는 화질을 고르면 페널티
+        return -100 if self.transmit_qualities(user_dr) < quality else 0
+
+    def _resume_download(self, i):
+        user = self.users[i]
+        if user['blocked']:
+            user['chunk_buffer_off_time'] = self.now - user['blocked_since']
+            user['buffer_off_time'] += user['chunk_buffer_off_time']
+            user['blocked'] = False
+        user['downloading'] = True
+        self._push(self.now + user['pending'][1], DOWNLOAD_DONE, i)
+
+    # 이벤트를 시각 순서대로 처리하다가 결정 시점에 도달한 사용자가 생기면 멈춤
+    def _run_until_decision(self):
+        while self.events:
+            time, kind, _, i = heapq.heappop(self.events)
+            self.now = time
+            self.event_count += 1
+            if self.tracer.debug:
+                print(f"[{time:.3f}] User{i} {EVENT_NAMES[kind]}")
+
+            if kind == DOWNLOAD_DONE:
+                self._on_download_done(i)
+            elif kind == PLAYBACK_TICK:
+                self._on_playback_tick(i)
+            elif kind == STALL_START:
+                self._on_stall_start(i)
+            else:
+                self._on_stall_end(i)
+
+            # 같은 시각의 이벤트는 모두 처리한 뒤 돌려줌
+            if self.ready_count and (not self.events or self.events[0][0] > self.now):
+                return
+
+    def _on_download_done(self, i):
+        user = self.users[i]
+        chunk_size, download_time, quality = user['pending']
+        user['pending'] = None
+        user['downloading'] = False
+        user['download_time'] = download_time
+        user['remaining_data'] -= chunk_size / 8000 # kbit -> MB
+        if user['remaining_data'] <= 0:
+            self.exhausted = True
+
+        self.play_wait.put(i, user['current_chunk_num'])
+
+        quality_number = self.transmit_number(quality)
+        prev_quality_number = user['prev_quality_number'] if user['current_chunk_num'] > 0 else quality_number
+        rebuffering = self.now - user['stall_start'] if user['stalled'] else 0 # 이 청크를 기다리며 생긴 리버퍼링
+        buffer = self.play_wait.qsize(i) * self.chunk_length
+        if self.reward == 'baseline':
+            qoe = quality + buffer - abs(prev_quality_number - quality_number) + (user['buffer'] - buffer)
+            latency = download_time + user['chunk_buffer_off_time'] + rebuffering
+            self.step_qoe.append(qoe + latency)
         else:
-            Residual = chunk_size - download_in_current_step
-            
-        transmit_mb = download_in_current_step / 8000
-        
-        if self.time_step == 0:
-            current_data_availability = self.users[current_user]['data_availability'] - transmit_mb
+            self.step_qoe.append(quality_number - abs(quality_number - prev_quality_number) - rebuffering)
+        user['quality'] = quality
+        user['prev_quality_number'] = quality_number
+        user['buffer'] = buffer
+        user['current_chunk_num'] += 1
+
+        if user['stalled']:
+            self._push(self.now, STALL_END, i)
+        elif not user['started'] and self.play_wait.qsize(i) >= min(self.startup_chunks, self.buffer_capacity, self.max_chunk_num):
+            user['started'] = True
+            user['startup_delay'] = self.now
+            self._play_next(i)
+
+        if user['current_chunk_num'] < self.max_chunk_num:
+            self.ready[i] = True
+            self.ready_count += 1
+        self._update_state(i)
+
+    def _play_next(self, i):
+        chunk = self.play_wait.get(i)
+        self.users[i]['playing'] = True
+        self._update_state(i)
+        if self.tracer.debug:
+            print(f"User{i} Chunk[{chunk}] is Playing...")
+        self._push(self.now + self.chunk_length, PLAYBACK_TICK, i)
+
+        # 대기열에 자리가 나면 미뤄 둔 다운로드 시작
+        if self.users[i]['blocked']:
+            self._resume_download(i)
+
+    def _on_playback_tick(self, i):
+        user = self.users[i]
+        user['playing'] = False
+        user['played_chunk_num'] += 1
+
+        if not self.play_wait.empty(i):
+            self._play_next(i)
+        elif user['played_chunk_num'] < self.max_chunk_num:
+            self._push(self.now, STALL_START, i)
+
+    def _on_stall_start(self, i):
+        # 같은 시각에 청크가 먼저 도착했으면 멈추지 않고 바로 재생
+        if not self.play_wait.empty(i):
+            self._play_next(i)
+            return
+        self.users[i]['stalled'] = True
+        self.users[i]['stall_start'] = self.now
+
+    def _on_stall_end(self, i):
+        user = self.users[i]
+        user['rebuffering_time'] += self.now - user['stall_start']
+        user['stalled'] = False
+        self._play_next(i)
+
+    # 사용자 i의 관측값 행 갱신 (다운로드를 모두 끝낸 사용자는 0)
+    def _update_state(self, i):
+        user = self.users[i]
+        if user['current_chunk_num'] < self.max_chunk_num:
+            self.state[i] = (user['quality'], self.play_wait.qsize(i) * self.chunk_length, user['remaining_data'], user['distance'])
         else:
-            current_data_availability = self.users[current_user]['monitor_data_availability'][self.time_step - 1] - transmit_mb
-        self.users[current_user]['monitor_data_availability'].append(current_data_availability) 
-        
-        current_download_percentage = (download_in_current_step / chunk_size) * 100
-        self.users[current_user]['step_percentage'].append(current_download_percentage)
-        return chunk_size, download_time, Residual, current_download_percentage
-    
+            self.state[i] = 0
+
+    # 관측값: 사용자별 [마지막 화질, 버퍼량 (재생 시간 기준), 잔여 데이터, 거리]
+    # 이벤트가 생긴 사용자의 행만 그때그때 갱신해 두므로 사용자 수만큼 반복하지 않음
     def _get_state(self):
-        obs = []
-        
-        for i in range(self.num_users):
-            if self.users[i]['current_chunk_num'] < self.max_chunk_num:
-                prev_quality = self.users[i]['video_quality'][self.time_step - 1] if self.time_step > 0 else self.users[i]['video_quality'][self.time_step]
-                prev_buffer = self.users[i]['buffer'][self.time_step - 1] if self.time_step > 0 else self.users[i]['buffer'][self.time_step]
-                data_availability = self.users[i]['monitor_data_availability'][self.time_step]
-                user_DR = self.users[i]['user_DR'][self.time_step]
-                user_distance = self.users[i]['user_distance'][self.time_step]
-                
-                user_state = [prev_quality, prev_buffer, data_availability, user_DR, user_distance]
-            else:
-                prev_quality = 0
-                prev_buffer = 0
-                data_availability = 0
-                user_DR = 0
-                user_distance = 0
-                
-                user_state = [prev_quality, prev_buffer, data_availability, user_DR, user_distance]
-                
-            obs.extend(user_state)
-        return np.array(obs)
-            
-    
-videostreaming = VideoStreaming(20, 3)
-videostreaming.step()
+        return self.state.ravel().copy()
+
+
+if __name__ == '__main__':
+    videostreaming = VideoStreaming(20, 3)
+    print(videostreaming.run())
@@ -0,0 +1,267 @@
+import copy
+import math
+import numpy as np
+from counter_rng import stream_key, counter_uniform
+
+# 같은 상태에서 시작하는 새 np.random.Generator
+def clone_rng(rng):
+    other = np.random.Generator(type(rng.bit_generator)())
+    other.bit_generator.state = rng.bit_generator.state
+    return other
+
+
+class PathLossModel:
+    # 거리 기반 경로 손실 + 섀넌 용량 (기존 calculate_user_data_rate의 식)
+    def __init__(self, g0=-50, n0=-174, theta=2):
+        self.theta = theta
+        # 상수는 한 번만 mW로 변환
+        self.transmit_g0 = self.transmit_mW(g0) # dB
+        self.transmit_n0 = self.transmit_mW(n0) # dBm
+
+    # mW 단위 변경
+    def transmit_mW(self, value):
+        return 10 ** (value / 10)
+
+    # 거리 -> 채널 이득 (mW)
+    # 기존 식 그대로 선형 이득을 한 번 더 dB로 보고 변환하므로 거리와 거의 무관하게 1에 가까움 (Data Rate 결과 유지용)
+    def gain(self, distance):
+        channel_gain = self.transmit_g0 / (distance**self.theta) # dBm
+        return self.transmit_mW(channel_gain)
+
+    # 거리 -> 경로 손실 이득 (선형, g0 / d^theta), 거리에 따라 줄어드는 실제 수신 세기 비교용
+    def linear_gain(self, distance):
+        return self.transmit_g0 / (distance**self.theta)
+
+    # 대역폭 비율과 수신 신호/간섭 전력 (mW, 둘 다 linear_gain 기준) -> Data Rate (Kbps), 여러 기지국 환경용
+    def sinr_rate(self, bandwidth, signal, interference=0):
+        data_rate = bandwidth * np.log2(1 + signal / (self.transmit_n0 + interference)) # Mbps
+        return data_rate * 1000 # Kbps
+
+    # 대역폭/전력 비율과 거리 -> Data Rate (Kbps), interference는 잡음에 더해지는 간섭 전력 (mW)
+    def data_rate(self, bandwidth, power, distance, interference=0):
+        transmit_channel_gain = self.gain(distance)
+
+        data_rate = bandwidth * np.log2(1 + power * transmit_channel_gain / (self.transmit_n0 + interference)) # Mbps
+        return data_rate * 1000 # Kbps
+
+
+class BlockPlacement:
+    # 사용자 위치를 block_size개씩 미리 뽑아 두고 필요한 만큼 잘라서 사용하는 배치
+    # 하위 클래스는 _draw(size)에서 위치 (x, y) 배열을 만듦
+    def __init__(self, block_size=65536):
+        self.block_size = block_size
+        self.rng = None
+        self.block_x = np.empty(0)
+        self.block_y = np.empty(0)
+        self.offset = 0
+
+    def seed(self, rng):
+        self.rng = rng
+        self.block_x = np.empty(0)
+        self.block_y = np.empty(0)
+        self.offset = 0
+
+    # 에피소드 시작 시 호출 (매 스텝 새로 뽑는 배치는 할 일 없음)
+    def reset(self, index=Ellipsis):
+        pass
+
+    # 블록은 새로 뽑을 때 통째로 교체될 뿐 수정되지 않으므로 복사하지 않고 참조만 저장
+    def snapshot(self):
+        return self.block_x, self.block_y, self.offset
+
+    def restore(self, snapshot):
+        self.block_x, self.block_y, self.offset = snapshot
+
+    # rng를 쓰는 복사본 (ChannelSampler.clone에서 사용)
+    def clone(self, rng):
+        other = copy.copy(self)
+        other.rng = rng
+        return other
+
+    def _draw(self, size):
+        raise NotImplementedError
+
+    def _refill(self):
+        self.block_x, self.block_y = self._draw(self.block_size)
+        self.offset = 0
+
+    # mask에 해당하는 사용자들의 이번 스텝 위치 (사용자 순서대로)
+    def positions(self, mask):
+        count = int(np.count_nonzero(mask))
+        x = np.empty(count)
+        y = np.empty(count)
+        filled = 0
+        while filled < count:
+            if self.offset == len(self.block_x):
+                self._refill()
+            take = min(count - filled, len(self.block_x) - self.offset)
+            x[filled:filled + take] = self.block_x[self.offset:self.offset + take]
+            y[filled:filled + take] = self.block_y[self.offset:self.offset + take]
+            self.offset += take
+            filled += take
+
+        return x, y
+
+
+class UniformDiscPlacement(BlockPlacement):
+    # 매 스텝 BS를 중심으로 한 반경 radius(m) 원 안에 사용자를 균일하게 다시 배치 (기존 reset_user_location)
+    def __init__(self, radius=1000, bs_x=0, bs_y=0, block_size=65536):
+        super(UniformDiscPlacement, self).__init__(block_size)
+        self.radius = radius
+        self.bs_x = bs_x
+        self.bs_y = bs_y
+
+    def _draw(self, size):
+        theta = self.rng.uniform(0, 2 * math.pi, size)
+        r = self.rng.uniform(0, self.radius, size)
+
+        return self.bs_x + r * np.cos(theta), self.bs_y + r * np.sin(theta)
+
+    # mask에 해당하는 사용자들의 이번 스텝 BS와의 거리
+    def distances(self, mask):
+        user_x, user_y = self.positions(mask)
+        return np.sqrt((self.bs_x - user_x)**2 + (self.bs_y - user_y)**2)
+
+
+class CounterDiscPlacement:
+    # UniformDiscPlacement와 같은 분포로 매 스텝 다시 배치하되, 난수는 사용자마다 따로인 카운터 기반 스트림(counter_rng)에서 뽑음
+    # 사용자 (환경 first_env + 행, 사용자 열)의 k번째 배치는 (키, 환경, 사용자, k)만으로 정해지므로
+    # 다른 사용자의 진행, 환경 수, 프로세스 분할과 무관하게 같은 값 (직렬, 벡터화, 병렬 실행 결과가 비트 단위로 같음)
+    # k는 에피소드가 바뀌어도 이어지고, 모든 사용자의 다음 block_steps개를 한 번에 만들어 두고 씀
+    # 상태 배열의 모양은 처음 받은 mask의 모양 (사용자 수 또는 (환경 수, 사용자 수))
+    def __init__(self, radius=1000, bs_x=0, bs_y=0, first_env=0, block_steps=256):
+        self.radius = radius
+        self.bs_x = bs_x
+        self.bs_y = bs_y
+        self.first_env = first_env # 첫 행의 환경 번호 (병렬 워커가 맡은 환경 구간의 시작)
+        self.block_steps = block_steps
+        self.key = None
+        self.step = None # 사용자별 다음 카운터
+
+    # ChannelSampler의 난수 생성기에서 키를 뽑음 (같은 시드면 같은 키)
+    def seed(self, rng):
+        self.key = stream_key(rng)
+        self.step = None
+
+    # 카운터는 에피소드가 바뀌어도 이어지므로 할 일 없음
+    def reset(self, index=Ellipsis):
+        pass
+
+    # 카운터만 저장 (미리 만든 난수는 카운터로 다시 만들 수 있음)
+    def snapshot(self):
+        return self.step.copy() if self.step is not None else None
+
+    # 미리 만든 난수는 카운터 구간 [start, end)가 맞으면 그대로 씀
+    def restore(self, snapshot):
+        self.step = snapshot.copy() if snapshot is not None else None
+
+    # 같은 키를 쓰는 복사본 (미리 만든 난수와 구간은 새로 만들 때 통째로 교체되므로 공유)
+    def clone(self, rng):
+        other = copy.copy(self)
+        other.restore(self.snapshot())
+        return other
+
+    def _allocate(self, shape):
+        self.step = np.zeros(shape, dtype=np.int64)
+        self.start = np.zeros(self.step.size, dtype=np.int64)
+        self.end = np.zeros(self.step.size, dtype=np.int64)
+
+    # 모든 사용자의 카운터 step..step + block_steps - 1 난수를 한 번에 만듦 -> (사용자, block_steps, 2)
+    def _refill(self):
+        shape = self.step.shape
+        env = self.first_env + np.arange(shape[0])[:, None] if len(shape) == 2 else self.first_env
+        user = np.arange(shape[-1])
+        block = counter_uniform(self.key, np.expand_dims(env, -1), user[:, None],
+                                self.step[..., None] + np.arange(self.block_steps))
+        self.block = block.reshape((self.step.size, self.block_steps, 2))
+        self.start = self.step.reshape(-1).copy()
+        self.end = self.start + self.block_steps
+
+    # mask에 해당하는 사용자들의 이번 스텝 난수 (사용자 순서대로 (각도, 반경) 비율)
+    def _draw(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        if self.step is None or self.step.shape != mask.shape:
+            self._allocate(mask.shape)
+
+        lanes = np.flatnonzero(mask)
+        step = self.step.reshape(-1)
+        counter = step[lanes]
+        if ((counter >= self.end[lanes]) | (counter < self.start[lanes])).any():
+            self._refill()
+        step[lanes] = counter + 1
+        return self.block[lanes, counter - self.start[lanes]]
+
+    # mask에 해당하는 사용자들의 이번 스텝 위치 (사용자 순서대로)
+    def positions(self, mask):
+        u = self._draw(mask)
+        theta = 2 * math.pi * u[:, 0]
+        r = self.radius * u[:, 1]
+        return self.bs_x + r * np.cos(theta), self.bs_y + r * np.sin(theta)
+
+    # mask에 해당하는 사용자들의 이번 스텝 BS와의 거리 (각도와 무관하게 반경)
+    def distances(self, mask):
+        return self.radius * self._draw(mask)[:, 1]
+
+
+class UniformAreaPlacement(BlockPlacement):
+    # 매 스텝 사각형 영역 [x_min, x_max] x [y_min, y_max] 안에 사용자를 균일하게 다시 배치
+    def __init__(self, x_min, x_max, y_min, y_max, block_size=65536):
+        super(UniformAreaPlacement, self).__init__(block_size)
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+
+    def _draw(self, size):
+        return self.rng.uniform(self.x_min, self.x_max, size), self.rng.uniform(self.y_min, self.y_max, size)
+
+
+class ChannelSampler:
+    # 사용자 위치(placement)와 경로 손실 모델(model)을 묶어 모든 사용자의 Data Rate를 한 번에 계산
+    # 난수는 시드를 준 np.random.Generator 하나에서만 뽑음
+    def __init__(self, placement=None, model=None, seed=None):
+        self.placement = placement if placement is not None else UniformDiscPlacement()
+        self.model = model if model is not None else PathLossModel()
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.placement.seed(self.rng)
+
+    # 에피소드 시작 시 배치 초기화 (index: 초기화할 환경/사용자)
+    def reset(self, index=Ellipsis):
+        self.placement.reset(index)
+
+    # 난수 생성기와 배치의 상태 (restore로 되돌리면 같은 값을 다시 뽑음)
+    def snapshot(self):
+        return self.rng.bit_generator.state, self.placement.snapshot()
+
+    def restore(self, snapshot):
+        rng_state, placement_state = snapshot
+        self.rng.bit_generator.state = rng_state
+        self.placement.restore(placement_state)
+
+    # 현재 상태에서 갈라지는 독립된 복사본 (난수 생성기도 따로 가짐)
+    def clone(self):
+        other = copy.copy(self)
+        other.rng = clone_rng(self.rng)
+        other.placement = self.placement.clone(other.rng)
+        return other
+
+    # mask에 해당하는 사용자들의 이번 스텝 링크 상태 (첫 값은 거리, 나머지는 채널별)
+    def link(self, mask):
+        return (self.placement.distances(mask),)
+
+    # 링크 상태 -> Data Rate (Kbps), bandwidth/power는 (..., 사용자 수)로 여러 할당 후보를 한 번에 줄 수 있음
+    def link_rate(self, bandwidth, power, link):
+        return self.model.data_rate(bandwidth, power, link[0])
+
+    # 다음 sample에서 쓰일 링크 상태 (채널 상태는 바뀌지 않음)
+    def peek(self, mask):
+        return self.clone().link(mask)
+
+    # bandwidth, power: mask에 해당하는 사용자들의 할당 비율 (사용자 순서대로)
+    # 반환값: Data Rate (Kbps), 거리 (m)
+    def sample(self, bandwidth, power, mask):
+        link = self.link(mask)
+        return self.link_rate(bandwidth, power, link), link[0]
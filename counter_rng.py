@@ -0,0 +1,54 @@
+import numpy as np
+
+# Philox4x32-10 상수 (Salmon et al., "Parallel random numbers: as easy as 1, 2, 3")
+PHILOX_M0 = 0xD2511F53
+PHILOX_M1 = 0xCD9E8D57
+PHILOX_W0 = 0x9E3779B9
+PHILOX_W1 = 0xBB67AE85
+MASK32 = 0xFFFFFFFF
+
+# 카운터 네 번째 워드 = (에피소드 << STREAM_BITS) | 스트림 번호
+STREAM_BITS = 8
+
+# 배열 연산용 uint64 상수 (파이썬 정수를 섞으면 연산마다 변환 비용이 듦)
+_M = np.array([PHILOX_M0, PHILOX_M1], dtype=np.uint64)
+_MASK32 = np.uint64(MASK32)
+_SHIFT = np.uint64(32)
+_HIGH = np.uint64(5)
+_LOW = np.uint64(6)
+
+
+# 카운터 기반 난수 (Philox4x32-10)
+# counter: 워드 4개 (각각 임의 모양의 정수 배열, 32비트), key: 정수 2개 -> 같은 모양의 uint64 배열 4개 (값은 32비트)
+# 같은 (key, counter)는 어디서 몇 번째로 호출하든 같은 값이므로 순서와 무관하게 원하는 만큼 한 번에 뽑을 수 있음
+def philox4x32(counter, key, rounds=10):
+    c0, c1, c2, c3 = np.broadcast_arrays(*(np.asarray(word, dtype=np.uint64) & _MASK32 for word in counter))
+    # 라운드마다 곱하는 워드 쌍 (c0, c2)과 섞는 워드 쌍 (c1, c3)을 (2, ...) 배열로 묶어 한 번에 계산
+    a = np.stack((c0, c2))
+    b = np.stack((c1, c3))
+    multiplier = _M.reshape((2,) + (1,) * c0.ndim)
+    k0, k1 = int(key[0]) & MASK32, int(key[1]) & MASK32
+    for r in range(rounds):
+        round_key = np.array([(k0 + r * PHILOX_W0) & MASK32, (k1 + r * PHILOX_W1) & MASK32], dtype=np.uint64)
+        product = a * multiplier
+        a = (product >> _SHIFT)[::-1] ^ b ^ round_key.reshape(multiplier.shape)
+        b = (product & _MASK32)[::-1]
+    return a[0], b[0], a[1], b[1]
+
+
+# 시드 -> Philox 키 (None이면 OS 엔트로피), np.random.Generator를 주면 거기서 뽑음 (ChannelSampler의 시드를 이어받을 때)
+def stream_key(seed=None):
+    if isinstance(seed, np.random.Generator):
+        return tuple(seed.integers(0, MASK32 + 1, 2).tolist())
+    return tuple(np.random.SeedSequence(seed).generate_state(2).tolist())
+
+
+# (환경, 사용자, 스텝, 에피소드, 스트림)별 [0, 1) 균일 난수 2개 -> (..., 2)
+# 인자는 서로 브로드캐스트되는 정수 배열, 스트림은 같은 (환경, 사용자, 스텝)에서 용도별로 나눠 쓰는 번호 (2^STREAM_BITS개)
+def counter_uniform(key, env, user, step, episode=0, stream=0):
+    episode = np.asarray(episode, dtype=np.uint64)
+    words = philox4x32((env, user, step, (episode << np.uint64(STREAM_BITS)) | np.uint64(stream)), key)
+    # 워드 두 개로 53비트 실수 하나
+    first = ((words[0] >> _HIGH) * 67108864.0 + (words[1] >> _LOW)) / 9007199254740992.0
+    second = ((words[2] >> _HIGH) * 67108864.0 + (words[3] >> _LOW)) / 9007199254740992.0
+    return np.stack((first, second), axis=-1)
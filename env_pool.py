@@ -0,0 +1,261 @@
+import os
+import time
+import pickle
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from gym import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+from vectorized_streaming import VectorizedVideoStreaming
+from channel import ChannelSampler, CounterDiscPlacement
+from bitrate_ladder import DEFAULT_LADDER
+
+# 워커 명령 (한 바이트 명령 + 관측값 버퍼 번호)
+STEP = b's'
+RESET = b'r'
+SEED = b'S'
+CLOSE = b'c'
+# 엔진 속성/메서드 명령 (한 바이트 명령 + pickle한 인자, 응답은 pickle한 (성공 여부, 결과 또는 예외))
+GET_ATTR = b'g'
+SET_ATTR = b'a'
+ENV_METHOD = b'm'
+
+
+def _create_shared(shape, dtype):
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _attach_shared(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+# 워커 프로세스: 자기 몫의 환경(start:stop)을 VectorizedVideoStreaming 하나로 진행
+# 행동/관측값/보상/종료 여부는 공유 메모리로 주고받고 파이프로는 명령만 전달
+# 모든 워커가 같은 시드로 채널 키를 만들고 환경 번호는 start부터 이어 쓰므로, 워커 수와 무관하게 한 프로세스에서 돌린 것과 같은 결과
+def _worker(conn, specs, start, stop, env_kwargs, seed):
+    attached = {key: _attach_shared(spec) for key, spec in specs.items()}
+    arrays = {key: array for key, (_, array) in attached.items()}
+
+    actions = arrays['actions'][start:stop]
+    observations = [arrays['obs0'][start:stop], arrays['obs1'][start:stop]]
+    terminal_observations = arrays['terminal_obs'][start:stop]
+    rewards = arrays['rewards'][start:stop]
+    dones = arrays['dones'][start:stop]
+
+    channel = ChannelSampler(CounterDiscPlacement(1000, first_env=start), seed=seed)
+    engine = VectorizedVideoStreaming(num_envs=stop - start, channel=channel, **env_kwargs)
+
+    try:
+        while True:
+            command = conn.recv_bytes()
+            kind = command[:1]
+            reply = b''
+
+            if kind == STEP:
+                out = observations[command[1]]
+                _, step_rewards, step_dones = engine.step_batch(actions, out=out)
+                rewards[:] = step_rewards
+                dones[:] = step_dones
+
+                # 끝난 환경은 마지막 관측값을 남기고 자동 초기화
+                if step_dones.any():
+                    terminal_observations[step_dones] = out[step_dones]
+                    engine.reset_envs(step_dones)
+                    engine._get_state(out, envs=step_dones)
+            elif kind == RESET:
+                engine.reset_envs(np.ones(stop - start, dtype=bool))
+                engine._get_state(observations[command[1]])
+            elif kind == SEED:
+                engine.channel.seed(int(command[1:]))
+            elif kind in (GET_ATTR, SET_ATTR, ENV_METHOD):
+                try:
+                    name, args, kwargs = pickle.loads(command[1:])
+                    if kind == GET_ATTR:
+                        result = getattr(engine, name)
+                    elif kind == SET_ATTR:
+                        result = setattr(engine, name, args[0])
+                    else:
+                        result = getattr(engine, name)(*args, **kwargs)
+                    reply = pickle.dumps((True, result))
+                except Exception as e:
+                    reply = pickle.dumps((False, e))
+            elif kind == CLOSE:
+                break
+
+            conn.send_bytes(reply)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del actions, observations, terminal_observations, rewards, dones, arrays
+        for shm, _ in attached.values():
+            shm.close()
+
+
+class SharedMemoryVecEnv(VecEnv):
+    # 여러 프로세스에 환경을 나눠 진행하는 VecEnv, model.learn에 그대로 넣어 사용
+    # 예) PPO("MlpPolicy", SharedMemoryVecEnv(num_envs=64)).learn(100000)
+    def __init__(self, num_envs, n_workers=None, max_chunk_num=20, num_users=3, data_availability=2000, seed=None, ladder=None, start_method=None):
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, num_envs))
+
+        if ladder is None:
+            ladder = DEFAULT_LADDER
+
+        action_space = spaces.MultiDiscrete([10, 10, len(ladder)] * num_users)
+        observation_space = spaces.Box(low=0.1, high=100000, shape=(4 * num_users,), dtype=np.float32)
+        super(SharedMemoryVecEnv, self).__init__(num_envs, observation_space, action_space)
+
+        shapes = {
+            'actions': ((num_envs, 3 * num_users), np.int64),
+            'obs0': ((num_envs, 4 * num_users), np.float32),
+            'obs1': ((num_envs, 4 * num_users), np.float32),
+            'terminal_obs': ((num_envs, 4 * num_users), np.float32),
+            'rewards': ((num_envs,), np.float32),
+            'dones': ((num_envs,), np.bool_),
+        }
+        self.shms = {}
+        self.arrays = {}
+        specs = {}
+        for key, (shape, dtype) in shapes.items():
+            self.shms[key], self.arrays[key] = _create_shared(shape, dtype)
+            specs[key] = (self.shms[key].name, shape, np.dtype(dtype).str)
+
+        # SB3는 직전 관측값을 들고 있으므로 관측값 버퍼 두 개를 번갈아 사용
+        self.buf_index = 0
+
+        # 에피소드 통계 (VecMonitor와 같은 'episode' 정보를 infos에 기록)
+        self.episode_returns = np.zeros(num_envs)
+        self.episode_lengths = np.zeros(num_envs, dtype=np.int64)
+        self.t_start = time.time()
+
+        env_kwargs = dict(max_chunk_num=max_chunk_num, num_users=num_users, data_availability=data_availability, ladder=ladder)
+        seed_sequence = np.random.SeedSequence(seed)
+        bounds = np.linspace(0, num_envs, n_workers + 1).astype(int)
+        self.bounds = bounds # 워커 rank가 맡은 환경 구간은 [bounds[rank], bounds[rank + 1])
+
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        self.remotes = []
+        self.processes = []
+        try:
+            for rank in range(n_workers):
+                remote, work_remote = ctx.Pipe()
+                process = ctx.Process(target=_worker, args=(work_remote, specs, bounds[rank], bounds[rank + 1], env_kwargs, seed_sequence), daemon=True)
+                process.start()
+                work_remote.close()
+                self.remotes.append(remote)
+                self.processes.append(process)
+        except BaseException:
+            # 워커를 다 띄우지 못하면 띄운 워커와 공유 메모리를 정리하고 다시 발생
+            for process in self.processes:
+                process.terminate()
+                process.join()
+            self.arrays = {}
+            for shm in self.shms.values():
+                shm.close()
+                shm.unlink()
+            raise
+
+        self.waiting = False
+        self.closed = False
+
+    def _broadcast(self, command):
+        for remote in self.remotes:
+            remote.send_bytes(command)
+
+    def _wait(self):
+        for remote in self.remotes:
+            remote.recv_bytes()
+
+    def reset(self):
+        self.buf_index ^= 1
+        self._broadcast(RESET + bytes([self.buf_index]))
+        self._wait()
+        self.episode_returns[:] = 0
+        self.episode_lengths[:] = 0
+
+        return self.arrays['obs%d' % self.buf_index]
+
+    def step_async(self, actions):
+        self.arrays['actions'][:] = np.asarray(actions).reshape(self.arrays['actions'].shape)
+        self.buf_index ^= 1
+        self._broadcast(STEP + bytes([self.buf_index]))
+        self.waiting = True
+
+    def step_wait(self):
+        self._wait()
+        self.waiting = False
+
+        obs = self.arrays['obs%d' % self.buf_index]
+        rewards = self.arrays['rewards'].copy()
+        dones = self.arrays['dones'].copy()
+
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]['terminal_observation'] = self.arrays['terminal_obs'][i].copy()
+            infos[i]['episode'] = {'r': self.episode_returns[i], 'l': int(self.episode_lengths[i]),
+                                   't': round(time.time() - self.t_start, 6)}
+        self.episode_returns[dones] = 0
+        self.episode_lengths[dones] = 0
+
+        return obs, rewards, dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self._wait()
+        self._broadcast(CLOSE)
+        for process in self.processes:
+            process.join()
+
+        self.arrays = {}
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.closed = True
+
+    def seed(self, seed=None):
+        # 모든 워커가 같은 시드 (VideoStreamingVecEnv.seed와 같은 결과, 없으면 한 번 뽑은 엔트로피를 공유)
+        worker_seed = seed if seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+        for remote in self.remotes:
+            remote.send_bytes(SEED + str(worker_seed).encode())
+        self._wait()
+        return [seed] * self.num_envs
+
+    # indices의 환경을 맡은 워커들의 엔진에 명령을 보내고 환경마다 결과를 돌려줌
+    # 한 워커의 환경들은 엔진 하나를 공유하므로 워커마다 한 번만 실행하고 (VideoStreamingVecEnv와 같은 엔진 단위 속성),
+    # 워커에서 난 예외는 여기서 다시 발생시킴
+    def _engine_call(self, kind, name, args=(), kwargs=None, indices=None):
+        ranks = (np.searchsorted(self.bounds, list(self._get_indices(indices)), side='right') - 1).tolist()
+        targets = sorted(set(ranks))
+        command = kind + pickle.dumps((name, args, kwargs or {}))
+        for rank in targets:
+            self.remotes[rank].send_bytes(command)
+        results = {rank: pickle.loads(self.remotes[rank].recv_bytes()) for rank in targets}
+        for ok, value in results.values():
+            if not ok:
+                raise value
+        return [results[rank][1] for rank in ranks]
+
+    def get_attr(self, attr_name, indices=None):
+        return self._engine_call(GET_ATTR, attr_name, indices=indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._engine_call(SET_ATTR, attr_name, (value,), indices=indices)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._engine_call(ENV_METHOD, method_name, method_args, method_kwargs, indices=indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
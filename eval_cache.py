@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+# 결과에 영향을 주는 코드 (내용이 바뀌면 모든 캐시 항목이 무효가 됨, 그 밖의 파일 변경은 캐시에 영향 없음)
+SIMULATOR_MODULES = (
+    'vectorized_streaming.py', 'playback_buffer.py', 'bitrate_ladder.py', 'channel.py', 'counter_rng.py',
+    'multicell.py', 'mobility.py', 'trace_source.py', 'population.py', 'obs_normalizer.py',
+    'streaming_vec_env.py', 'baselines.py', 'experiments.py',
+)
+# 저장 형식이나 키 규칙이 바뀌면 올림
+CACHE_VERSION = 1
+
+_code_fingerprint = None
+
+
+# SIMULATOR_MODULES 내용의 해시 (프로세스마다 한 번 계산)
+def code_fingerprint():
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in SIMULATOR_MODULES:
+            path = os.path.join(root, name)
+            digest.update(name.encode())
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        _code_fingerprint = digest.hexdigest()
+    return _code_fingerprint
+
+
+# 설정/정책 값 -> 해시에 넣을 수 있는 결정적인 JSON 값
+# 배열은 dtype/모양/내용의 해시, state_dict가 있는 객체(torch 모듈, SB3 정책)는 가중치,
+# 그 밖의 객체는 클래스 이름과 속성 (난수 생성기 상태는 평가 시 다시 시드하므로 제외)
+def canonical(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {'__array__': [value.dtype.str, list(value.shape), hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()]}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in sorted(value.items(), key=lambda pair: str(pair[0]))}
+    if isinstance(value, np.random.Generator):
+        return '__rng__'
+    if hasattr(value, 'state_dict'):
+        state = value.state_dict()
+        return {'__weights__': type(value).__qualname__,
+                'state': {name: canonical(tensor.detach().cpu().numpy() if hasattr(tensor, 'detach') else tensor)
+                          for name, tensor in state.items()}}
+    if hasattr(value, '__dict__'):
+        return {'__object__': f"{type(value).__module__}.{type(value).__qualname__}", 'attributes': canonical(vars(value))}
+    return repr(value)
+
+
+# 파일 내용의 해시 (저장된 정책 파일 등)
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EvalCache:
+    # 평가 결과를 (시뮬레이터 코드 + 설정 + 시드 + 정책 가중치)의 해시로 찾는 디스크 캐시
+    # 항목 하나가 JSON 파일 하나 (root/키 앞 두 글자/키.json), 읽을 때 수정 시각을 갱신하고
+    # 전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은 항목부터 지움 (LRU)
+    # 여러 프로세스가 같은 디렉터리를 써도 되도록 쓰기는 임시 파일 + 교체, 지우다 없어진 파일은 무시
+    # root가 None이면 아무것도 저장하지 않는 캐시 (항상 다시 평가)
+    def __init__(self, root=None, max_bytes=256 * 1024 * 1024):
+        self.root = os.path.expanduser(root) if root is not None else None
+        self.max_bytes = max_bytes
+        self.enabled = root is not None
+        self.hits = 0
+        self.misses = 0
+
+    # 환경 변수 STREAMING_EVAL_CACHE (디렉터리, off면 사용 안 함, 기본값 ~/.cache/streaming_eval),
+    # STREAMING_EVAL_CACHE_MB (최대 크기)로 설정
+    @classmethod
+    def from_env(cls):
+        root = os.environ.get('STREAMING_EVAL_CACHE', '~/.cache/streaming_eval')
+        enabled = root.lower() not in ('off', '0', 'false')
+        max_bytes = int(float(os.environ.get('STREAMING_EVAL_CACHE_MB', 256)) * 1024 * 1024)
+        return cls(root if enabled else None, max_bytes=max_bytes)
+
+    # 키 구성 값 -> 캐시 키
+    def key(self, kind, **parts):
+        payload = {'version': CACHE_VERSION, 'code': code_fingerprint(), 'kind': kind, 'parts': canonical(parts)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    # 저장된 값 (없으면 None)
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['value']
+
+    def put(self, key, value, kind=None):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'kind': kind, 'created': time.time(), 'value': value}, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    # 캐시에 있으면 그 값, 없으면 compute()를 저장하고 반환
+    def cached(self, kind, compute, **parts):
+        key = self.key(kind, **parts)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, kind)
+        return value
+
+    # (수정 시각, 크기, 경로) 목록
+    def entries(self):
+        result = []
+        if not self.enabled or not os.path.isdir(self.root):
+            return result
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    # 전체 크기가 max_bytes 이하가 될 때까지 오래된 항목부터 삭제
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_cache = None
+
+
+# 프로세스 전체에서 공유하는 평가 캐시 (처음 호출할 때 환경 변수로 만듦)
+def get_eval_cache():
+    global _cache
+    if _cache is None:
+        _cache = EvalCache.from_env()
+    return _cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="평가 결과 캐시 관리")
+    parser.add_argument('command', choices=('info', 'clear'))
+    args = parser.parse_args(argv)
+
+    cache = get_eval_cache()
+    if not cache.enabled:
+        print("evaluation cache is disabled (STREAMING_EVAL_CACHE=off)")
+        return 0
+    if args.command == 'clear':
+        cache.clear()
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{cache.root}: {len(entries)} entries, {total / 1024:.1f} KiB / {cache.max_bytes / 1024 / 1024:.0f} MiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
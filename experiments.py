@@ -0,0 +1,355 @@
+import os
+import sys
+import csv
+import json
+import time
+import signal
+import hashlib
+import argparse
+import itertools
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+# 실험 그리드 예) python experiments.py grid.json
+# {
+#   "output": "experiments/comparison",            결과 디렉터리 (runs/<run_id>/result.json, results.csv)
+#   "base": {"total_timesteps": 100000, "num_envs": 8, "max_chunk_num": 20, "num_users": 3},
+#   "grid": {"algo": ["A2C", "PPO"], "seed": [0, 1, 2], "data_availability": [1000, 2000, 5000]},
+#   "limits": {"memory_mb": 4096, "cpu_seconds": 36000, "timeout": 7200},
+#   "workers": null                                  null이면 CPU 수
+# }
+# grid의 모든 조합이 실행 하나가 되고, base는 모든 실행에 공통으로 들어가는 설정
+# base/grid에 "vec_env": "shm"을 넣으면 학습 환경을 여러 프로세스의 SharedMemoryVecEnv로 ("n_workers"로 프로세스 수, 기본값은 CPU 수)
+# 기본값 "vec"는 한 프로세스의 VideoStreamingVecEnv (두 환경의 결과는 같으므로 평가는 항상 VideoStreamingVecEnv)
+# UNSUPPORTED_ALGOS의 알고리즘은 학습하지 않고 status가 unsupported인 결과만 남김
+DEFAULT_GRID = {
+    'output': 'experiments/comparison',
+    'base': {
+        'total_timesteps': 100000,
+        'num_envs': 8,
+        'max_chunk_num': 20,
+        'num_users': 3,
+        'eval_episodes': 20,
+        'algo_kwargs': {},
+        'save_model': True,
+    },
+    'grid': {
+        'algo': ['A2C', 'PPO'],
+        'seed': [0, 1, 2],
+        'data_availability': [1000, 2000, 5000],
+    },
+    'limits': {},
+    'workers': None,
+}
+
+RESULT_FILE = 'result.json'
+
+# 환경의 MultiDiscrete 행동 공간을 지원하지 않는 알고리즘 (Discrete 전용) -> 사유
+UNSUPPORTED_ALGOS = {
+    'DQN': "unsupported action space: DQN needs a Discrete action space, the streaming env is MultiDiscrete",
+}
+
+
+def load_grid(path=None):
+    spec = json.loads(json.dumps(DEFAULT_GRID))
+    if path is not None:
+        with open(path) as f:
+            user_spec = json.load(f)
+        for key, value in user_spec.items():
+            if isinstance(value, dict) and isinstance(spec.get(key), dict) and key != 'grid':
+                spec[key].update(value)
+            else:
+                spec[key] = value
+    return spec
+
+
+# 그리드의 모든 조합 -> 실행 설정 목록 (grid 키 순서대로, run_id는 설정 내용으로 정해짐)
+def expand_grid(spec):
+    keys = list(spec['grid'])
+    runs = []
+    for values in itertools.product(*(spec['grid'][key] for key in keys)):
+        config = dict(spec['base'])
+        config.update(zip(keys, values))
+        label = ','.join(f"{key}={value}" for key, value in zip(keys, values))
+        digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:8]
+        safe = ''.join(c if c.isalnum() or c in '=-_.,' else '_' for c in label)
+        runs.append({'run_id': f"{safe}-{digest}", 'params': dict(zip(keys, values)), 'config': config})
+    return runs
+
+
+def write_json(path, value):
+    # 중간에 죽어도 반쯤 쓴 파일이 남지 않도록 임시 파일에 쓰고 교체
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(value, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_result(run_dir):
+    path = os.path.join(run_dir, RESULT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# 실행별 자원 제한 (자식 프로세스 안에서 호출, 메모리는 주소 공간, CPU는 초 단위)
+def apply_limits(limits):
+    try:
+        import resource
+    except ImportError:
+        return
+    if limits.get('memory_mb'):
+        size = int(limits['memory_mb']) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    if limits.get('cpu_seconds'):
+        seconds = int(limits['cpu_seconds'])
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 5))
+
+
+# VecEnv에서 정책으로 n_episodes개 에피소드를 돌려 보상 합계/길이 반환 (deterministic이면 결정적 행동)
+# baselines.run_episodes처럼 환경마다 정해진 개수의 에피소드만 세므로 빨리 끝나는 에피소드로 치우치지 않음
+def evaluate(model, env, n_episodes, deterministic=True):
+    returns, lengths = [], []
+    quota = [n_episodes // env.num_envs + (i < n_episodes % env.num_envs) for i in range(env.num_envs)]
+    counts = [0] * env.num_envs
+    episode_return = [0.0] * env.num_envs
+    episode_length = [0] * env.num_envs
+    obs = env.reset()
+    while len(returns) < n_episodes:
+        actions, _ = model.predict(obs, deterministic=deterministic)
+        obs, rewards, dones, _ = env.step(actions)
+        for i in range(env.num_envs):
+            episode_return[i] += float(rewards[i])
+            episode_length[i] += 1
+            if dones[i]:
+                if counts[i] < quota[i]:
+                    counts[i] += 1
+                    returns.append(episode_return[i])
+                    lengths.append(episode_length[i])
+                episode_return[i] = 0.0
+                episode_length[i] = 0
+    return returns, lengths
+
+
+# 저장된 SB3 모델 (예: streaming_agent.py의 comparison_ppo_v1)을 고정 시드의 VideoStreamingVecEnv에서 평가
+# 모델 파일 내용, 환경 설정, 시드가 같고 시뮬레이터 코드가 그대로면 평가 캐시(eval_cache)의 결과를 반환
+def evaluate_saved(path, algo='PPO', n_episodes=100, env_kwargs=None, num_envs=8, seed=0, cache=None):
+    from eval_cache import get_eval_cache, file_fingerprint
+
+    if not os.path.exists(path) and os.path.exists(path + '.zip'):
+        path += '.zip'
+    env_kwargs = dict(env_kwargs or {})
+    cache = cache if cache is not None else get_eval_cache()
+
+    def compute():
+        import numpy as np
+        import stable_baselines3
+        from streaming_vec_env import VideoStreamingVecEnv
+
+        model = getattr(stable_baselines3, algo).load(path, device='cpu')
+        env = VideoStreamingVecEnv(num_envs, seed=seed, **env_kwargs)
+        try:
+            returns, lengths = evaluate(model, env, n_episodes)
+        finally:
+            env.close()
+        return {
+            'eval_reward_mean': float(np.mean(returns)),
+            'eval_reward_std': float(np.std(returns)),
+            'eval_length_mean': float(np.mean(lengths)),
+            'returns': returns,
+            'lengths': lengths,
+        }
+
+    return cache.cached('saved_policy', compute, weights=file_fingerprint(path), algo=algo, n_episodes=n_episodes,
+                        env_kwargs=env_kwargs, num_envs=num_envs, seed=seed)
+
+
+# 실행 하나 (자식 프로세스): 학습 -> 평가 -> run_dir/result.json
+def train_run(run, run_dir, limits):
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    apply_limits(limits)
+
+    import numpy as np
+    import stable_baselines3
+    from streaming_vec_env import VideoStreamingVecEnv
+
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    config = run['config']
+    seed = config.get('seed')
+    env_kwargs = {'max_chunk_num': config['max_chunk_num'], 'num_users': config['num_users'],
+                  'data_availability': config['data_availability']}
+
+    start = time.perf_counter()
+    vec_env = config.get('vec_env', 'vec')
+    if vec_env == 'shm':
+        from env_pool import SharedMemoryVecEnv
+        env = SharedMemoryVecEnv(config['num_envs'], n_workers=config.get('n_workers'), seed=seed, **env_kwargs)
+    elif vec_env == 'vec':
+        env = VideoStreamingVecEnv(config['num_envs'], seed=seed, **env_kwargs)
+    else:
+        raise ValueError(f"unknown vec_env {vec_env!r}, expected 'vec' or 'shm'")
+    # 학습이 실패해도 풀의 워커 프로세스와 공유 메모리는 정리
+    try:
+        algo = getattr(stable_baselines3, config['algo'])
+        model = algo('MlpPolicy', env, seed=seed, verbose=0, **config.get('algo_kwargs', {}))
+        model.learn(total_timesteps=config['total_timesteps'])
+    finally:
+        env.close()
+    train_time = time.perf_counter() - start
+
+    eval_env = VideoStreamingVecEnv(config['num_envs'], seed=None if seed is None else seed + 10000, **env_kwargs)
+    returns, lengths = evaluate(model, eval_env, config['eval_episodes'])
+    eval_env.close()
+
+    if config.get('save_model'):
+        model.save(os.path.join(run_dir, 'model'))
+
+    train_returns = [info['r'] for info in model.ep_info_buffer] if model.ep_info_buffer else []
+    return {
+        'eval_reward_mean': float(np.mean(returns)),
+        'eval_reward_std': float(np.std(returns)),
+        'eval_length_mean': float(np.mean(lengths)),
+        'train_reward_mean': float(np.mean(train_returns)) if train_returns else None,
+        'train_time': train_time,
+        'timesteps_per_sec': config['total_timesteps'] / train_time,
+    }
+
+
+def _child(run, run_dir, limits):
+    result = {'run_id': run['run_id'], 'params': run['params'], 'config': run['config']}
+    try:
+        result['metrics'] = train_run(run, run_dir, limits)
+        result['status'] = 'ok'
+    except BaseException as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    write_json(os.path.join(run_dir, RESULT_FILE), result)
+
+
+# 아직 끝나지 않은 실행들을 workers개씩 각자 새 프로세스에서 실행 (자원 제한이 실행마다 따로 적용됨)
+# 이미 result.json이 있는 실행은 건너뛰므로 중단된 뒤 같은 명령으로 다시 실행하면 이어서 진행
+def run_grid(spec, workers=None, retry_failed=False, log=print):
+    output = spec['output']
+    limits = spec.get('limits') or {}
+    runs = expand_grid(spec)
+    workers = workers or spec.get('workers') or os.cpu_count() or 1
+    timeout = limits.get('timeout')
+
+    pending = []
+    for run in runs:
+        run_dir = os.path.join(output, 'runs', run['run_id'])
+        result = read_result(run_dir)
+        if result is not None and (result['status'] != 'failed' or not retry_failed):
+            continue
+        os.makedirs(run_dir, exist_ok=True)
+        reason = UNSUPPORTED_ALGOS.get(run['config'].get('algo'))
+        if reason is not None:
+            _record_crash(run, run_dir, reason, status='unsupported')
+            log(f"{run['run_id']}: unsupported ({reason})")
+            continue
+        pending.append((run, run_dir))
+    log(f"{len(runs)} runs, {len(runs) - len(pending)} done, {len(pending)} to run on {workers} workers")
+
+    ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+    active = {} # sentinel -> (process, run, run_dir, 시작 시각)
+    while pending or active:
+        while pending and len(active) < workers:
+            run, run_dir = pending.pop(0)
+            # 데몬 프로세스는 자식을 만들 수 없으므로 SharedMemoryVecEnv를 쓰는 실행만 데몬이 아님 (시간 초과 시 terminate는 동일)
+            process = ctx.Process(target=_child, args=(run, run_dir, limits), daemon=run['config'].get('vec_env', 'vec') != 'shm')
+            process.start()
+            active[process.sentinel] = (process, run, run_dir, time.monotonic())
+
+        wait(list(active), timeout=1.0)
+        now = time.monotonic()
+        for sentinel, (process, run, run_dir, started) in list(active.items()):
+            if process.is_alive():
+                if timeout and now - started > timeout:
+                    process.terminate()
+                    process.join()
+                    _record_crash(run, run_dir, f"timeout after {timeout} s")
+                    log(f"{run['run_id']}: timeout")
+                    del active[sentinel]
+                continue
+
+            process.join()
+            del active[sentinel]
+            result = read_result(run_dir)
+            if result is None:
+                # 자원 제한 등으로 프로세스가 죽어 결과를 못 남긴 경우
+                code = process.exitcode
+                reason = f"killed by {signal.Signals(-code).name}" if code is not None and code < 0 else f"exit code {code}"
+                result = _record_crash(run, run_dir, reason)
+            log(f"{run['run_id']}: {result['status']}" + (f" ({result['error']})" if result['status'] != 'ok' else ''))
+
+    return collect(output)
+
+
+def _record_crash(run, run_dir, reason, status='failed'):
+    result = {'run_id': run['run_id'], 'params': run['params'], 'config': run['config'],
+              'status': status, 'error': reason}
+    write_json(os.path.join(run_dir, RESULT_FILE), result)
+    return result
+
+
+# 모든 실행의 result.json을 모아 output/results.csv로 저장하고 행 목록 반환
+def collect(output):
+    rows = []
+    runs_dir = os.path.join(output, 'runs')
+    for run_id in sorted(os.listdir(runs_dir)) if os.path.isdir(runs_dir) else []:
+        result = read_result(os.path.join(runs_dir, run_id))
+        if result is None:
+            continue
+        row = {'run_id': run_id, 'status': result['status'], 'error': result.get('error', '')}
+        row.update(result['params'])
+        row.update(result.get('metrics') or {})
+        rows.append(row)
+
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    with open(os.path.join(output, 'results.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="알고리즘 x 시드 x 데이터 가용량 그리드 학습 실행기")
+    parser.add_argument('grid', nargs='?', help="그리드 JSON (없으면 A2C/PPO 기본 비교 그리드)")
+    parser.add_argument('--output', help="결과 디렉터리 (그리드의 output 대신)")
+    parser.add_argument('--workers', type=int, help="동시에 실행할 프로세스 수 (기본값은 CPU 수)")
+    parser.add_argument('--retry-failed', action='store_true', help="실패한 실행도 다시 실행")
+    parser.add_argument('--collect', action='store_true', help="실행하지 않고 results.csv만 다시 만듦")
+    parser.add_argument('--evaluate', metavar='MODEL', help="그리드 대신 저장된 모델만 평가 (평가 캐시 사용)")
+    parser.add_argument('--algo', default='PPO', help="--evaluate 모델의 알고리즘")
+    parser.add_argument('--episodes', type=int, default=100, help="--evaluate 에피소드 수")
+    parser.add_argument('--seed', type=int, default=0, help="--evaluate 환경 시드")
+    args = parser.parse_args(argv)
+
+    if args.evaluate:
+        result = evaluate_saved(args.evaluate, args.algo, args.episodes, seed=args.seed)
+        print(json.dumps({key: value for key, value in result.items() if key not in ('returns', 'lengths')}, indent=2))
+        return 0
+
+    spec = load_grid(args.grid)
+    if args.output:
+        spec['output'] = args.output
+    os.makedirs(spec['output'], exist_ok=True)
+
+    rows = collect(spec['output']) if args.collect else run_grid(spec, args.workers, args.retry_failed)
+    failed = sum(row['status'] == 'failed' for row in rows)
+    unsupported = sum(row['status'] == 'unsupported' for row in rows)
+    print(f"{len(rows)} results ({failed} failed, {unsupported} unsupported) -> {os.path.join(spec['output'], 'results.csv')}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
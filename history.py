@@ -0,0 +1,72 @@
+import copy
+import numpy as np
+
+class StepHistory:
+    # 사용자별 타임스텝 기록을 (사용자 수, 용량) 배열에 미리 할당해 두고 인덱스만 이동
+    # 리스트를 매 에피소드마다 새로 만들지 않고, reset은 길이만 0으로 되돌림
+    def __init__(self, num_users, fields, capacity):
+        self.num_users = num_users
+        self.fields = fields
+        self.capacity = capacity
+
+        self.data = {field: np.zeros((self.num_users, self.capacity)) for field in self.fields}
+        self.length = {field: [0] * self.num_users for field in self.fields} # 필드/사용자별 기록 개수
+
+    def reset(self):
+        for field in self.fields:
+            lengths = self.length[field]
+            for i in range(self.num_users):
+                lengths[i] = 0
+
+    def append(self, field, user, value):
+        lengths = self.length[field]
+        n = lengths[user]
+        if n == self.capacity:
+            self._grow()
+        self.data[field][user, n] = value
+        lengths[user] = n + 1
+
+    # 리스트 인덱싱과 같이 음수 인덱스 허용
+    def get(self, field, user, index):
+        n = self.length[field][user]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(f"{field} history index out of range")
+        return self.data[field][user, index].item()
+
+    def last(self, field, user):
+        return self.get(field, user, -1)
+
+    def count(self, field, user):
+        return self.length[field][user]
+
+    # 기록된 부분의 뷰 (복사 없음)
+    def values(self, field, user):
+        return self.data[field][user, :self.length[field][user]]
+
+    # 에피소드가 용량보다 길어지면 두 배로 늘림
+    def _grow(self):
+        self.capacity *= 2
+        for field in self.fields:
+            data = np.zeros((self.num_users, self.capacity))
+            data[:, :self.data[field].shape[1]] = self.data[field]
+            self.data[field] = data
+
+    # 기록된 부분만 복사 (restore는 용량이 모자라면 늘림)
+    def snapshot(self):
+        return {field: (self.data[field][:, :max(self.length[field], default=0)].copy(), list(self.length[field]))
+                for field in self.fields}
+
+    def restore(self, snapshot):
+        for field, (data, lengths) in snapshot.items():
+            while data.shape[1] > self.capacity:
+                self._grow()
+            self.data[field][:, :data.shape[1]] = data
+            self.length[field][:] = lengths
+
+    def clone(self):
+        other = copy.copy(self)
+        other.data = {field: data.copy() for field, data in self.data.items()}
+        other.length = {field: list(lengths) for field, lengths in self.length.items()}
+        return other
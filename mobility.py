@@ -0,0 +1,243 @@
+import copy
+import math
+import numpy as np
+
+class MobilityModel:
+    # 사용자 위치를 배열로 들고 있다가 매 스텝(positions/distances 호출마다) 조금씩 이동시키는 배치
+    # (UniformDiscPlacement처럼 ChannelSampler의 placement로 사용)
+    # BS와의 거리는 캐시해 두고 이번 스텝에 움직인 사용자만 다시 계산
+    # 상태 배열의 모양은 처음 받은 mask의 모양 (사용자 수 또는 (환경 수, 사용자 수))
+    STATE_FIELDS = ('x', 'y', 'distance') # snapshot에 들어가는 상태 배열
+    def __init__(self, radius=1000, bs_x=0, bs_y=0, dt=1.0):
+        self.radius = radius # 시작 위치를 뽑는 원의 반경 (m)
+        self.bs_x = bs_x
+        self.bs_y = bs_y
+        self.dt = dt # 한 스텝의 시간 (초)
+        self.rng = None
+        self.x = None
+
+    def seed(self, rng):
+        self.rng = rng
+        self.x = None
+
+    # 에피소드 시작 시 선택한 환경/사용자를 새 시작 위치에 배치
+    def reset(self, index=Ellipsis):
+        if self.x is not None:
+            self._place(index)
+
+    def snapshot(self):
+        if self.x is None:
+            return None
+        return {field: getattr(self, field).copy() for field in self.STATE_FIELDS}
+
+    def restore(self, snapshot):
+        if snapshot is None:
+            self.x = None
+            return
+        for field, values in snapshot.items():
+            setattr(self, field, values.copy())
+
+    # rng를 쓰는 복사본 (ChannelSampler.clone에서 사용)
+    def clone(self, rng):
+        other = copy.copy(self)
+        other.rng = rng
+        other.restore(self.snapshot())
+        return other
+
+    # mask에 해당하는 사용자들을 한 스텝 이동시키고 위치 반환 (사용자 순서대로)
+    def positions(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        if self.x is None or self.x.shape != mask.shape:
+            self._allocate(mask.shape)
+
+        moved = self._move(mask)
+        if moved.any():
+            self.distance[moved] = np.hypot(self.x[moved] - self.bs_x, self.y[moved] - self.bs_y)
+
+        return self.x[mask], self.y[mask]
+
+    # mask에 해당하는 사용자들을 한 스텝 이동시키고 BS와의 거리 반환
+    def distances(self, mask):
+        self.positions(mask)
+        return self.distance[mask]
+
+    def _allocate(self, shape):
+        self.x = np.zeros(shape)
+        self.y = np.zeros(shape)
+        self.distance = np.zeros(shape)
+        self._place(Ellipsis)
+
+    # 반경 안에 면적에 대해 균일한 시작 위치
+    def _uniform_disc(self, shape):
+        theta = self.rng.uniform(0, 2 * math.pi, shape)
+        r = self.radius * np.sqrt(self.rng.uniform(0, 1, shape))
+        return self.bs_x + r * np.cos(theta), self.bs_y + r * np.sin(theta)
+
+    def _place(self, index):
+        x, y = self._uniform_disc(self.x[index].shape)
+        self.x[index] = x
+        self.y[index] = y
+        self.distance[index] = np.hypot(x - self.bs_x, y - self.bs_y)
+
+    # mask의 사용자들을 이동시키고 실제로 움직인 사용자 마스크 반환 (하위 클래스에서 구현)
+    def _move(self, mask):
+        raise NotImplementedError
+
+
+class RandomWaypoint(MobilityModel):
+    # 반경 안의 임의 목적지를 골라 [speed_min, speed_max] (m/s) 속도로 직선 이동하고,
+    # 도착하면 pause 스텝 동안 멈춘 뒤 다음 목적지를 고름
+    # 구간마다 방향 단위벡터와 남은 거리를 저장해 두므로 이동 중에는 삼각함수/제곱근 계산이 없음
+    STATE_FIELDS = MobilityModel.STATE_FIELDS + ('unit_x', 'unit_y', 'leg_left', 'speed', 'pause_left')
+
+    def __init__(self, speed_min=0.5, speed_max=1.5, pause=0, radius=1000, bs_x=0, bs_y=0, dt=1.0):
+        super(RandomWaypoint, self).__init__(radius, bs_x, bs_y, dt)
+        self.speed_min = speed_min
+        self.speed_max = speed_max
+        self.pause = pause
+
+    def _allocate(self, shape):
+        self.unit_x = np.zeros(shape)
+        self.unit_y = np.zeros(shape)
+        self.leg_left = np.zeros(shape) # 목적지까지 남은 거리 (m)
+        self.speed = np.zeros(shape)
+        self.pause_left = np.zeros(shape, dtype=np.int64)
+        super(RandomWaypoint, self)._allocate(shape)
+
+    def _place(self, index):
+        super(RandomWaypoint, self)._place(index)
+        self.pause_left[index] = 0
+        selected = np.zeros(self.x.shape, dtype=bool)
+        selected[index] = True
+        self._new_leg(selected)
+
+    # selected 사용자들의 다음 목적지와 속도
+    def _new_leg(self, selected):
+        target_x, target_y = self._uniform_disc(np.count_nonzero(selected))
+        dx = target_x - self.x[selected]
+        dy = target_y - self.y[selected]
+        length = np.hypot(dx, dy)
+        scale = np.where(length > 0, 1 / np.where(length > 0, length, 1), 0)
+        self.unit_x[selected] = dx * scale
+        self.unit_y[selected] = dy * scale
+        self.leg_left[selected] = length
+        self.speed[selected] = self.rng.uniform(self.speed_min, self.speed_max, len(length))
+
+    def _move(self, mask):
+        paused = mask & (self.pause_left > 0)
+        self.pause_left[paused] -= 1
+        moving = mask & ~paused
+
+        step = np.minimum(self.speed[moving] * self.dt, self.leg_left[moving])
+        self.x[moving] += self.unit_x[moving] * step
+        self.y[moving] += self.unit_y[moving] * step
+        self.leg_left[moving] -= step
+
+        # 목적지에 도착한 사용자는 멈추고 다음 구간 준비
+        arrived = moving & (self.leg_left <= 0)
+        if arrived.any():
+            self.pause_left[arrived] = self.pause
+            self._new_leg(arrived)
+
+        return moving
+
+
+class ConstantVelocity(MobilityModel):
+    # 사용자마다 임의 방향, [speed_min, speed_max] (m/s) 속도로 등속 직선 이동
+    # 반경 밖으로 나가려 하면 원의 경계에서 반사
+    STATE_FIELDS = MobilityModel.STATE_FIELDS + ('vx', 'vy')
+
+    def __init__(self, speed_min=0.5, speed_max=1.5, radius=1000, bs_x=0, bs_y=0, dt=1.0):
+        super(ConstantVelocity, self).__init__(radius, bs_x, bs_y, dt)
+        self.speed_min = speed_min
+        self.speed_max = speed_max
+
+    def _allocate(self, shape):
+        self.vx = np.zeros(shape)
+        self.vy = np.zeros(shape)
+        super(ConstantVelocity, self)._allocate(shape)
+
+    def _place(self, index):
+        super(ConstantVelocity, self)._place(index)
+        shape = self.x[index].shape
+        heading = self.rng.uniform(0, 2 * math.pi, shape)
+        speed = self.rng.uniform(self.speed_min, self.speed_max, shape)
+        self.vx[index] = speed * np.cos(heading)
+        self.vy[index] = speed * np.sin(heading)
+
+    def _move(self, mask):
+        new_x = self.x[mask] + self.vx[mask] * self.dt
+        new_y = self.y[mask] + self.vy[mask] * self.dt
+        rel_x = new_x - self.bs_x
+        rel_y = new_y - self.bs_y
+        r = np.hypot(rel_x, rel_y)
+
+        outside = r > self.radius
+        if outside.any():
+            # 경계 법선에 대해 속도를 반사하고 위치는 경계 안으로 되돌림
+            nx = rel_x[outside] / r[outside]
+            ny = rel_y[outside] / r[outside]
+            vx = self.vx[mask]
+            vy = self.vy[mask]
+            dot = vx[outside] * nx + vy[outside] * ny
+            vx[outside] -= 2 * dot * nx
+            vy[outside] -= 2 * dot * ny
+            self.vx[mask] = vx
+            self.vy[mask] = vy
+            new_x[outside] = self.bs_x + nx * (2 * self.radius - r[outside])
+            new_y[outside] = self.bs_y + ny * (2 * self.radius - r[outside])
+
+        self.x[mask] = new_x
+        self.y[mask] = new_y
+
+        return mask & ((self.vx != 0) | (self.vy != 0))
+
+
+class TraceFollowing(MobilityModel):
+    # 기록된 좌표를 따라 이동: trace_x, trace_y는 (시간, 궤적 수) 배열 (1차원이면 궤적 하나)
+    # 사용자 i는 i % 궤적 수 번째 궤적을 따르고, random_offset이면 에피소드마다 시작 시점을 임의로 고름
+    # 궤적 끝에 도달하면 처음으로 돌아감
+    STATE_FIELDS = MobilityModel.STATE_FIELDS + ('track', 't')
+
+    def __init__(self, trace_x, trace_y, random_offset=False, bs_x=0, bs_y=0):
+        super(TraceFollowing, self).__init__(0, bs_x, bs_y)
+        trace_x = np.asarray(trace_x, dtype=np.float64)
+        trace_y = np.asarray(trace_y, dtype=np.float64)
+        if trace_x.ndim == 1:
+            trace_x = trace_x[:, None]
+            trace_y = trace_y[:, None]
+        if trace_x.shape != trace_y.shape or len(trace_x) == 0:
+            raise ValueError("trace_x and trace_y must be non-empty arrays of the same shape")
+
+        self.trace_x = trace_x
+        self.trace_y = trace_y
+        self.random_offset = random_offset
+
+    def _allocate(self, shape):
+        self.track = np.broadcast_to(np.arange(shape[-1]) % self.trace_x.shape[1], shape)
+        self.t = np.zeros(shape, dtype=np.int64)
+        super(TraceFollowing, self)._allocate(shape)
+
+    def _place(self, index):
+        shape = self.t[index].shape
+        self.t[index] = self.rng.integers(0, len(self.trace_x), shape) if self.random_offset else 0
+        t = self.t[index]
+        track = self.track[index]
+        self.x[index] = self.trace_x[t, track]
+        self.y[index] = self.trace_y[t, track]
+        self.distance[index] = np.hypot(self.x[index] - self.bs_x, self.y[index] - self.bs_y)
+
+    def _move(self, mask):
+        t = self.t[mask] + 1
+        t[t == len(self.trace_x)] = 0
+        self.t[mask] = t
+
+        track = self.track[mask]
+        new_x = self.trace_x[t, track]
+        new_y = self.trace_y[t, track]
+        moved = np.zeros(mask.shape, dtype=bool)
+        moved[mask] = (new_x != self.x[mask]) | (new_y != self.y[mask])
+        self.x[mask] = new_x
+        self.y[mask] = new_y
+
+        return moved
@@ -0,0 +1,225 @@
+import math
+import numpy as np
+
+from channel import ChannelSampler, PathLossModel, BlockPlacement
+
+class CellLayout:
+    # 기지국(사이트) 배치: 좌표 (m)와 사이트별 송신 전력 배율
+    # spacing은 인접 사이트 간 거리 (없으면 가장 가까운 사이트 간 거리의 중앙값)
+    def __init__(self, sites_x, sites_y, tx_power=1.0, spacing=None):
+        self.x = np.asarray(sites_x, dtype=np.float64).ravel()
+        self.y = np.asarray(sites_y, dtype=np.float64).ravel()
+        if len(self.x) == 0 or self.x.shape != self.y.shape:
+            raise ValueError("layout needs at least one site and matching x/y coordinates")
+
+        self.tx_power = np.broadcast_to(np.asarray(tx_power, dtype=np.float64), self.x.shape).copy()
+        self.spacing = float(spacing) if spacing is not None else self._nearest_spacing()
+
+    def __len__(self):
+        return len(self.x)
+
+    # rows x cols 정사각 격자 (원점 중심)
+    @classmethod
+    def square_grid(cls, rows, cols, spacing=1000, tx_power=1.0):
+        gx, gy = np.meshgrid(np.arange(cols) - (cols - 1) / 2, np.arange(rows) - (rows - 1) / 2)
+        return cls(gx.ravel() * spacing, gy.ravel() * spacing, tx_power, spacing)
+
+    # 원점 사이트를 중심으로 rings겹의 육각 격자 (사이트 수 1 + 3 * rings * (rings + 1))
+    @classmethod
+    def hex_grid(cls, rings, spacing=1000, tx_power=1.0):
+        q, r = [], []
+        for dq in range(-rings, rings + 1):
+            for dr in range(max(-rings, -dq - rings), min(rings, -dq + rings) + 1):
+                q.append(dq)
+                r.append(dr)
+        q = np.asarray(q, dtype=np.float64)
+        r = np.asarray(r, dtype=np.float64)
+        return cls(spacing * (q + r / 2), spacing * (math.sqrt(3) / 2) * r, tx_power, spacing)
+
+    # 사이트를 둘러싸는 사각형 (x_min, x_max, y_min, y_max), margin만큼 넓힘
+    def bounds(self, margin=0):
+        return self.x.min() - margin, self.x.max() + margin, self.y.min() - margin, self.y.max() + margin
+
+    def _nearest_spacing(self):
+        if len(self) == 1:
+            return 1000.0 # 단일 셀은 기존 반경
+
+        nearest = np.empty(len(self))
+        for start in range(0, len(self), 1024):
+            d = np.hypot(self.x[start:start + 1024, None] - self.x, self.y[start:start + 1024, None] - self.y)
+            d[np.arange(len(d)), np.arange(start, start + len(d))] = np.inf
+            nearest[start:start + len(d)] = d.min(axis=1)
+        return float(np.median(nearest))
+
+
+class GridIndex:
+    # 사이트를 cell_size 크기의 균일 격자 칸에 나누고, 칸마다 주변 3x3 칸의 사이트 목록을 미리 만들어 둠
+    # 어떤 점에서 cell_size 이내의 사이트는 반드시 그 점이 속한 칸의 후보 목록에 들어있음
+    # 조회 비용은 칸당 후보 수(사이트 밀도)에만 비례하고 전체 사이트 수와는 무관
+    def __init__(self, sites_x, sites_y, cell_size):
+        self.sites_x = sites_x
+        self.sites_y = sites_y
+        self.cell_size = float(cell_size)
+        # 사이트 바깥으로 한 칸씩 여유를 둬서, 격자 밖의 점은 모든 사이트와 cell_size보다 멀도록 함
+        self.x0 = sites_x.min() - self.cell_size
+        self.y0 = sites_y.min() - self.cell_size
+        self.nx = int((sites_x.max() - self.x0) // self.cell_size) + 2
+        self.ny = int((sites_y.max() - self.y0) // self.cell_size) + 2
+
+        cx, cy = self._cells(sites_x, sites_y)
+        buckets = [[] for _ in range(self.nx * self.ny)]
+        for site, c in enumerate((cy * self.nx + cx).tolist()):
+            buckets[c].append(site)
+
+        neighbors = []
+        for gy in range(self.ny):
+            for gx in range(self.nx):
+                sites = []
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        if 0 <= gx + dx < self.nx and 0 <= gy + dy < self.ny:
+                            sites.extend(buckets[(gy + dy) * self.nx + gx + dx])
+                neighbors.append(sorted(sites))
+
+        # (칸 수, 최대 후보 수) 테이블, 빈 자리는 -1
+        width = max(1, max(len(sites) for sites in neighbors))
+        self.table = np.full((self.nx * self.ny, width), -1, dtype=np.int64)
+        for c, sites in enumerate(neighbors):
+            self.table[c, :len(sites)] = sites
+
+        # 칸마다 그 칸 안의 사이트 (nearest의 고리 탐색용), 빈 자리는 -1
+        width = max(1, max(len(sites) for sites in buckets))
+        self.cell_table = np.full((self.nx * self.ny, width), -1, dtype=np.int64)
+        for c, sites in enumerate(buckets):
+            self.cell_table[c, :len(sites)] = sites
+
+    def _cells(self, x, y):
+        cx = np.clip(np.floor((x - self.x0) / self.cell_size), 0, self.nx - 1).astype(np.int64)
+        cy = np.clip(np.floor((y - self.y0) / self.cell_size), 0, self.ny - 1).astype(np.int64)
+        return cx, cy
+
+    # 점마다 후보 사이트 인덱스 (점 수, 최대 후보 수), 빈 자리는 -1
+    def candidates(self, x, y):
+        cx, cy = self._cells(x, y)
+        return self.table[cy * self.nx + cx]
+
+    # 칸 (0, 0)에서 체비셰프 거리가 정확히 r인 칸들의 (dx, dy)
+    @staticmethod
+    def _ring(r):
+        if r == 0:
+            return np.zeros((1, 2), dtype=np.int64)
+        k = np.arange(-r, r + 1)
+        side = k[1:-1]
+        dx = np.concatenate((k, k, np.full(len(side), -r), np.full(len(side), r)))
+        dy = np.concatenate((np.full(len(k), -r), np.full(len(k), r), side, side))
+        return np.stack((dx, dy), axis=1)
+
+    # 점마다 가장 가까운 사이트와 거리 (점이 속한 칸에서 고리를 한 겹씩 넓혀 가며 찾음)
+    # 고리 r까지 본 뒤 남은 사이트는 모두 r * cell_size보다 멀리 있으므로, 그보다 가까운 사이트를 찾은 점은 멈춤
+    # 비용은 가장 가까운 사이트까지의 칸 수에 비례하고 전체 사이트 수와는 무관
+    def nearest(self, x, y):
+        cx, cy = self._cells(x, y)
+        best = np.zeros(len(x), dtype=np.int64)
+        best_distance = np.full(len(x), np.inf)
+        pending = np.arange(len(x))
+        r = 0
+        while len(pending) and r <= max(self.nx, self.ny):
+            offsets = self._ring(r)
+            gx = cx[pending, None] + offsets[:, 0]
+            gy = cy[pending, None] + offsets[:, 1]
+            inside = (gx >= 0) & (gx < self.nx) & (gy >= 0) & (gy < self.ny)
+            sites = self.cell_table[np.where(inside, gy * self.nx + gx, 0)]
+            sites = np.where(inside[..., None], sites, -1).reshape(len(pending), -1)
+            valid = sites >= 0
+            sites = np.where(valid, sites, 0)
+            d = np.hypot(x[pending, None] - self.sites_x[sites], y[pending, None] - self.sites_y[sites])
+            d = np.where(valid, d, np.inf)
+
+            k = np.argmin(d, axis=1)
+            rows = np.arange(len(pending))
+            closer = d[rows, k] < best_distance[pending]
+            best[pending[closer]] = sites[rows, k][closer]
+            best_distance[pending[closer]] = d[rows, k][closer]
+
+            pending = pending[best_distance[pending] > r * self.cell_size]
+            r += 1
+        return best, best_distance
+
+
+class CoveragePlacement(BlockPlacement):
+    # 매 스텝 사이트 하나를 균일하게 고르고 그 사이트 반경 radius(m) 원 안에 사용자를 균일하게 다시 배치
+    # radius가 search_radius 이하이면 모든 사용자가 어떤 기지국의 탐색 반경 안에 있음 (MultiCellChannel의 기본 배치)
+    def __init__(self, layout, radius, block_size=65536):
+        super(CoveragePlacement, self).__init__(block_size)
+        self.layout = layout
+        self.radius = radius
+
+    def _draw(self, size):
+        site = self.rng.integers(0, len(self.layout), size)
+        theta = self.rng.uniform(0, 2 * math.pi, size)
+        r = self.radius * np.sqrt(self.rng.uniform(0, 1, size))
+        return self.layout.x[site] + r * np.cos(theta), self.layout.y[site] + r * np.sin(theta)
+
+
+class MultiCellChannel(ChannelSampler):
+    # 여러 기지국 환경의 채널 (ChannelSampler의 seed/reset/snapshot을 그대로 쓰므로 channel=로 바로 사용 가능)
+    # 사용자는 가장 가까운(nearest) 또는 수신 세기가 가장 큰(strongest) 기지국에 연결되고,
+    # search_radius 이내의 다른 기지국은 간섭으로 잡음에 더해짐
+    # 수신 세기, 신호, 간섭은 모두 경로 손실 이득 (PathLossModel.linear_gain, g0 / d^theta) 기준이고
+    # Data Rate는 PathLossModel.sinr_rate (단일 셀의 기존 data_rate 식은 쓰지 않음)
+    # 인접 기지국도 같은 자원에 같은 전력 비율을 쓴다고 보므로 간섭 = 할당 전력 x interference_factor x 기지국별 (송신 전력 배율 x 이득) 합
+    # 후보는 GridIndex로 찾고, 반경 안에 기지국이 하나도 없는 사용자는 GridIndex.nearest로 가장 가까운 기지국을 찾음
+    def __init__(self, layout, placement=None, model=None, association='nearest',
+                 search_radius=None, interference_factor=1.0, seed=None):
+        if association not in ('nearest', 'strongest'):
+            raise ValueError("association must be 'nearest' or 'strongest'")
+
+        self.layout = layout
+        self.model = model if model is not None else PathLossModel()
+        self.association = association
+        self.search_radius = search_radius if search_radius is not None else 1.5 * layout.spacing
+        self.interference_factor = interference_factor # 인접 기지국의 평균 활성 비율
+        self.index = GridIndex(layout.x, layout.y, self.search_radius)
+        # 기본 배치: 무작위 사이트 주변 min(사이트 간격, 탐색 반경) 원 안에 균일하게 (모든 사용자가 탐색 반경 안)
+        self.placement = placement if placement is not None else CoveragePlacement(layout, min(layout.spacing, self.search_radius))
+        self.last_serving = np.empty(0, dtype=np.int64) # 마지막 sample의 사용자별 연결 기지국
+        self.seed(seed)
+
+    # 위치 -> (연결 기지국, 연결 거리, 후보 인덱스, 후보별 수신 세기 (반경 밖/빈 자리는 0))
+    def associate(self, x, y):
+        candidates = self.index.candidates(x, y)
+        valid = candidates >= 0
+        sites = np.where(valid, candidates, 0)
+        distance = np.hypot(x[:, None] - self.layout.x[sites], y[:, None] - self.layout.y[sites])
+        near = valid & (distance <= self.search_radius)
+        strength = np.where(near, self.layout.tx_power[sites] * self.model.linear_gain(np.where(near, distance, 1.0)), 0.0)
+
+        if self.association == 'nearest':
+            best = np.argmin(np.where(near, distance, np.inf), axis=1)
+        else:
+            best = np.argmax(np.where(near, strength, -np.inf), axis=1)
+
+        rows = np.arange(len(x))
+        serving = sites[rows, best]
+        serving_distance = distance[rows, best]
+
+        # 반경 안에 기지국이 없는 사용자는 격자 고리 탐색으로 가장 가까운 기지국을 찾음 (간섭도 없음)
+        far = ~near.any(axis=1)
+        if far.any():
+            serving[far], serving_distance[far] = self.index.nearest(x[far], y[far])
+
+        return serving, serving_distance, sites, strength
+
+    # 링크 상태: (연결 기지국까지의 거리, 연결 기지국 송신 전력 배율, 할당 전력 1당 간섭 전력)
+    def link(self, mask):
+        x, y = self.placement.positions(mask)
+        serving, distance, sites, strength = self.associate(x, y)
+
+        interference = self.interference_factor * np.where(sites != serving[:, None], strength, 0.0).sum(axis=1)
+        self.last_serving = serving
+        return distance, self.layout.tx_power[serving], interference
+
+    def link_rate(self, bandwidth, power, link):
+        distance, tx_power, interference = link
+        signal = power * tx_power * self.model.linear_gain(distance)
+        return self.model.sinr_rate(bandwidth, signal, power * interference)
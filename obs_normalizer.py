@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class ObservationNormalizer:
+    # 관측값의 이동 평균/분산과 정규화 (VecNormalize의 관측값 정규화와 같은 공식)
+    # 엔진에 normalizer=로 넘기면 _get_state가 관측값 버퍼를 채운 직후 같은 버퍼에서 통계를 갱신하고 제자리 정규화함
+    # training이 아니면 통계는 고정하고 정규화만 함 (평가용)
+    def __init__(self, size, clip=10.0, epsilon=1e-8, training=True):
+        self.mean = np.zeros(size)
+        self.var = np.ones(size)
+        self.count = epsilon
+        self.clip = clip
+        self.epsilon = epsilon
+        self.training = training
+
+    # batch: (행, size), 기존 통계와 배치 통계를 병합
+    def update(self, batch):
+        batch_mean = batch.mean(axis=0, dtype=np.float64)
+        batch_var = batch.var(axis=0, dtype=np.float64)
+        batch_count = len(batch)
+
+        delta = batch_mean - self.mean
+        total = self.count + batch_count
+        m2 = self.var * self.count + batch_var * batch_count + np.square(delta) * self.count * batch_count / total
+        self.mean = self.mean + delta * batch_count / total
+        self.var = m2 / total
+        self.count = total
+
+    # obs: (size,) 또는 (행, size) 관측값 버퍼, 제자리에서 정규화
+    def __call__(self, obs):
+        batch = obs.reshape((-1, len(self.mean)))
+        if self.training:
+            self.update(batch)
+        batch -= self.mean
+        batch /= np.sqrt(self.var + self.epsilon)
+        np.clip(batch, -self.clip, self.clip, out=batch)
+        return obs
+
+    # 정규화된 관측값 -> 원래 값
+    def unnormalize(self, obs):
+        return obs * np.sqrt(self.var + self.epsilon) + self.mean
+
+    # 통계를 고정한 복사본 (엔진 clone용, 갈라진 엔진의 관측값이 학습 통계를 바꾸지 않음)
+    def clone(self):
+        other = ObservationNormalizer(len(self.mean), self.clip, self.epsilon, training=False)
+        other.mean = self.mean.copy()
+        other.var = self.var.copy()
+        other.count = self.count
+        return other
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, var=self.var, count=self.count, clip=self.clip, epsilon=self.epsilon)
+
+    @classmethod
+    def load(cls, path, training=False):
+        data = np.load(path)
+        normalizer = cls(len(data['mean']), float(data['clip']), float(data['epsilon']), training=training)
+        normalizer.mean = data['mean']
+        normalizer.var = data['var']
+        normalizer.count = float(data['count'])
+        return normalizer
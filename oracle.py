@@ -0,0 +1,273 @@
+import sys
+import time
+import argparse
+import itertools
+import numpy as np
+
+from vectorized_streaming import VectorizedVideoStreaming, round1
+
+# 오라클이 읽는 사용자별 상태 (엔진 종류와 무관하게 (사용자 수,) 배열)
+STATE_FIELDS = (
+    'last_quality_number', 'last_buffer', 'videobuffer', 'play_size', 'remaining_chunk',
+    'remaining_data', 'download_sum', 'download_floor_sum', 'current_chunk_num', 'quality_cap',
+)
+
+
+# VectorizedVideoStreaming의 env번째 환경 또는 VideoStreaming의 사용자별 상태
+def engine_state(engine, env=0):
+    if isinstance(engine, VectorizedVideoStreaming):
+        state = {field: getattr(engine, field)[env] for field in STATE_FIELDS if field != 'play_size'}
+        state['play_size'] = engine.play_wait.size[env]
+        state['time_step'] = int(engine.time_step[env])
+        return state
+
+    t = engine.time_step
+    users = [engine.users[i] for i in range(engine.num_users)]
+    history = engine.history
+    active = [user['current_chunk_num'] < engine.max_chunk_num for user in users]
+    state = {
+        'last_quality_number': np.array([engine.ladder.quality_number(history.get('video_quality', i, t - 1))
+                                         if t > 0 and active[i] else 0 for i in range(engine.num_users)]),
+        'last_buffer': np.array([history.get('buffer', i, t - 1) if t > 0 and active[i] else 0
+                                 for i in range(engine.num_users)], dtype=np.float64),
+        'play_size': engine.play_wait.size.copy(),
+        'remaining_data': np.array([history.last('monitor_data_availability', i) for i in range(engine.num_users)]),
+        'time_step': t,
+    }
+    state['quality_cap'] = np.array([user['quality_cap'] for user in users])
+    for field in ('videobuffer', 'remaining_chunk', 'download_sum', 'download_floor_sum', 'current_chunk_num'):
+        state[field] = np.array([user[field] for user in users], dtype=np.float64)
+    return state
+
+
+class StepOracle:
+    # 주어진 상태에서 다음 스텝의 QoE 합(calculate_qoe가 이번 스텝에 더하는 값)이 가장 큰 공동 액션을 찾는 오라클
+    # 다음 스텝의 채널은 channel.peek으로 미리 보고, 학습된 정책과 비교할 스텝별 상한으로 사용
+    #
+    # 사용자의 Data Rate는 대역폭/전력 할당으로만 정해지고, Data Rate가 정해지면 화질은 사용자마다 따로 고를 수 있으므로
+    # (대역폭 조합 x 전력 조합)만 탐색하고 화질은 후보마다 사용자별 최댓값을 씀
+    # - 정규화된 대역폭/전력 비율표는 다운로드 중인 사용자 구성마다 한 번 만들어 둠
+    #   (다운로드를 끝낸 사용자의 단계도 다른 사용자의 비율을 바꾸므로 포함하고, 같은 비율이 나오는 조합은 하나만 남김)
+    # - 사용자별 QoE는 calculate_download_chunk/calculate_qoe의 항을 그대로 따라 정수 Data Rate마다 표로 만들어 두고,
+    #   후보 평가는 표 조회로 대신함
+    # - 대역폭 조합마다 가장 큰 전력 비율로 얻는 Data Rate 이하에서의 표 최댓값으로 QoE 상한을 구해
+    #   상한이 큰 순서로 block_size개씩 평가하고, 남은 조합의 상한이 지금까지의 최댓값 이하가 되면 중단
+    # penalty는 사용자마다 한 번만 반영함 (엔진은 뒤 사용자에게 누적하지만 penalty가 나면 에피소드가 끝나므로
+    # penalty 없는 해가 있으면 결과는 같음)
+    # 탐색 공간은 다운로드 중인 사용자 수 N에 대해 100^N이므로 사용자 3~4명까지를 대상으로 함
+    def __init__(self, block_size=65536):
+        self.block_size = block_size
+        self.tables = {} # (사용자별 다운로드 여부) -> (단계 조합, 정규화 비율)
+
+    # 다운로드 중인 사용자 구성별 (단계 조합 (행, 사용자 수), 다운로드 중인 사용자의 비율 (행, 다운로드 사용자 수))
+    def _table(self, active):
+        key = tuple(active.tolist())
+        if key not in self.tables:
+            levels = np.array(list(itertools.product(range(10), repeat=len(active))), dtype=np.int64)
+
+            # 엔진과 같은 순서로 합을 구해야 비율이 비트 단위로 같음
+            weight = 0.1 * levels + 0.05
+            share = (weight / np.cumsum(weight, axis=1)[:, -1:])[:, active]
+            _, first = np.unique(share, axis=0, return_index=True)
+            first = np.sort(first)
+            self.tables[key] = (levels[first], share[first])
+        return self.tables[key]
+
+    # 사용자별 화질 후보 상수 (화질(p), kbps, 숫자)
+    def _rungs(self, ladder):
+        actions = np.arange(len(ladder))
+        return ladder.action_quality(actions), ladder.action_kbps(actions), ladder.quality_number(ladder.action_quality(actions))
+
+    # Data Rate d (임의 모양) -> 화질별 QoE (..., 화질 수), 이번 스텝에 QoE가 계산되지 않는 경우는 0
+    def _qoe(self, engine, state, i, d):
+        ladder = engine.ladder
+        quality, kbps, number = self._rungs(ladder)
+        chunk_length = engine.chunk_length
+        d = d[..., None].astype(np.float64)
+        t = state['time_step']
+
+        # calculate_download_chunk
+        chunk_size = kbps * chunk_length
+        Number_of_pdchunk = round1(d * chunk_length / chunk_size)
+        remaining_chunk = state['remaining_chunk'][i]
+        Number_of_pdchunk = np.where(Number_of_pdchunk >= remaining_chunk, round1(remaining_chunk), Number_of_pdchunk)
+
+        # 큐에 넣을 청크 개수 -> 이번 스텝에 QoE가 계산되는지
+        if t == 0:
+            put_queue = np.floor(Number_of_pdchunk)
+        else:
+            put_queue = np.rint(state['download_sum'][i] + Number_of_pdchunk) - state['download_floor_sum'][i]
+        counted = state['current_chunk_num'][i] + np.maximum(put_queue, 0) < engine.max_chunk_num + 1
+
+        data_left = state['remaining_data'][i] - (Number_of_pdchunk * chunk_size) / 8000
+
+        # 재생 후 버퍼에 다운로드한 만큼 추가
+        videobuffer = state['videobuffer'][i]
+        if videobuffer != 0 and state['play_size'][i] >= 5:
+            videobuffer -= chunk_length
+        videobuffer = videobuffer + chunk_length * Number_of_pdchunk
+
+        empty = videobuffer == 0
+        buffer_off_time = np.where(empty | (t == 0),
+                                   np.maximum(np.maximum(videobuffer - chunk_length, 0) + chunk_length - engine.buffer_capacity, 0), 0)
+        rebuffering_time = np.where(empty, np.maximum(chunk_length - videobuffer, 0), 0)
+
+        # calculate_qoe
+        low = 0.4 * data_left
+        penalty = -1000 * ((data_left > low) & (ladder.rate_quality(d) < quality)) - 1000 * (data_left < low)
+        quality_diff = -np.abs(state['last_quality_number'][i] - number)
+        buffer_diff = state['last_buffer'][i] - videobuffer
+        qoe = quality + d + quality_diff + buffer_diff + -np.abs(d - kbps)
+        QoE = qoe + -(buffer_off_time + rebuffering_time) + penalty
+
+        return np.where(counted, QoE, 0.0)
+
+    # 사용자 i의 Data Rate(정수 Kbps) 0..cap별 최대 QoE와 그때의 화질 액션 (limit: 후보들의 Data Rate 최댓값)
+    # 어느 화질이든 남은 청크를 모두 받고 Data Rate 항이 kbps로 고정되는 Data Rate 이상에서는 QoE가 변하지 않음
+    def _value_table(self, engine, state, i, limit):
+        ladder = engine.ladder
+        cap = int(max(state['remaining_chunk'][i] * ladder.kbps.max(), ladder.kbps.max(), ladder.rate_bins[-1])) + 1
+        cap = int(min(cap, limit))
+        qoe = self._qoe(engine, state, i, np.arange(cap + 1))
+        qoe[:, state['quality_cap'][i] + 1:] = -np.inf # 단말이 재생할 수 없는 화질은 고르지 않음
+        return qoe.max(axis=1), qoe.argmax(axis=1)
+
+    # 반환값: (액션 (3 * 사용자 수,), 예상 QoE 합, 평가한 (대역폭, 전력) 조합 수)
+    def _solve(self, engine, state, active, link):
+        num_users = len(active)
+        action = np.zeros((num_users, 3), dtype=np.int64)
+        if not active.any():
+            return action.reshape(-1), 0.0, 0
+
+        levels, share = self._table(active)
+        users = np.flatnonzero(active)
+        channel = engine.channel
+
+        # 대역폭 조합별 상한: 각 사용자의 가장 큰 전력 비율로 얻는 Data Rate 이하에서의 최대 QoE 합
+        top_rate = np.floor(channel.link_rate(share, share.max(axis=0), link))
+        tables = [self._value_table(engine, state, i, top_rate[:, k].max()) for k, i in enumerate(users)]
+        bound = np.zeros(len(share))
+        for k, (value, _) in enumerate(tables):
+            prefix = np.maximum.accumulate(value)
+            bound += prefix[np.minimum(top_rate[:, k], len(value) - 1).astype(np.int64)]
+        order = np.argsort(-bound, kind='stable')
+
+        best_value = -np.inf
+        best = None
+        evaluated = 0
+        rows_per_block = max(1, self.block_size // len(share))
+        for start in range(0, len(order), rows_per_block):
+            rows = order[start:start + rows_per_block]
+            rows = rows[bound[rows] > best_value]
+            if len(rows) == 0:
+                break
+
+            # (대역폭 행, 전력 행, 사용자) Data Rate -> QoE 표 인덱스
+            rate = np.floor(channel.link_rate(share[rows][:, None, :], share[None, :, :], link))
+            index = np.empty(rate.shape, dtype=np.int64)
+            total = np.zeros(rate.shape[:2])
+            for k, (value, _) in enumerate(tables):
+                index[..., k] = np.minimum(rate[..., k], len(value) - 1)
+                total += value[index[..., k]]
+            evaluated += total.size
+
+            flat = int(np.argmax(total))
+            if total.flat[flat] > best_value:
+                best_value = float(total.flat[flat])
+                b, p = np.unravel_index(flat, total.shape)
+                best = (rows[b], p, index[b, p])
+
+        b, p, index = best
+        action[:, 0] = levels[b]
+        action[:, 1] = levels[p]
+        action[users, 2] = [quality[index[k]] for k, (_, quality) in enumerate(tables)]
+        return action.reshape(-1), best_value, evaluated
+
+    # VideoStreaming 또는 VectorizedVideoStreaming(env번째 환경)의 최적 액션과 예상 QoE 합
+    def solve(self, engine, env=0):
+        if isinstance(engine, VectorizedVideoStreaming):
+            mask = engine.current_chunk_num < engine.max_chunk_num
+            link = engine.channel.peek(mask)
+            offset = int(np.count_nonzero(mask[:env]))
+            index = np.arange(offset, offset + int(np.count_nonzero(mask[env])))
+            active = mask[env]
+        else:
+            active = np.array([engine.users[i]['current_chunk_num'] < engine.max_chunk_num for i in range(engine.num_users)])
+            link = engine.channel.peek(active)
+            index = np.arange(int(active.sum()))
+        action, value, _ = self._solve(engine, engine_state(engine, env), active, tuple(v[index] for v in link))
+        return action, value
+
+    # VectorizedVideoStreaming의 모든 환경 (채널은 한 번만 미리 봄)
+    # 반환값: 액션 (환경 수, 3 * 사용자 수), 예상 QoE 합 (환경 수,)
+    def solve_batch(self, engine):
+        mask = engine.current_chunk_num < engine.max_chunk_num
+        link = engine.channel.peek(mask)
+        actions = np.zeros((engine.num_envs, 3 * engine.num_users), dtype=np.int64)
+        values = np.zeros(engine.num_envs)
+        offset = 0
+        for env in range(engine.num_envs):
+            n = int(np.count_nonzero(mask[env]))
+            index = np.arange(offset, offset + n)
+            offset += n
+            actions[env], values[env], _ = self._solve(engine, engine_state(engine, env), mask[env],
+                                                       tuple(v[index] for v in link))
+        return actions, values
+
+
+# 오라클 액션으로 n_episodes개 에피소드를 진행하며 (관측값, 액션, 예상 QoE 합)을 모음 (평가 데이터 라벨링)
+def label_episodes(engine, n_episodes, oracle=None):
+    oracle = oracle if oracle is not None else StepOracle()
+    observations, actions, values, returns = [], [], [], []
+    episode_return = np.zeros(engine.num_envs)
+    engine.reset()
+    obs = engine._get_state()
+
+    while len(returns) < n_episodes:
+        action, value = oracle.solve_batch(engine)
+        observations.append(obs.copy())
+        actions.append(action)
+        values.append(value)
+
+        obs, reward, done = engine.step_batch(action, out=obs)
+        episode_return += reward
+        if done.any():
+            returns.extend(episode_return[done].tolist())
+            episode_return[done] = 0
+            engine.reset_envs(done)
+            engine._get_state(obs, envs=done)
+
+    return {
+        'observations': np.concatenate(observations),
+        'actions': np.concatenate(actions),
+        'values': np.concatenate(values),
+        'returns': np.array(returns[:n_episodes]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="스텝별 최적 오라클로 에피소드를 진행하고 라벨 저장")
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--num-envs', type=int, default=16)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--data-availability', type=float, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="라벨을 저장할 .npz 경로")
+    args = parser.parse_args(argv)
+
+    engine = VectorizedVideoStreaming(args.chunks, args.users, args.data_availability, num_envs=args.num_envs, seed=args.seed)
+    start = time.perf_counter()
+    labels = label_episodes(engine, args.episodes)
+    elapsed = time.perf_counter() - start
+
+    steps = len(labels['actions'])
+    print(f"{len(labels['returns'])} episodes, {steps} steps in {elapsed:.1f} s ({1000 * elapsed / steps:.2f} ms/step), "
+          f"mean reward {labels['returns'].mean():.2f}")
+    if args.output:
+        np.savez(args.output, **labels)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
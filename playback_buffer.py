@@ -0,0 +1,70 @@
+import numpy as np
+
+class PlaybackBuffer:
+    # 사용자별 청크 재생 대기열 (queue.Queue 대체)
+    # 청크는 항상 연속된 번호로 들어오고 들어온 순서대로 재생되므로,
+    # 대기열을 [head, head + size) 구간으로 보고 다음 재생 청크 번호(head)와 개수(size)만 저장
+    # shape은 사용자 수 또는 (환경 수, 사용자 수)
+    # head, size를 주면 새로 할당하지 않고 그 배열(다른 상태 블록의 뷰 등)을 그대로 사용
+    def __init__(self, shape, capacity, head=None, size=None):
+        self.capacity = capacity # 대기열 최대 청크 수
+        self.head = head if head is not None else np.zeros(shape, dtype=np.int64) # 다음에 재생할 청크 번호
+        self.size = size if size is not None else np.zeros(shape, dtype=np.int64) # 대기 중인 청크 개수
+
+    # 대기열 비우기 (index를 주면 해당 사용자/환경만)
+    def reset(self, index=Ellipsis):
+        self.head[index] = 0
+        self.size[index] = 0
+
+    def qsize(self, user):
+        return int(self.size[user])
+
+    def empty(self, user):
+        return self.size[user] == 0
+
+    def put(self, user, chunk):
+        self.put_many(user, chunk, 1)
+
+    # first_chunk부터 count개의 연속된 청크를 넣음
+    def put_many(self, user, first_chunk, count):
+        if count <= 0:
+            return
+        size = self.size[user]
+        if size + count > self.capacity:
+            raise OverflowError("playback buffer is full")
+        if size == 0:
+            self.head[user] = first_chunk
+        elif first_chunk != self.head[user] + size:
+            raise ValueError("chunks must be queued in order")
+        self.size[user] = size + count
+
+    def get(self, user):
+        if self.size[user] == 0:
+            raise IndexError("playback buffer is empty")
+        chunk = int(self.head[user])
+        self.head[user] += 1
+        self.size[user] -= 1
+        return chunk
+
+    # 배열 버전: mask에 해당하는 사용자마다 first_chunk부터 count개씩 추가
+    def put_batch(self, mask, first_chunk, count):
+        size = self.size[mask]
+        count = np.maximum(count, 0)
+        if np.any(size + count > self.capacity):
+            raise OverflowError("playback buffer is full")
+        self.head[mask] = np.where(size == 0, first_chunk, self.head[mask])
+        self.size[mask] = size + count
+
+    # 배열 버전: mask에 해당하는 사용자마다 한 청크씩 재생하고 재생한 청크 번호 반환
+    def get_batch(self, mask):
+        chunk = self.head[mask]
+        self.head[mask] += 1
+        self.size[mask] -= 1
+        return chunk
+
+    def snapshot(self):
+        return self.head.copy(), self.size.copy()
+
+    def restore(self, snapshot):
+        np.copyto(self.head, snapshot[0])
+        np.copyto(self.size, snapshot[1])
@@ -0,0 +1,212 @@
+import sys
+import json
+import argparse
+from collections import OrderedDict
+import numpy as np
+
+# 사용자 속성 (생성 순서이자 속성별 난수 스트림 번호)
+# data_availability: 데이터 가용량 (MB) / distance: BS까지의 거리 (m) / max_quality: 단말이 재생할 수 있는 최고 화질 (p)
+ATTRIBUTES = ('data_availability', 'distance', 'max_quality')
+
+# 시나리오 예) {"seed": 0,
+#              "data_availability": {"dist": "randint", "low": 500, "high": 1000},
+#              "distance": {"dist": "uniform_disc", "radius": 1000},
+#              "max_quality": {"dist": "choice", "values": [720, 1080, 1440], "p": [0.2, 0.5, 0.3]}}
+# 빠진 속성은 아래 기본값 (buffer.py의 기존 데이터 가용량, 반경 1km 균일 배치, 단말 제한 없음)
+DEFAULT_SCENARIO = {
+    'data_availability': {'dist': 'randint', 'low': 500, 'high': 1000},
+    'distance': {'dist': 'uniform_disc', 'radius': 1000},
+    'max_quality': {'dist': 'constant', 'value': 1440},
+}
+
+
+def _clip(values, spec):
+    if 'min' in spec or 'max' in spec:
+        values = np.clip(values, spec.get('min', -np.inf), spec.get('max', np.inf))
+    return values
+
+
+# 분포 이름 -> (난수 생성기, 개수, 설정) -> 값 배열
+DISTRIBUTIONS = {
+    'constant': lambda rng, size, spec: np.full(size, float(spec['value'])),
+    'uniform': lambda rng, size, spec: rng.uniform(spec['low'], spec['high'], size),
+    'randint': lambda rng, size, spec: rng.integers(spec['low'], spec['high'] + 1, size).astype(np.float64), # high 포함
+    'normal': lambda rng, size, spec: _clip(rng.normal(spec['mean'], spec['std'], size), spec),
+    'lognormal': lambda rng, size, spec: _clip(rng.lognormal(spec['mean'], spec['sigma'], size), spec),
+    'choice': lambda rng, size, spec: rng.choice(np.asarray(spec['values'], dtype=np.float64), size, p=spec.get('p')),
+    # 반경 radius 원 안 균일 배치의 거리 (min 미만은 min)
+    'uniform_disc': lambda rng, size, spec: np.maximum(spec['radius'] * np.sqrt(rng.uniform(0, 1, size)), spec.get('min', 1.0)),
+}
+
+
+def load_scenario(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class Population:
+    # 시나리오의 분포에서 사용자를 필요할 때만 만들어 주는 가상 모집단 (전체를 메모리에 만들지 않음)
+    # 사용자 번호 k의 속성은 (seed, k // block_size 블록, 속성) 별 난수 스트림에서만 정해지므로
+    # 어느 프로세스에서 어떤 순서로 꺼내도 같은 값 (병렬 스윕은 번호 구간만 나눠 가지면 됨)
+    # block_size도 스트림 정의의 일부이므로 같은 모집단을 쓰려면 seed와 block_size를 함께 맞춰야 함
+    # 최근에 만든 블록 cache_blocks개는 보관해 두고 다시 씀
+    def __init__(self, scenario=None, seed=None, block_size=4096, cache_blocks=8):
+        scenario = dict(scenario or {})
+        if seed is None:
+            seed = scenario.get('seed', 0)
+        self.specs = {}
+        for attribute in ATTRIBUTES:
+            spec = scenario.get(attribute, DEFAULT_SCENARIO[attribute])
+            if not isinstance(spec, dict):
+                spec = {'dist': 'constant', 'value': spec}
+            if spec['dist'] not in DISTRIBUTIONS:
+                raise ValueError(f"unknown distribution {spec['dist']!r} for {attribute}")
+            self.specs[attribute] = spec
+
+        self.seed = seed
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.cache = OrderedDict()
+
+    @classmethod
+    def from_file(cls, path, seed=None, **kwargs):
+        return cls(load_scenario(path), seed=seed, **kwargs)
+
+    # 블록 b의 사용자들 (속성 -> (block_size,) 배열)
+    def block(self, b):
+        users = self.cache.get(b)
+        if users is not None:
+            self.cache.move_to_end(b)
+            return users
+
+        users = {}
+        for index, attribute in enumerate(ATTRIBUTES):
+            rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(self.seed, spawn_key=(b, index))))
+            spec = self.specs[attribute]
+            users[attribute] = DISTRIBUTIONS[spec['dist']](rng, self.block_size, spec)
+
+        self.cache[b] = users
+        if len(self.cache) > self.cache_blocks:
+            self.cache.popitem(last=False)
+        return users
+
+    # 임의 모양의 사용자 번호 배열 -> 속성 -> 같은 모양의 배열
+    def take(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        flat = ids.reshape(-1)
+        blocks = flat // self.block_size
+        offsets = flat % self.block_size
+        users = {attribute: np.empty(len(flat)) for attribute in ATTRIBUTES}
+        for b in np.unique(blocks).tolist():
+            rows = blocks == b
+            values = self.block(b)
+            for attribute in ATTRIBUTES:
+                users[attribute][rows] = values[attribute][offsets[rows]]
+        return {attribute: values.reshape(ids.shape) for attribute, values in users.items()}
+
+    # 번호 [start, stop) 사용자들
+    def slice(self, start, stop):
+        return self.take(np.arange(start, stop))
+
+    # 번호 start부터 batch_size명씩 (stop이 없으면 끝없이) 만들어 주는 생성기
+    def batches(self, start=0, stop=None, batch_size=None):
+        batch_size = batch_size or self.block_size
+        while stop is None or start < stop:
+            end = start + batch_size if stop is None else min(start + batch_size, stop)
+            yield self.slice(start, end)
+            start = end
+
+    # 사용자 한 명씩 (속성 -> 값 딕셔너리)
+    def users(self, start=0, stop=None):
+        for batch in self.batches(start, stop):
+            for values in zip(*(batch[attribute].tolist() for attribute in ATTRIBUTES)):
+                yield dict(zip(ATTRIBUTES, values))
+
+    # total명을 workers개 작업에 나눌 때 worker번째 작업의 번호 구간
+    @staticmethod
+    def shard(worker, workers, total):
+        return worker * total // workers, (worker + 1) * total // workers
+
+
+# 단말 최고 화질(p) -> 허용되는 가장 높은 화질 액션 넘버 (가장 낮은 화질보다 낮으면 0)
+def quality_cap(ladder, max_quality):
+    return np.maximum(np.searchsorted(ladder.resolutions, max_quality, side='right') - 1, 0)
+
+
+# 엔진의 사용자 (env, user)에게 배정되는 모집단 번호 (에피소드마다 새 사용자)
+def user_ids(episode, env, num_envs, num_users):
+    episode = np.asarray(episode, dtype=np.int64)
+    return (episode * num_envs + np.asarray(env, dtype=np.int64))[..., None] * num_users + np.arange(num_users)
+
+
+class PopulationPlacement:
+    # 모집단의 distance 속성을 사용자 위치로 쓰는 배치 (ChannelSampler의 placement로 사용)
+    # 엔진이 에피소드 시작 시 assign으로 사용자별 거리를 넣어 주고, 에피소드 동안 거리는 고정
+    # 위치는 BS에서 x축 방향으로 거리만큼 떨어진 점
+    def __init__(self, bs_x=0, bs_y=0):
+        self.bs_x = bs_x
+        self.bs_y = bs_y
+        self.distance = None
+
+    def seed(self, rng):
+        pass
+
+    def reset(self, index=Ellipsis):
+        pass
+
+    # 사용자 거리 배열의 모양 (엔진마다 (환경 수, 사용자 수) 또는 (사용자 수,)), 모양이 같으면 그대로 둠
+    def allocate(self, shape):
+        if self.distance is None or self.distance.shape != shape:
+            self.distance = np.zeros(shape)
+
+    # index: 환경(또는 사용자) 선택, distance: 선택된 사용자들의 거리
+    def assign(self, index, distance):
+        self.distance[index] = distance
+
+    def snapshot(self):
+        return self.distance.copy() if self.distance is not None else None
+
+    def restore(self, snapshot):
+        self.distance = snapshot.copy() if snapshot is not None else None
+
+    def clone(self, rng):
+        other = PopulationPlacement(self.bs_x, self.bs_y)
+        other.restore(self.snapshot())
+        return other
+
+    def distances(self, mask):
+        return self.distance[mask]
+
+    def positions(self, mask):
+        distance = self.distance[mask]
+        return self.bs_x + distance, np.full(distance.shape, float(self.bs_y))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="시나리오 모집단을 스트리밍으로 만들어 속성별 통계 출력")
+    parser.add_argument('scenario', nargs='?', help="시나리오 JSON (없으면 기본 분포)")
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    population = Population.from_file(args.scenario, seed=args.seed) if args.scenario else Population(seed=args.seed)
+    count = 0
+    total = {attribute: 0.0 for attribute in ATTRIBUTES}
+    low = {attribute: np.inf for attribute in ATTRIBUTES}
+    high = {attribute: -np.inf for attribute in ATTRIBUTES}
+    for batch in population.batches(args.start, args.start + args.users, batch_size=65536):
+        count += len(batch['distance'])
+        for attribute in ATTRIBUTES:
+            values = batch[attribute]
+            total[attribute] += float(values.sum())
+            low[attribute] = min(low[attribute], float(values.min()))
+            high[attribute] = max(high[attribute], float(values.max()))
+
+    for attribute in ATTRIBUTES:
+        print(f"{attribute}: mean {total[attribute] / count:.2f}, min {low[attribute]:.2f}, max {high[attribute]:.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
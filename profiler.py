@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import atexit
+from time import perf_counter_ns
+
+# 구간 시간 히스토그램의 칸 수 (칸 k는 [2^(k-1), 2^k) ns, 마지막 칸은 그 이상 전부)
+NUM_BINS = 48
+
+# 계측 구간
+# data_rate: 채널 sample / download: 청크 다운로드와 버퍼 계산 / qoe: calculate_qoe / state: _get_state
+# step: 엔진 step 전체 / env_step: CustomEnv.step, VecEnv.step_wait 전체 / agent: env_step 사이 (정책, 학습)
+PHASES = ('data_rate', 'download', 'qoe', 'state', 'step', 'env_step', 'agent')
+
+
+class PhaseProfiler:
+    # 시뮬레이션 스텝의 구간별 시간을 단조 시계(perf_counter_ns)로 재서 구간마다 로그 스케일 히스토그램으로 모으는 프로파일러
+    # 꺼져 있으면 호출하는 쪽에서 self.enabled만 확인하고 넘어감
+    # log_dir이 있으면 interval초마다 TensorBoard 히스토그램/스칼라로 내보내고, dump_path가 있으면 종료 시 JSON으로 저장
+    def __init__(self, enabled=False, log_dir=None, interval=30.0, dump_path=None):
+        self.enabled = enabled
+        self.log_dir = log_dir
+        self.interval = interval
+        self.dump_path = dump_path
+        self.writer = None
+        self.flushes = 0
+        self.next_flush = time.monotonic() + interval
+        self.reset()
+
+    # 환경 변수 STREAMING_PROFILE (off | on), STREAMING_PROFILE_DIR (TensorBoard 로그 디렉터리),
+    # STREAMING_PROFILE_INTERVAL (초), STREAMING_PROFILE_DUMP (종료 시 JSON 경로)로 설정
+    @classmethod
+    def from_env(cls):
+        enabled = os.environ.get('STREAMING_PROFILE', 'off').lower() in ('on', '1', 'true')
+        return cls(enabled=enabled, log_dir=os.environ.get('STREAMING_PROFILE_DIR'),
+                   interval=float(os.environ.get('STREAMING_PROFILE_INTERVAL', 30)),
+                   dump_path=os.environ.get('STREAMING_PROFILE_DUMP'))
+
+    def reset(self):
+        # 구간 이름 -> [횟수, 합계, 제곱 합, 최소, 최대, 히스토그램] (ns)
+        self.phases = {}
+
+    def start(self):
+        return perf_counter_ns()
+
+    # start부터 지금까지를 name 구간으로 기록하고 지금 시각을 반환 (다음 구간의 start)
+    def lap(self, name, start):
+        now = perf_counter_ns()
+        self.add(name, now - start)
+        return now
+
+    def add(self, name, elapsed):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = [0, 0, 0, elapsed, elapsed, [0] * NUM_BINS]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += elapsed * elapsed
+        if elapsed < stats[3]:
+            stats[3] = elapsed
+        if elapsed > stats[4]:
+            stats[4] = elapsed
+        stats[5][min(elapsed.bit_length(), NUM_BINS - 1)] += 1
+
+    # 환경 스텝마다 호출, interval이 지났으면 TensorBoard로 내보냄
+    def tick(self):
+        if self.log_dir is not None and time.monotonic() >= self.next_flush:
+            self.write_tensorboard()
+            self.next_flush = time.monotonic() + self.interval
+
+    # 히스토그램에서 분위수 추정 (칸의 상한, us)
+    def _quantile(self, bins, count, q):
+        target = q * count
+        seen = 0
+        for k, n in enumerate(bins):
+            seen += n
+            if seen >= target:
+                return (1 << k) / 1000
+        return (1 << (NUM_BINS - 1)) / 1000
+
+    # 구간별 통계 (시간은 us, total은 초)
+    def summary(self):
+        result = {}
+        for name, (count, total, _, low, high, bins) in self.phases.items():
+            result[name] = {
+                'count': count,
+                'total_s': total / 1e9,
+                'mean_us': total / count / 1000,
+                'min_us': low / 1000,
+                'max_us': high / 1000,
+                'p50_us': self._quantile(bins, count, 0.5),
+                'p90_us': self._quantile(bins, count, 0.9),
+                'p99_us': self._quantile(bins, count, 0.99),
+                'histogram': bins[:],
+            }
+        return result
+
+    def dump(self, path=None):
+        path = path if path is not None else self.dump_path
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    # 구간별 히스토그램(us)과 평균/p99 스칼라를 log_dir의 profile 아래에 기록
+    # (TensorBoard 기록기가 없으면 한 번 알리고 스트리밍을 끔)
+    def write_tensorboard(self, log_dir=None):
+        if self.writer is None:
+            try:
+                from torch.utils.tensorboard import SummaryWriter
+            except ImportError:
+                try:
+                    from tensorboardX import SummaryWriter
+                except ImportError:
+                    print("profiler: tensorboard is not installed, histograms are not streamed", file=sys.stderr)
+                    self.log_dir = None
+                    return
+            self.writer = SummaryWriter(os.path.join(log_dir or self.log_dir, 'profile'))
+
+        limits = [(1 << k) / 1000 for k in range(NUM_BINS)]
+        for name, (count, total, sumsq, low, high, bins) in self.phases.items():
+            self.writer.add_histogram_raw(f"profile/{name}", min=low / 1000, max=high / 1000, num=count,
+                                          sum=total / 1000, sum_squares=sumsq / 1e6,
+                                          bucket_limits=limits, bucket_counts=bins, global_step=self.flushes)
+            self.writer.add_scalar(f"profile/{name}/mean_us", total / count / 1000, self.flushes)
+            self.writer.add_scalar(f"profile/{name}/p99_us", self._quantile(bins, count, 0.99), self.flushes)
+        self.writer.flush()
+        self.flushes += 1
+
+    # 종료 시 마지막으로 내보내기
+    def close(self):
+        if not self.phases:
+            return
+        if self.log_dir is not None:
+            self.write_tensorboard()
+        if self.dump_path is not None:
+            self.dump()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+_profiler = None
+
+
+# 프로세스 전체에서 공유하는 프로파일러 (처음 호출할 때 환경 변수로 만들고, 켜져 있으면 종료 시 close)
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        _profiler = PhaseProfiler.from_env()
+        if _profiler.enabled:
+            atexit.register(_profiler.close)
+    return _profiler
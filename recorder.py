@@ -0,0 +1,190 @@
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+# 기록하는 열 (사용자별 타임스텝 레코드 한 행)
+RECORD_COLUMNS = {
+    'episode': np.int64, # 환경별 에피소드 번호
+    'env': np.int32,
+    'time_step': np.int64,
+    'user': np.int32,
+    'user_DR': np.float64,
+    'video_quality': np.float64,
+    'buffer': np.float64,
+    'rebuffering_time': np.float64,
+    'monitor_data_availability': np.float64,
+    'step_per_qoe': np.float64,
+}
+
+
+class EpisodeRecorder:
+    # 스텝별 사용자 레코드를 열 단위 파일로 남기는 기록기 (엔진에 recorder=로 넘기면 켜짐)
+    # path/<열 이름>/<청크 번호>.npy 에 chunk_rows행씩 저장하고, 청크 목록은 path/chunks.jsonl에 추가
+    # 시뮬레이션 스레드는 미리 할당한 버퍼에 복사만 하고, 가득 찬 버퍼는 백그라운드 스레드가 디스크에 씀
+    # 버퍼는 최대 max_pending + 2개까지만 만들어서 메모리 사용량이 고정됨
+    # 쓰기가 밀려 대기 버퍼가 max_pending개를 넘으면 drop이면 그 청크를 버리고(dropped에 행 수 누적),
+    # 아니면 자리가 날 때까지 기다림
+    def __init__(self, path, chunk_rows=65536, max_pending=4, drop=True):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.drop = drop
+        self.dropped = 0 # 버려진 행 수
+        self.error = None # 쓰기 스레드에서 난 예외
+
+        for column in RECORD_COLUMNS:
+            os.makedirs(os.path.join(path, column), exist_ok=True)
+        self.chunk = self._next_chunk_number()
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.free = queue.Queue()
+        for _ in range(max_pending + 2):
+            self.free.put({column: np.empty(chunk_rows, dtype=dtype) for column, dtype in RECORD_COLUMNS.items()})
+        self.buffer = self.free.get()
+        self.size = 0
+
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    # 이미 기록된 청크가 있으면 그 뒤에 이어서 기록
+    def _next_chunk_number(self):
+        manifest = os.path.join(self.path, 'chunks.jsonl')
+        if not os.path.exists(manifest):
+            return 0
+        with open(manifest) as f:
+            return sum(1 for line in f if line.strip())
+
+    # 한 행 기록
+    def record(self, episode, env, time_step, user, dr, quality, buffer, rebuffering_time, data_left, qoe):
+        if self.size == self.chunk_rows:
+            self._hand_off()
+        row = self.size
+        values = self.buffer
+        values['episode'][row] = episode
+        values['env'][row] = env
+        values['time_step'][row] = time_step
+        values['user'][row] = user
+        values['user_DR'][row] = dr
+        values['video_quality'][row] = quality
+        values['buffer'][row] = buffer
+        values['rebuffering_time'][row] = rebuffering_time
+        values['monitor_data_availability'][row] = data_left
+        values['step_per_qoe'][row] = qoe
+        self.size = row + 1
+
+    # 여러 행을 한 번에 기록 (스칼라는 모든 행에 같은 값)
+    def record_batch(self, episode, env, time_step, user, dr, quality, buffer, rebuffering_time, data_left, qoe):
+        columns = (episode, env, time_step, user, dr, quality, buffer, rebuffering_time, data_left, qoe)
+        n = len(user)
+        start = 0
+        while start < n:
+            if self.size == self.chunk_rows:
+                self._hand_off()
+            take = min(n - start, self.chunk_rows - self.size)
+            for column, values in zip(RECORD_COLUMNS, columns):
+                self.buffer[column][self.size:self.size + take] = values if np.isscalar(values) else values[start:start + take]
+            self.size += take
+            start += take
+
+    # 채워진 버퍼를 쓰기 스레드로 넘기고 빈 버퍼를 받아 옴
+    def _hand_off(self):
+        if self.error is not None:
+            raise self.error
+        if self.size == 0:
+            return
+
+        try:
+            self.pending.put((self.chunk, self.buffer, self.size), block=not self.drop)
+            self.chunk += 1
+            self.buffer = self.free.get()
+        except queue.Full:
+            self.dropped += self.size
+        self.size = 0
+
+    def _writer(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                chunk, values, size = item
+                try:
+                    self._write_chunk(chunk, values, size)
+                except Exception as e:
+                    self.error = e
+                self.free.put(values)
+            finally:
+                self.pending.task_done()
+
+    def _write_chunk(self, chunk, values, size):
+        name = f"{chunk:08d}.npy"
+        for column in RECORD_COLUMNS:
+            np.save(os.path.join(self.path, column, name), values[column][:size])
+
+        episode = values['episode'][:size]
+        entry = {'chunk': chunk, 'file': name, 'rows': size,
+                 'episode_min': int(episode.min()), 'episode_max': int(episode.max())}
+        with open(os.path.join(self.path, 'chunks.jsonl'), 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    # 지금까지 기록한 행을 모두 디스크에 씀 (쓰기가 끝날 때까지 기다림)
+    def flush(self):
+        if self.size:
+            drop, self.drop = self.drop, False
+            try:
+                self._hand_off()
+            finally:
+                self.drop = drop
+        self.pending.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self.thread.is_alive():
+            self.flush()
+            self.pending.put(None)
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 기록된 청크 목록 (episodes=(시작, 끝)을 주면 그 범위의 에피소드가 들어있는 청크만)
+def list_chunks(path, episodes=None):
+    chunks = []
+    with open(os.path.join(path, 'chunks.jsonl')) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if episodes is not None and (entry['episode_max'] < episodes[0] or entry['episode_min'] >= episodes[1]):
+                continue
+            chunks.append(entry)
+    return sorted(chunks, key=lambda entry: entry['chunk'])
+
+
+# 청크 단위로 선택한 열만 읽음 (memmap, 전체를 메모리에 올리지 않고 순회할 때 사용)
+def iter_chunks(path, columns=None, episodes=None):
+    columns = list(columns) if columns is not None else list(RECORD_COLUMNS)
+    for entry in list_chunks(path, episodes):
+        values = {column: np.load(os.path.join(path, column, entry['file']), mmap_mode='r') for column in columns}
+        if episodes is not None:
+            episode = np.load(os.path.join(path, 'episode', entry['file']), mmap_mode='r')
+            keep = (episode >= episodes[0]) & (episode < episodes[1])
+            values = {column: data[keep] for column, data in values.items()}
+        yield values
+
+
+# 선택한 열을 모든 청크에 걸쳐 이어 붙여 반환
+def load_columns(path, columns=None, episodes=None):
+    columns = list(columns) if columns is not None else list(RECORD_COLUMNS)
+    parts = {column: [] for column in columns}
+    for values in iter_chunks(path, columns, episodes):
+        for column in columns:
+            parts[column].append(values[column])
+    return {column: np.concatenate(parts[column]) if parts[column] else np.empty(0, dtype=RECORD_COLUMNS[column])
+            for column in columns}
@@ -0,0 +1,114 @@
+import os
+import sys
+import numpy as np
+
+# 트레이스 레벨
+OFF = 0 # 아무것도 기록하지 않음
+STEP = 1 # 스텝별 사용자 레코드를 링 버퍼에 기록
+DEBUG = 2 # STEP + 기존 print 디버그 메시지 출력
+
+LEVELS = {'off': OFF, 'step': STEP, 'debug': DEBUG}
+
+# 스텝별 사용자 레코드
+TRACE_DTYPE = np.dtype([
+    ('episode', np.int64),
+    ('env', np.int32),
+    ('time_step', np.int64),
+    ('user', np.int32),
+    ('DR', np.float64),
+    ('quality', np.float64),
+    ('buffer', np.float64),
+    ('rebuffering_time', np.float64),
+    ('data_left', np.float64),
+])
+
+
+class StepTracer:
+    # 고정 크기 링 버퍼에 스텝별 레코드를 남기는 트레이서
+    # 꺼져 있으면 호출하는 쪽에서 self.step / self.debug 속성만 확인하고 넘어감
+    def __init__(self, level=OFF, capacity=65536, dump_path=None, dump_on_done=False):
+        self.capacity = capacity
+        self.dump_path = dump_path
+        self.dump_on_done = dump_on_done
+        self.records = np.zeros(self.capacity, dtype=TRACE_DTYPE)
+        self.index = 0 # 다음에 기록할 위치
+        self.count = 0 # 지금까지 기록된 레코드 수
+        self.episode = 0
+        self.set_level(level)
+
+    # 환경 변수 STREAMING_TRACE (off | step | debug)와 STREAMING_TRACE_DUMP로 설정
+    @classmethod
+    def from_env(cls):
+        level = LEVELS[os.environ.get('STREAMING_TRACE', 'off').lower()]
+        dump_path = os.environ.get('STREAMING_TRACE_DUMP')
+        return cls(level=level, dump_path=dump_path, dump_on_done=dump_path is not None)
+
+    def set_level(self, level):
+        self.level = level
+        self.step = level >= STEP
+        self.debug = level >= DEBUG
+
+    def log(self, message):
+        if self.debug:
+            print(message)
+
+    def record(self, time_step, user, dr, quality, buffer, rebuffering_time, data_left, env=0):
+        self.records[self.index] = (self.episode, env, time_step, user, dr, quality, buffer, rebuffering_time, data_left)
+        self.index = (self.index + 1) % self.capacity
+        self.count += 1
+
+    # 여러 사용자(환경)의 레코드를 한 번에 기록
+    def record_batch(self, time_step, user, dr, quality, buffer, rebuffering_time, data_left, env=0):
+        n = len(user)
+        start = max(n - self.capacity, 0)
+        positions = (self.index + np.arange(n - start)) % self.capacity
+
+        batch = self.records[positions]
+        batch['episode'] = self.episode
+        batch['env'] = env if np.isscalar(env) else env[start:]
+        for name, values in (('time_step', time_step), ('user', user), ('DR', dr), ('quality', quality), ('buffer', buffer),
+                             ('rebuffering_time', rebuffering_time), ('data_left', data_left)):
+            batch[name] = values if np.isscalar(values) else values[start:]
+        self.records[positions] = batch
+
+        self.index = (self.index + n - start) % self.capacity
+        self.count += n
+
+    # 에피소드 종료 시 호출 (dump_on_done이면 버퍼를 덤프)
+    def end_episode(self):
+        if self.dump_on_done:
+            self.dump()
+        self.episode += 1
+
+    # 오래된 레코드부터 순서대로 반환
+    def snapshot(self):
+        if self.count < self.capacity:
+            return self.records[:self.index].copy()
+        return np.concatenate([self.records[self.index:], self.records[:self.index]])
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+    # 링 버퍼 내용을 덤프하고 비움 (.npy는 바이너리, 그 외는 CSV에 이어 쓰기, 경로가 없으면 표준 출력)
+    def dump(self, path=None):
+        records = self.snapshot()
+        path = path or self.dump_path
+
+        if path is not None and path.endswith('.npy'):
+            np.save(path, records)
+            self.clear()
+            return records
+
+        out = open(path, 'a') if path is not None else sys.stdout
+        try:
+            if path is None or out.tell() == 0:
+                out.write(','.join(TRACE_DTYPE.names) + '\n')
+            for row in records.tolist():
+                out.write(','.join(str(value) for value in row) + '\n')
+        finally:
+            if path is not None:
+                out.close()
+        self.clear()
+
+        return records
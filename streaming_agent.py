@@ -1,37 +1,83 @@
+import os
+import argparse
 import numpy as np
 import gym
 from gym import spaces
-import video_streaming_comparison
+import video_streaming
 from stable_baselines3 import DQN, A2C, PPO
 from stable_baselines3.common.env_util import make_vec_env
 from stable_baselines3.common.callbacks import EvalCallback, StopTrainingOnRewardThreshold
+from async_eval import AsyncEvalCallback
+from profiler import get_profiler
 from stable_baselines3.common.results_plotter import load_results, plot_results
-from stable_baselines3.common.vec_env import DummyVecEnv
+from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor
+from streaming_vec_env import VideoStreamingVecEnv
+from env_pool import SharedMemoryVecEnv
 from stable_baselines3.common.monitor import Monitor
 
 class CustomEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, max_chunk_num=20, num_users=3, data_availability=2000, seed=None):
         super(CustomEnv, self).__init__()
-        max_chunk_num = 20
-        num_users = 3
-        self.action_space = spaces.MultiDiscrete([10, 10, 6, 10, 10, 6, 10, 10, 6])
-        self.observation_space = spaces.Box(low=0.1, high=100000, shape=(12,), dtype=np.float32)
-        self.env = video_streaming_comparison.VideoStreaming(max_chunk_num=max_chunk_num, num_users=num_users)
+        # 사용자별 [대역폭, 전력, 화질] 액션과 [이전 화질, 이전 버퍼, 잔여 데이터, 거리] 관측값
+        self.action_space = spaces.MultiDiscrete([10, 10, 6] * num_users)
+        self.observation_space = spaces.Box(low=0.1, high=100000, shape=(4 * num_users,), dtype=np.float32)
+        self.env = video_streaming.VideoStreaming(max_chunk_num=max_chunk_num, num_users=num_users,
+                                                  data_availability=data_availability, seed=seed)
+        self.profiler = get_profiler()
+        self.last_step_end = None # agent 구간 (직전 step이 끝난 뒤부터 정책과 학습 시간)
+    # 관측값은 float32 복사본으로 반환 (엔진이 관측값 버퍼를 다시 쓰더라도 DummyVecEnv의 terminal_observation이 바뀌지 않도록)
     def step(self, action):
+        profiler = self.profiler
+        if not profiler.enabled:
+            observation, reward, done, info = self.env.step(action)
+            return np.array(observation, dtype=np.float32), reward, done, info
+        start = profiler.start()
+        if self.last_step_end is not None:
+            profiler.add('agent', start - self.last_step_end)
         observation, reward, done, info = self.env.step(action)
-        return np.array(observation, dtype=np.float32), reward, done, info
-    def reset(self):
-        observation = self.env.reset()
-        return np.array(observation, dtype=np.float32)
+        observation = np.array(observation, dtype=np.float32)
+        self.last_step_end = profiler.lap('env_step', start)
+        profiler.tick()
+        return observation, reward, done, info
+    # 엔진의 채널 난수를 다시 시드 (같은 시드면 다음 reset부터 같은 에피소드들)
+    def seed(self, seed=None):
+        self.env.channel.seed(seed)
+        return [seed]
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        return np.array(self.env.reset(), dtype=np.float32)
     def close (self):
         print("close")
 
 # Main 함수
+# 학습은 num_envs개 환경을 한 번에 진행하는 VideoStreamingVecEnv에서 (CustomEnv + DummyVecEnv는 환경마다 파이썬 호출)
+# --vec-env shm이면 환경을 여러 프로세스에 나눠 진행하는 SharedMemoryVecEnv (결과는 같고 여러 코어를 씀)
 if __name__ == '__main__':
-    env = CustomEnv()
-    model = PPO("MlpPolicy", env, verbose=1, tensorboard_log="./logs/")
-    eval_callback = EvalCallback(env, eval_freq=100, deterministic=True, render=False)
+    parser = argparse.ArgumentParser(description="VideoStreaming PPO 학습")
+    parser.add_argument('--num-envs', type=int, default=8, help="동시에 진행하는 환경 수")
+    parser.add_argument('--vec-env', choices=('vec', 'shm'), default='vec', help="vec: 한 프로세스, shm: 공유 메모리 프로세스 풀")
+    parser.add_argument('--workers', type=int, help="--vec-env shm의 프로세스 수 (기본값은 CPU 수)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env_kwargs = {'max_chunk_num': 20, 'num_users': 3}
+    # VecMonitor는 logs/monitor.csv를 남김 (load_results용, 디렉터리가 있어야 그 안에 씀)
+    os.makedirs("./logs/", exist_ok=True)
+    if args.vec_env == 'shm':
+        venv = SharedMemoryVecEnv(args.num_envs, n_workers=args.workers, seed=args.seed, **env_kwargs)
+    else:
+        venv = VideoStreamingVecEnv(args.num_envs, seed=args.seed, **env_kwargs)
+    env = VecMonitor(venv, "./logs/")
+    model = PPO("MlpPolicy", env, seed=args.seed, verbose=1, tensorboard_log="./logs/")
+    # STREAMING_PROFILE=on이면 구간별 시간 히스토그램을 같은 TensorBoard 로그 디렉터리(logs/profile)에 기록
+    if get_profiler().log_dir is None:
+        get_profiler().log_dir = "./logs/"
+    # 평가는 별도 프로세스의 VecEnv에서 (학습 환경 상태를 건드리지 않고 학습도 멈추지 않음), 학습과 같은 VideoStreamingVecEnv
+    eval_callback = AsyncEvalCallback(env_kwargs=env_kwargs, eval_freq=max(2048 // args.num_envs, 1),
+                                      deterministic=True, best_model_save_path="./logs/", log_path="./logs/")
     model.learn(total_timesteps=100000, callback=[eval_callback])
     model.save("comparison_ppo_v1")
+    env.close()
     results = load_results("logs/")
     plot_results(results, title="My Training Results")
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from gym import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+from vectorized_streaming import VectorizedVideoStreaming
+
+class VideoStreamingVecEnv(VecEnv):
+    # K개의 VideoStreaming 환경을 하나의 VectorizedVideoStreaming으로 한 번에 진행하는 VecEnv
+    # DummyVecEnv(CustomEnv) 대신 사용하면 스텝당 파이썬 호출이 환경 수와 무관하게 한 번
+    def __init__(self, num_envs, max_chunk_num=20, num_users=3, data_availability=2000, seed=None, ladder=None, recorder=None, normalizer=None, population=None):
+        self.engine = VectorizedVideoStreaming(max_chunk_num=max_chunk_num, num_users=num_users,
+                                               data_availability=data_availability,
+                                               num_envs=num_envs, ladder=ladder, seed=seed,
+                                               recorder=recorder, normalizer=normalizer, population=population)
+
+        action_space = spaces.MultiDiscrete([10, 10, len(self.engine.ladder)] * num_users)
+        observation_space = spaces.Box(low=0.1, high=100000, shape=(4 * num_users,), dtype=np.float32)
+        super(VideoStreamingVecEnv, self).__init__(num_envs, observation_space, action_space)
+
+        # 관측값 버퍼 두 개를 번갈아 사용 (SB3가 직전 관측값을 새 관측값과 함께 들고 있으므로)
+        self.buf_obs = [np.zeros((num_envs,) + observation_space.shape, dtype=np.float32) for _ in range(2)]
+        self.buf_index = 0
+        self.actions = None
+
+        # 에피소드 통계 (VecMonitor와 같은 'episode' 정보를 infos에 기록)
+        self.episode_returns = np.zeros(num_envs)
+        self.episode_lengths = np.zeros(num_envs, dtype=np.int64)
+        self.t_start = time.time()
+
+        # 구간별 시간 계측 (agent: 직전 step_wait가 끝난 뒤부터 다음 step_wait까지, 정책과 학습 시간)
+        self.profiler = self.engine.profiler
+        self.last_step_end = None
+
+    def _next_buffer(self):
+        self.buf_index ^= 1
+        return self.buf_obs[self.buf_index]
+
+    def reset(self):
+        self.engine.reset_envs(np.ones(self.num_envs, dtype=bool))
+        self.episode_returns[:] = 0
+        self.episode_lengths[:] = 0
+
+        return self.engine._get_state(self._next_buffer())
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        profiler = self.profiler
+        if profiler.enabled:
+            start = profiler.start()
+            if self.last_step_end is not None:
+                profiler.add('agent', start - self.last_step_end)
+        buf_obs = self._next_buffer()
+        _, rewards, dones = self.engine.step_batch(self.actions, out=buf_obs)
+        rewards = rewards.astype(np.float32)
+
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+
+        infos = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            # 끝난 환경은 마지막 관측값을 infos에 남기고 자동 초기화
+            for i in np.flatnonzero(dones):
+                infos[i]['terminal_observation'] = buf_obs[i].copy()
+                infos[i]['episode'] = {'r': self.episode_returns[i], 'l': int(self.episode_lengths[i]),
+                                       't': round(time.time() - self.t_start, 6)}
+            self.episode_returns[dones] = 0
+            self.episode_lengths[dones] = 0
+
+            self.engine.reset_envs(dones)
+            self.engine._get_state(buf_obs, envs=dones)
+
+        if profiler.enabled:
+            self.last_step_end = profiler.lap('env_step', start)
+            profiler.tick()
+        return buf_obs, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    def seed(self, seed=None):
+        self.engine.channel.seed(seed)
+        return [seed] * self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.engine, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.engine, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self.engine, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -0,0 +1,45 @@
+import multiprocessing as mp
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('stable_baselines3')
+
+from streaming_agent import CustomEnv
+from async_eval import _eval_worker, WEIGHTS, CLOSE
+
+seeds = []
+
+
+# 평가 워커가 환경마다 넘기는 시드를 기록하는 학습 환경
+class SeedRecordingEnv(CustomEnv):
+    def seed(self, seed=None):
+        seeds.append(seed)
+        return super(SeedRecordingEnv, self).seed(seed)
+
+
+# 학습 환경 클래스(env_class)로 평가 두 번: 평가마다 환경 i를 seed + i로 다시 시드하므로 같은 가중치면 결과가 같아야 함
+def test_eval_round_with_env_class(tmp_path):
+    from stable_baselines3 import PPO
+
+    env_kwargs = {'max_chunk_num': 5, 'num_users': 2}
+    model = PPO('MlpPolicy', CustomEnv(**env_kwargs), n_steps=16, batch_size=16, seed=0)
+    policy_path = str(tmp_path / 'policy.pth')
+    model.policy.save(policy_path)
+    state = {name: value.detach().cpu().numpy() for name, value in model.policy.state_dict().items()}
+
+    # 워커는 명령을 순서대로 처리하고 CLOSE에서 끝나므로 같은 프로세스에서 바로 실행
+    del seeds[:]
+    conn, child = mp.Pipe()
+    conn.send((WEIGHTS, 1, state))
+    conn.send((WEIGHTS, 2, state))
+    conn.send((CLOSE, None, None))
+    _eval_worker(child, type(model.policy), policy_path, SeedRecordingEnv, env_kwargs, 2, 4, True, 7, None)
+
+    first_timesteps, first_returns, first_lengths, first_best = conn.recv()
+    second_timesteps, second_returns, second_lengths, second_best = conn.recv()
+    assert seeds == [7, 8, 7, 8]
+    assert (first_timesteps, second_timesteps) == (1, 2)
+    assert len(first_returns) == len(first_lengths) == 4
+    assert first_best and not second_best
+    assert first_returns == second_returns
+    assert first_lengths == second_lengths
@@ -0,0 +1,28 @@
+import heapq
+import buffer
+
+
+# 같은 시각의 이벤트는 넣은 순서와 무관하게 종류 번호 순서로, 종류도 같으면 넣은 순서로 꺼냄
+def test_same_time_events_pop_in_kind_order():
+    env = buffer.VideoStreaming(5, 2, seed=0)
+    env.events = []
+    env._push(3.0, buffer.STALL_START, 0)
+    env._push(3.0, buffer.PLAYBACK_TICK, 1)
+    env._push(3.0, buffer.DOWNLOAD_DONE, 1)
+    env._push(3.0, buffer.DOWNLOAD_DONE, 0)
+    env._push(1.0, buffer.STALL_START, 1)
+
+    order = []
+    while env.events:
+        time, kind, _, user = heapq.heappop(env.events)
+        order.append((time, kind, user))
+    assert order == [(1.0, buffer.STALL_START, 1), (3.0, buffer.DOWNLOAD_DONE, 1), (3.0, buffer.DOWNLOAD_DONE, 0),
+                     (3.0, buffer.PLAYBACK_TICK, 1), (3.0, buffer.STALL_START, 0)]
+
+
+def test_episode_runs_to_the_end():
+    env = buffer.VideoStreaming(5, 2, seed=0)
+    env.run()
+    if not env.exhausted:
+        assert not env.events
+        assert all(user['current_chunk_num'] == 5 for user in env.users.values())
@@ -0,0 +1,231 @@
+import os
+import sys
+import copy
+import csv
+import struct
+import argparse
+import numpy as np
+
+from channel import clone_rng
+
+# 트레이스 파일 형식 (리틀 엔디언)
+#   [0, 64)             헤더: magic, 버전, 트레이스 수, 인덱스 위치
+#   [64, index_offset)  모든 트레이스의 레코드 (TRACE_RECORD)를 이어 붙인 배열
+#   [index_offset, ...) 트레이스별 (시작 레코드, 레코드 수) int64 배열
+TRACE_MAGIC = b'VSTRACE\0'
+TRACE_VERSION = 1
+HEADER = struct.Struct('<8sIqq')
+HEADER_SIZE = 64
+TRACE_RECORD = np.dtype([('rate', '<f4'), ('distance', '<f4')]) # 측정 Data Rate (Kbps), 거리 (m)
+
+
+class TraceCorpus:
+    # 트레이스 파일을 np.memmap으로 열어 둠 (레코드는 필요한 페이지만 읽히고 RAM에 통째로 올리지 않음)
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, num_traces, index_offset = HEADER.unpack(f.read(HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} trace file")
+
+        num_records = (index_offset - HEADER_SIZE) // TRACE_RECORD.itemsize
+        self.records = np.memmap(path, dtype=TRACE_RECORD, mode='r', offset=HEADER_SIZE, shape=(num_records,)) if num_records else np.empty(0, dtype=TRACE_RECORD)
+        index = np.fromfile(path, dtype='<i8', count=2 * num_traces, offset=index_offset).reshape(num_traces, 2)
+        self.starts = index[:, 0].copy()
+        self.lengths = index[:, 1].copy()
+
+    def __len__(self):
+        return len(self.starts)
+
+    # i번째 트레이스 전체 (memmap 뷰, 복사 없음)
+    def trace(self, i):
+        return self.records[self.starts[i]:self.starts[i] + self.lengths[i]]
+
+
+class TraceWriter:
+    # 트레이스를 순서대로 파일에 이어 쓰고 close()에서 인덱스와 헤더를 기록
+    # 레코드는 받는 대로 바로 쓰므로 변환 중에도 전체 코퍼스를 메모리에 들고 있지 않음
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'wb')
+        self.f.write(b'\0' * HEADER_SIZE)
+        self.index = [] # (시작 레코드, 레코드 수)
+        self.num_records = 0
+        self.current = None
+
+    def begin_trace(self):
+        self.end_trace()
+        self.current = [self.num_records, 0]
+
+    def write(self, rate, distance):
+        if self.current is None:
+            self.begin_trace()
+        chunk = np.empty(len(rate), dtype=TRACE_RECORD)
+        chunk['rate'] = rate
+        chunk['distance'] = distance
+        chunk.tofile(self.f)
+        self.current[1] += len(chunk)
+        self.num_records += len(chunk)
+
+    def end_trace(self):
+        if self.current is not None:
+            self.index.append(self.current)
+            self.current = None
+
+    def close(self):
+        self.end_trace()
+        index_offset = self.f.tell()
+        np.asarray(self.index, dtype='<i8').reshape(-1, 2).tofile(self.f)
+        self.f.seek(0)
+        self.f.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(self.index), index_offset))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# CSV -> 트레이스 파일 변환
+# CSV 파일 하나가 트레이스 하나이고, trace_column을 주면 그 열의 값이 바뀔 때마다 새 트레이스로 나눔
+# distance_column이 없으면 거리는 0으로 기록
+def convert_csv(csv_paths, out_path, rate_column='throughput_kbps', distance_column='distance_m',
+                trace_column=None, chunk_rows=65536):
+    with TraceWriter(out_path) as writer:
+        for csv_path in csv_paths:
+            with open(csv_path, newline='') as f:
+                reader = csv.DictReader(f)
+                writer.begin_trace()
+                rate, distance = [], []
+                current = None
+                for row in reader:
+                    if trace_column is not None and row[trace_column] != current:
+                        if rate:
+                            writer.write(rate, distance)
+                            rate, distance = [], []
+                        if current is not None:
+                            writer.begin_trace()
+                        current = row[trace_column]
+                    rate.append(float(row[rate_column]))
+                    distance.append(float(row[distance_column]) if distance_column in row else 0.0)
+                    if len(rate) == chunk_rows:
+                        writer.write(rate, distance)
+                        rate, distance = [], []
+                if rate:
+                    writer.write(rate, distance)
+
+    return TraceCorpus(out_path)
+
+
+class TraceSource:
+    # 기록된 Data Rate / 거리 트레이스를 재생하는 채널 (ChannelSampler와 같은 seed/reset/sample 인터페이스)
+    # 사용자마다 트레이스 하나와 현재 위치(cursor)를 배정하고 sample할 때마다 한 레코드씩 진행
+    # 트레이스가 끝나면 다른 트레이스를 새로 배정 (random_start면 트레이스 중간의 임의 위치부터 시작)
+    # share면 측정 Data Rate에 사용자의 대역폭 비율을 곱하고, 전력 비율은 사용하지 않음
+    def __init__(self, corpus, share=True, random_start=True, seed=None):
+        self.corpus = corpus if isinstance(corpus, TraceCorpus) else TraceCorpus(corpus)
+        self.playable = np.flatnonzero(self.corpus.lengths > 0)
+        if len(self.playable) == 0:
+            raise ValueError("trace corpus has no records")
+
+        self.share = share
+        self.random_start = random_start
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.trace = None
+
+    def reset(self, index=Ellipsis):
+        if self.trace is not None:
+            self._assign(index)
+
+    # 난수 상태와 사용자별 트레이스/위치 (코퍼스는 공유)
+    def snapshot(self):
+        if self.trace is None:
+            return self.rng.bit_generator.state, None, None
+        return self.rng.bit_generator.state, self.trace.copy(), self.cursor.copy()
+
+    def restore(self, snapshot):
+        rng_state, trace, cursor = snapshot
+        self.rng.bit_generator.state = rng_state
+        self.trace = trace.copy() if trace is not None else None
+        self.cursor = cursor.copy() if cursor is not None else None
+
+    def clone(self):
+        other = copy.copy(self)
+        other.rng = clone_rng(self.rng)
+        other.restore(self.snapshot())
+        return other
+
+    def _allocate(self, shape):
+        self.trace = np.zeros(shape, dtype=np.int64)
+        self.cursor = np.zeros(shape, dtype=np.int64)
+        self._assign(Ellipsis)
+
+    def _assign(self, index):
+        shape = self.trace[index].shape
+        trace = self.playable[self.rng.integers(0, len(self.playable), shape)]
+        self.trace[index] = trace
+        self.cursor[index] = self.rng.integers(0, self.corpus.lengths[trace]) if self.random_start else 0
+
+    # user 위치부터 현재 트레이스 끝까지의 레코드 (memmap 뷰, 복사 없음)
+    def window(self, user):
+        trace = self.trace[user]
+        start = self.corpus.starts[trace]
+        return self.corpus.records[start + self.cursor[user]:start + self.corpus.lengths[trace]]
+
+    # 링크 상태: (거리, 측정 Data Rate), 사용자마다 한 레코드씩 진행
+    def link(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        if self.trace is None or self.trace.shape != mask.shape:
+            self._allocate(mask.shape)
+
+        trace = self.trace[mask]
+        cursor = self.cursor[mask]
+        record = self.corpus.records[self.corpus.starts[trace] + cursor]
+
+        cursor += 1
+        self.cursor[mask] = cursor
+        ended = np.zeros(mask.shape, dtype=bool)
+        ended[mask] = cursor == self.corpus.lengths[trace]
+        if ended.any():
+            self._assign(ended)
+
+        return record['distance'].astype(np.float64), record['rate'].astype(np.float64)
+
+    # bandwidth/power는 (..., 사용자 수)로 여러 할당 후보를 한 번에 줄 수 있음
+    def link_rate(self, bandwidth, power, link):
+        rate = link[1]
+        if self.share:
+            return rate * bandwidth
+        return np.broadcast_to(rate, np.broadcast(rate, bandwidth).shape)
+
+    # 다음 sample에서 쓰일 링크 상태 (채널 상태는 바뀌지 않음)
+    def peek(self, mask):
+        return self.clone().link(mask)
+
+    # bandwidth, power: mask에 해당하는 사용자들의 할당 비율 (사용자 순서대로)
+    # 반환값: Data Rate (Kbps), 거리 (m)
+    def sample(self, bandwidth, power, mask):
+        link = self.link(mask)
+        return self.link_rate(bandwidth, power, link), link[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV 처리량 트레이스를 memmap용 바이너리 트레이스 파일로 변환")
+    parser.add_argument('output', help="만들 트레이스 파일 경로")
+    parser.add_argument('csv', nargs='+', help="입력 CSV (파일 하나가 트레이스 하나)")
+    parser.add_argument('--rate-column', default='throughput_kbps')
+    parser.add_argument('--distance-column', default='distance_m')
+    parser.add_argument('--trace-column', help="값이 바뀔 때마다 새 트레이스로 나눌 열")
+    args = parser.parse_args(argv)
+
+    corpus = convert_csv(args.csv, args.output, args.rate_column, args.distance_column, args.trace_column)
+    print(f"{args.output}: {len(corpus)} traces, {len(corpus.records)} records, {os.path.getsize(args.output)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+import copy
+import numpy as np
+from step_trace import StepTracer
+from profiler import get_profiler
+from playback_buffer import PlaybackBuffer
+from bitrate_ladder import DEFAULT_LADDER
+from channel import ChannelSampler, CounterDiscPlacement
+from population import PopulationPlacement, quality_cap, user_ids
+
+# round(x, 1)과 동일한 결과를 내는 배열 반올림
+def round1(values):
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 10
+    rounded = np.rint(scaled) / 10
+
+    # .x5 경계 근처는 float 표현 오차로 결과가 달라질 수 있으므로 내장 round로 다시 계산
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if tie.any():
+        rounded[tie] = [round(v, 1) for v in values[tie].tolist()]
+
+    return rounded
+
+
+class VectorizedVideoStreaming:
+    # video_streaming.VideoStreaming과 같은 동작을 하되, 사용자 상태를 NumPy 배열로 관리
+    # 모든 배열은 (환경 수, 사용자 수) 모양이며 num_envs개의 환경을 한 번에 진행함
+    # (환경 수, 사용자 수) 실수 상태
+    FLOAT_FIELDS = (
+        'remaining_data', # 잔여 데이터 가용량
+        'videobuffer', # 사용자의 버퍼량 (재생 시간 기준)
+        'remaining_chunk', # 남은 청크 갯수
+        'download_sum', # sum(step_per_download, 1)
+        'download_floor_sum', # sum(step_per_download_floor)
+        # 직전 스텝 값 (QoE, 상태 계산용)
+        'last_quality', 'prev_quality', 'last_quality_number', 'prev_quality_number', 'last_kbps',
+        'last_buffer', 'prev_buffer', 'last_DR', 'last_distance', 'last_buffer_off_time', 'last_rebuffering_time',
+        'qoe_sum', # sum(step_per_qoe)
+        'last_qoe',
+    )
+    # (환경 수, 사용자 수) 정수 상태
+    INT_FIELDS = (
+        'current_chunk_num', # 큐에 들어간 마지막 청크 번호
+        'qoe_count', # len(step_per_qoe)
+        'play_head', 'play_size', # 사용자의 청크 재생을 위한 버퍼 (PlaybackBuffer의 head, size)
+        'quality_cap', # 단말이 재생할 수 있는 가장 높은 화질 액션 넘버
+    )
+    # 환경별 정수 상태
+    ENV_FIELDS = (
+        'time_step', # 환경별 타임 스텝
+        'episode', # 환경별 에피소드 번호
+    )
+
+    def __init__(self, max_chunk_num, num_users, data_availability, num_envs=1, tracer=None, ladder=None, channel=None, seed=None, recorder=None, normalizer=None, profiler=None, population=None):
+        # BS의 위치
+        self.BS_X = 0
+        self.BS_Y = 0
+
+        self.chunk_length = 5 # 청크 재생 시간
+        self.max_chunk_num = max_chunk_num # 청크의 최대 갯수
+        self.buffer_capacity = self.max_chunk_num * self.chunk_length # 버퍼의 최대 용량 (재생 시간 기준)
+        self.num_users = num_users # 사용자의 수
+        self.num_envs = num_envs # 환경의 수
+
+        self.data_availability = data_availability
+        self.ladder = ladder if ladder is not None else DEFAULT_LADDER # 화질/비트레이트 테이블
+
+        # 사용자 모집단 (population.Population, 있으면 에피소드마다 데이터 가용량/거리/단말 화질 제한을 새 사용자로 뽑음)
+        self.population = population
+
+        # 사용자 위치와 Data Rate를 계산하는 채널 (같은 시드면 딕셔너리 버전과 같은 결과)
+        # 기본 배치는 사용자별 카운터 기반 난수라서 환경 e의 결과는 환경 수와 무관하게 같음
+        # 모집단이 있으면 기본 배치는 모집단의 거리를 쓰는 PopulationPlacement
+        if channel is None:
+            placement = PopulationPlacement(self.BS_X, self.BS_Y) if population is not None else CounterDiscPlacement(1000, self.BS_X, self.BS_Y)
+            channel = ChannelSampler(placement, seed=seed)
+        self.channel = channel
+
+        # 스텝별 레코드 (기본값은 환경 변수 STREAMING_TRACE로 설정, 꺼져 있으면 비용 없음)
+        self.tracer = tracer if tracer is not None else StepTracer.from_env()
+
+        # 스텝별 사용자 레코드를 디스크에 남기는 기록기 (recorder.EpisodeRecorder, 없으면 기록하지 않음)
+        self.recorder = recorder
+
+        # 구간별 시간 계측 (기본값은 환경 변수 STREAMING_PROFILE로 설정, 꺼져 있으면 비용 없음)
+        self.profiler = profiler if profiler is not None else get_profiler()
+
+        # 관측값 이동 평균/분산 정규화 (obs_normalizer.ObservationNormalizer, 없으면 원래 값)
+        self.normalizer = normalizer
+
+        # out 없이 _get_state를 부르면 쓰는 관측값 버퍼 (다음 호출에서 덮어씀)
+        self.observation = np.zeros((self.num_envs, self.num_users * 4), dtype=np.float32)
+
+        # 모든 상태는 고정된 모양의 배열 블록 세 개에 들어있고, 아래 속성들은 그 블록의 뷰
+        # (snapshot/restore/clone은 블록만 복사하면 됨)
+        shape = (self.num_envs, self.num_users)
+        self.float_state = np.zeros((len(self.FLOAT_FIELDS),) + shape)
+        self.int_state = np.zeros((len(self.INT_FIELDS),) + shape, dtype=np.int64)
+        self.env_state = np.zeros((len(self.ENV_FIELDS), self.num_envs), dtype=np.int64)
+        self._bind_state()
+
+        # 관측값은 만들지 않음 (정규화 통계에 들어가지 않도록)
+        self.reset_envs(np.ones(self.num_envs, dtype=bool))
+
+    def _bind_state(self):
+        for index, field in enumerate(self.FLOAT_FIELDS):
+            setattr(self, field, self.float_state[index])
+        for index, field in enumerate(self.INT_FIELDS):
+            setattr(self, field, self.int_state[index])
+        for index, field in enumerate(self.ENV_FIELDS):
+            setattr(self, field, self.env_state[index])
+        self.play_wait = PlaybackBuffer(self.play_head.shape, self.buffer_capacity, head=self.play_head, size=self.play_size)
+
+    # 현재 상태의 복사본 (상태 블록 + 채널의 난수/배치 상태)
+    def snapshot(self):
+        return self.float_state.copy(), self.int_state.copy(), self.env_state.copy(), self.channel.snapshot()
+
+    # snapshot 시점으로 되돌림 (같은 액션을 주면 같은 결과가 다시 나옴)
+    def restore(self, snapshot):
+        float_state, int_state, env_state, channel_state = snapshot
+        np.copyto(self.float_state, float_state)
+        np.copyto(self.int_state, int_state)
+        np.copyto(self.env_state, env_state)
+        self.channel.restore(channel_state)
+
+    # 현재 상태에서 갈라지는 독립된 엔진 (트레이서는 공유하고, 기록기는 붙이지 않고, 정규화 통계는 고정된 복사본)
+    def clone(self):
+        other = copy.copy(self)
+        other.float_state = self.float_state.copy()
+        other.int_state = self.int_state.copy()
+        other.env_state = self.env_state.copy()
+        other._bind_state()
+        other.channel = self.channel.clone()
+        other.recorder = None
+        other.normalizer = self.normalizer.clone() if self.normalizer is not None else None
+        other.observation = np.zeros_like(self.observation)
+        return other
+
+    def reset(self):
+        self.reset_envs(np.ones(self.num_envs, dtype=bool))
+        observation = self._get_state()
+
+        return observation[0] if self.num_envs == 1 else observation
+
+    # 선택한 환경만 초기화 (envs: 환경별 bool 마스크 또는 인덱스)
+    def reset_envs(self, envs):
+        self.episode[envs] += self.time_step[envs] > 0
+        if self.population is None:
+            self.remaining_data[envs] = self.data_availability
+            self.quality_cap[envs] = len(self.ladder) - 1
+        else:
+            self._draw_users(envs)
+        self.videobuffer[envs] = 0
+        self.current_chunk_num[envs] = 0
+        self.remaining_chunk[envs] = self.max_chunk_num
+        self.play_wait.reset(envs)
+
+        self.download_sum[envs] = 1
+        self.download_floor_sum[envs] = 0
+
+        for values in (self.last_quality, self.prev_quality, self.last_quality_number, self.prev_quality_number,
+                       self.last_kbps, self.last_buffer, self.prev_buffer, self.last_DR, self.last_distance,
+                       self.last_buffer_off_time, self.last_rebuffering_time, self.qoe_sum, self.qoe_count, self.last_qoe):
+            values[envs] = 0
+
+        self.time_step[envs] = 0
+        self.channel.reset(envs)
+
+    # 선택한 환경의 사용자를 모집단에서 뽑음 (사용자 번호는 (에피소드, 환경, 사용자)로 정해지므로 스냅샷에 따로 담을 필요 없음)
+    def _draw_users(self, envs):
+        env = np.arange(self.num_envs)[envs]
+        users = self.population.take(user_ids(self.episode[env], env, self.num_envs, self.num_users))
+        self.remaining_data[env] = users['data_availability']
+        self.quality_cap[env] = quality_cap(self.ladder, users['max_quality'])
+        placement = getattr(self.channel, 'placement', None)
+        if hasattr(placement, 'assign'):
+            placement.allocate((self.num_envs, self.num_users))
+            placement.assign(env, users['distance'])
+
+    # Data Rate 계산 (mask에 해당하는 모든 사용자를 한 번에, Kbps)
+    def calculate_user_data_rate(self, bandwidth, power, mask):
+        data_rate, distance = self.channel.sample(bandwidth, power, mask)
+        self.last_distance[mask] = distance
+
+        return data_rate
+
+    # Kbps -> 화질(p)로 치환
+    def transmit_qualities(self, rate):
+        return self.ladder.rate_quality(rate)
+
+    def calculate_download_chunk(self, user_dr, quality_kbps, mask):
+        chunk_size = quality_kbps * self.chunk_length
+        download_in_step = user_dr * self.chunk_length
+        Number_of_pdchunk = round1(download_in_step / chunk_size)
+
+        remaining_chunk = self.remaining_chunk[mask]
+        finished = Number_of_pdchunk >= remaining_chunk
+        Number_of_pdchunk = np.where(finished, round1(remaining_chunk), Number_of_pdchunk)
+        self.remaining_chunk[mask] = np.where(finished, 0, round1(remaining_chunk - Number_of_pdchunk))
+
+        return Number_of_pdchunk, chunk_size
+
+    def calculate_qoe(self):
+        mask = self.current_chunk_num < self.max_chunk_num + 1
+
+        current_quality = self.last_quality[mask]
+        quality_diff = -np.abs(self.prev_quality_number[mask] - self.last_quality_number[mask])
+        buffer_diff = self.prev_buffer[mask] - self.last_buffer[mask]
+
+        data_availability = self.remaining_data[mask]
+        low = 0.4 * data_availability
+
+        user_dr = self.last_DR[mask]
+        transmit_user_dr = self.transmit_qualities(user_dr)
+
+        # 딕셔너리 버전과 같이 penalty는 환경 안에서 사용자 순서대로 누적됨
+        user_penalty = np.zeros(mask.shape, dtype=np.int64)
+        user_penalty[mask] = (-1000 * ((data_availability > low) & (transmit_user_dr < current_quality))
+                              - 1000 * (data_availability < low))
+        penalty = np.cumsum(user_penalty, axis=1)[mask]
+        done = np.any(user_penalty, axis=1)
+
+        quality_loss = -np.abs(user_dr - self.last_kbps[mask])
+
+        qoe = current_quality + user_dr + quality_diff + buffer_diff + quality_loss
+        latency = -(self.last_buffer_off_time[mask] + self.last_rebuffering_time[mask])
+
+        QoE = qoe + latency + penalty
+
+        self.last_qoe[mask] = QoE
+        self.qoe_sum[mask] += QoE
+        self.qoe_count[mask] += 1
+
+        self.current_chunk_num[mask & (self.current_chunk_num == self.max_chunk_num)] += 1
+
+        return done
+
+    # 한 에피소드당 모든 유저의 reward 계산 (환경별)
+    def calculate_reward(self):
+        total_qoe = np.cumsum(self.qoe_sum, axis=1)[:, -1]
+        total_time_step = self.qoe_count.sum(axis=1)
+
+        return total_qoe / np.maximum(total_time_step, 1)
+
+    def step(self, action):
+        observation, reward, done = self.step_batch(np.asarray(action).reshape((self.num_envs, -1)))
+
+        if self.num_envs == 1:
+            return observation[0], reward[0].item(), bool(done[0]), {}
+        return observation, reward, done, [{} for _ in range(self.num_envs)]
+
+    # actions: (환경 수, 사용자 수 * 3), 자동 초기화는 하지 않음
+    def step_batch(self, actions, out=None):
+        profiler = self.profiler
+        if profiler.enabled:
+            step_start = start = profiler.start()
+        action_dim_per_user = 3
+        reshape_action = np.asarray(actions).reshape((self.num_envs, self.num_users, action_dim_per_user))
+        time_step = np.broadcast_to(self.time_step[:, None], (self.num_envs, self.num_users))
+
+        # 대역폭과 전력의 총합 계산 (딕셔너리 버전과 같은 순서로 더하기 위해 cumsum 사용)
+        bandwidth_weight = 0.1 * reshape_action[..., 0] + 0.05
+        power_weight = 0.1 * reshape_action[..., 1] + 0.05
+        sum_bandwidth = np.cumsum(bandwidth_weight, axis=1)[:, -1:]
+        sum_power = np.cumsum(power_weight, axis=1)[:, -1:]
+
+        # 청크를 모두 다운로드 받은 사용자는 다운로딩 스킵
+        mask = self.current_chunk_num < self.max_chunk_num
+        done_user = self.num_users - np.count_nonzero(mask, axis=1)
+
+        # 큐에 5개 이상의 청크가 차 있으면 재생 시작 (한 청크씩 재생)
+        playing = mask & (self.videobuffer != 0) & (self.play_wait.size >= 5)
+        self.play_wait.get_batch(playing)
+        self.videobuffer[playing] -= self.chunk_length
+
+        # 대역폭, 전력, 화질 할당
+        bandwidth = (bandwidth_weight / sum_bandwidth)[mask]
+        power = (power_weight / sum_power)[mask]
+        action_chunk_quality = reshape_action[..., 2][mask]
+        if self.population is not None:
+            action_chunk_quality = np.minimum(action_chunk_quality, self.quality_cap[mask])
+        chunk_quality = self.ladder.action_quality(action_chunk_quality)
+        quality_kbps = self.ladder.action_kbps(action_chunk_quality)
+
+        self.prev_quality[mask] = self.last_quality[mask]
+        self.prev_quality_number[mask] = self.last_quality_number[mask]
+        self.last_quality[mask] = chunk_quality
+        self.last_quality_number[mask] = self.ladder.quality_number(chunk_quality)
+        self.last_kbps[mask] = quality_kbps
+
+        # 사용자의 Data Rate 계산
+        user_dr = np.floor(self.calculate_user_data_rate(bandwidth, power, mask))
+        self.last_DR[mask] = user_dr
+        if profiler.enabled:
+            start = profiler.lap('data_rate', start)
+
+        # 청크 다운로드
+        Number_of_pdchunk, chunk_size = self.calculate_download_chunk(user_dr, quality_kbps, mask)
+
+        # 현 스텝에서 큐에 넣을 청크 개수 계산
+        download_sum = self.download_sum[mask] + Number_of_pdchunk
+        self.download_sum[mask] = download_sum
+        put_queue = np.where(time_step[mask] == 0, np.floor(Number_of_pdchunk), np.rint(download_sum) - self.download_floor_sum[mask])
+        self.download_floor_sum[mask] += put_queue
+
+        transmit_mb = (Number_of_pdchunk * chunk_size) / 8000 # 다운로드 후 모바일 소진량
+        self.remaining_data[mask] -= transmit_mb
+
+        # 비디오 버퍼에 다운받은 만큼 재생 시간 추가
+        videobuffer = self.videobuffer[mask] + self.chunk_length * Number_of_pdchunk
+        self.videobuffer[mask] = videobuffer
+        self.prev_buffer[mask] = self.last_buffer[mask]
+        self.last_buffer[mask] = videobuffer
+
+        # buffer off time과 rebuffering time 계산
+        empty = videobuffer == 0
+        buffer_off_time = np.maximum(np.maximum(videobuffer - self.chunk_length, 0) + self.chunk_length - self.buffer_capacity, 0)
+        self.last_buffer_off_time[mask] = np.where(empty | (time_step[mask] == 0), buffer_off_time, 0)
+        self.last_rebuffering_time[mask] = np.where(empty, np.maximum(self.chunk_length - videobuffer, 0), 0)
+
+        if self.tracer.step:
+            env, user = np.nonzero(mask)
+            self.tracer.record_batch(time_step[mask], user, user_dr, chunk_quality, videobuffer,
+                                     self.last_rebuffering_time[mask], self.remaining_data[mask], env=env)
+
+        # 큐에 다운받은 청크 개수만큼 청크 추가
+        put_queue = np.maximum(put_queue, 0).astype(np.int64)
+        self.play_wait.put_batch(mask, self.current_chunk_num[mask] + 1, put_queue)
+        self.current_chunk_num[mask] += put_queue
+
+        qoe_mask = self.current_chunk_num < self.max_chunk_num + 1 # calculate_qoe에서 QoE를 계산하는 사용자
+        if profiler.enabled:
+            start = profiler.lap('download', start)
+        done = self.calculate_qoe()
+        if profiler.enabled:
+            profiler.lap('qoe', start)
+
+        if self.recorder is not None:
+            env, user = np.nonzero(qoe_mask)
+            self.recorder.record_batch(self.episode[env], env, time_step[qoe_mask], user, self.last_DR[qoe_mask],
+                                       self.last_quality[qoe_mask], self.last_buffer[qoe_mask], self.last_rebuffering_time[qoe_mask],
+                                       self.remaining_data[qoe_mask], self.last_qoe[qoe_mask])
+
+        # 모든 사용자의 다운로드가 한번씩 끝났으면 타임 스텝 추가
+        self.time_step += 1
+
+        # 페널티로 끝난 환경은 -100, 모든 사용자가 끝난 환경은 에피소드 reward
+        finished = ~done & (done_user == self.num_users)
+        reward = np.where(done, -100.0, np.where(finished, self.calculate_reward(), 0.0))
+
+        if self.tracer.step and (done.any() or finished.any()):
+            self.tracer.end_episode()
+
+        observation = self._get_state(out)
+        if profiler.enabled:
+            profiler.lap('step', step_start)
+        return observation, reward, done | finished
+
+    # 관측값: 사용자별 [이전 화질, 이전 버퍼, 잔여 데이터, 거리]
+    # out (환경 수, 4 * 사용자 수, 보통 float32)이 주어지면 그 버퍼에, 없으면 self.observation에 바로 기록
+    # normalizer가 있으면 같은 버퍼에서 통계를 갱신하고 제자리 정규화
+    # envs (환경 수,) bool 배열이 주어지면 그 행만 다시 채우고 정규화 (자동 초기화 후 나머지 행의 통계가 두 번 반영되지 않도록)
+    def _get_state(self, out=None, envs=None):
+        if self.profiler.enabled:
+            start = self.profiler.start()
+        if out is None:
+            out = self.observation
+        index = Ellipsis if envs is None else envs
+        rows = out if envs is None else out[envs]
+        obs = rows.reshape((-1, self.num_users, 4))
+
+        obs[..., 0] = self.last_quality[index]
+        obs[..., 1] = self.last_buffer[index]
+        obs[..., 2] = self.remaining_data[index]
+        obs[..., 3] = self.last_distance[index]
+        obs[self.current_chunk_num[index] >= self.max_chunk_num] = 0
+
+        if self.normalizer is not None:
+            self.normalizer(rows)
+        if envs is not None:
+            out[envs] = rows
+        if self.profiler.enabled:
+            self.profiler.lap('state', start)
+        return out
@@ -1,10 +1,16 @@
-import random
+import copy
 import numpy as np
 import math
-from queue import Queue
+from playback_buffer import PlaybackBuffer
+from step_trace import StepTracer
+from profiler import get_profiler
+from history import StepHistory
+from bitrate_ladder import DEFAULT_LADDER
+from channel import ChannelSampler, CounterDiscPlacement
+from population import PopulationPlacement, quality_cap, user_ids
 
 class VideoStreaming:
-    def __init__(self, max_chunk_num, num_users, data_availability):
+    def __init__(self, max_chunk_num, num_users, data_availability, tracer=None, ladder=None, channel=None, seed=None, recorder=None, normalizer=None, profiler=None, population=None):
         # BS의 위치
         self.BS_X = 0
         self.BS_Y = 0
@@ -15,178 +21,158 @@ class VideoStreaming:
         self.num_users = num_users # 사용자의 수
         
         self.data_availability = data_availability
+        self.ladder = ladder if ladder is not None else DEFAULT_LADDER # 화질/비트레이트 테이블
+        
+        # 사용자 모집단 (population.Population, 있으면 에피소드마다 데이터 가용량/거리/단말 화질 제한을 새 사용자로 뽑음)
+        self.population = population
+        
+        # 사용자 위치와 Data Rate를 계산하는 채널 (기본값은 BS 중심 1km 원 안 균일 배치 + 경로 손실 모델)
+        # 모집단이 있으면 기본 배치는 모집단의 거리를 쓰는 PopulationPlacement
+        if channel is None:
+            placement = PopulationPlacement(self.BS_X, self.BS_Y) if population is not None else CounterDiscPlacement(1000, self.BS_X, self.BS_Y)
+            channel = ChannelSampler(placement, seed=seed)
+        self.channel = channel
+        
+        # 디버그 출력과 스텝별 레코드 (기본값은 환경 변수 STREAMING_TRACE로 설정, 꺼져 있으면 비용 없음)
+        self.tracer = tracer if tracer is not None else StepTracer.from_env()
+        
+        # 스텝별 사용자 레코드를 디스크에 남기는 기록기 (recorder.EpisodeRecorder, 없으면 기록하지 않음)
+        self.recorder = recorder
+        
+        # 구간별 시간 계측 (기본값은 환경 변수 STREAMING_PROFILE로 설정, 꺼져 있으면 비용 없음)
+        self.profiler = profiler if profiler is not None else get_profiler()
+        
+        # 관측값 이동 평균/분산 정규화 (obs_normalizer.ObservationNormalizer, 없으면 원래 값)
+        self.normalizer = normalizer
+        
+        # out 없이 _get_state를 부르면 쓰는 관측값 버퍼 (step/reset이 돌려주는 배열)
+        self.observation = np.zeros(self.num_users * 4, dtype=np.float32)
         
         self.time_step = 0 # 타임 스텝 카운트를 위한 변수
+        self.episode = 0 # 에피소드 번호
         self.users = {} # 사용자의 정보가 담긴 딕셔너리
         
+        # 타임스텝별 기록 (청크 개수 기준으로 미리 할당, 필요하면 늘어남)
+        self.history = StepHistory(self.num_users, [
+            'user_bandwidth', # 타임스텝별 할당된 대역폭
+            'user_power', # 타임스텝별 할당된 전력
+            'user_DR', # 타임스텝별 사용자의 data rate
+            'user_distance', # 타임스텝별 사용자와 BS 사이의 거리
+            'video_quality', # 타임스텝별 할당된 청크의 화질
+            'buffer', # 타임스텝별 사용자의 버퍼량 (재생 시간 기준)
+            'rebuffering_time', # 타임스텝별 사용자의 리버퍼링 시간
+            'buffer_off_time', # 타임스텝별 사용자의 버퍼 오프 시간
+            'monitor_data_availability', # 타임스텝별 사용자의 잔여 데이터 가용량
+            'step_per_qoe', # 타임스텝별 사용자의 qoe
+            'step_per_download', # 타임스텝별 사용자의 다운로드된 청크 개수
+            'step_per_download_floor', # 타임스텝별 큐에 넣은 청크 개수
+        ], capacity=2 * (self.max_chunk_num + 1))
+        
+        self.play_wait = PlaybackBuffer(self.num_users, self.buffer_capacity) # 사용자의 청크 재생을 위한 버퍼 (청크 번호 기준)
+        
         for i in range(self.num_users):
             self.users[i] = {
                 'data_availability': self.data_availability, # 데이터 가용량
-                'user_bandwidth': [], # 타임스텝별 할당된 대역폭을 담을 리스트
-                'user_power': [], # 타임스텝별 할당된 전력을 담을 리스트
-                'user_DR': [], # 타임스텝별 사용자의 data rate를 담을 리스트
-                'user_distance': [], # 타임스텝별 사용자와 BS 사이의 거리를 담을 리스트
-                'video_quality': [], # 타임스텝별 할당된 청크의 화질을 담을 리스트
-                'buffer': [], # 타임스텝별 사용자의 버퍼량을 담을 리스트 (재생 시간 기준)
-                'rebuffering_time': [], # 타임스텝별 사용자의 리버퍼링 시간을 담을 리스트
-                'buffer_off_time': [], # 타임스텝별 사용자의 버퍼 오프 시간을 담을 리스트
-                'monitor_data_availability': [], # 타임스텝별 사용자의 잔여 데이터 가용량을 담을 리스트
-                'step_per_qoe': [], # 타임스텝별 사용자의 qoe를 담을 리스트
-                'step_per_download': [], # 타임스텝별 사용자의 다운로드된 청크 개수를 담을 리스트 
-                'step_per_download_floor': [],
-                'play_wait': Queue(self.buffer_capacity), # 사용자의 청크 재생을 위한 버퍼 (청크 번호 기준)
                 'videobuffer': 0, # 타임스텝별 사용자의 버퍼량을 계산하기 위한 변수
                 'current_chunk_num': 0, # 현재 타임스텝의 다운로드 받아야 할 청크 넘버를 알기 위한 변수
                 'remaining_chunk': self.max_chunk_num, # 남은 청크 갯수를 알기 위한 변수
+                'download_sum': 1, # sum(step_per_download, 1)의 누적값
+                'download_floor_sum': 0, # sum(step_per_download_floor)의 누적값
+                'qoe_sum': 0, # sum(step_per_qoe)의 누적값
+                'quality_cap': len(self.ladder) - 1, # 단말이 재생할 수 있는 가장 높은 화질 액션 넘버
             }
     
+    # 현재 상태의 복사본 (사용자 정보, 기록, 재생 대기열, 채널의 난수/배치 상태)
+    def snapshot(self):
+        return ([dict(self.users[i]) for i in range(self.num_users)], self.history.snapshot(),
+                self.play_wait.snapshot(), self.time_step, self.episode, self.channel.snapshot())
+    
+    # snapshot 시점으로 되돌림 (같은 액션을 주면 같은 결과가 다시 나옴)
+    def restore(self, snapshot):
+        users, history, play_wait, self.time_step, self.episode, channel_state = snapshot
+        for i in range(self.num_users):
+            self.users[i].update(users[i])
+        self.history.restore(history)
+        self.play_wait.restore(play_wait)
+        self.channel.restore(channel_state)
+    
+    # 현재 상태에서 갈라지는 독립된 환경 (트레이서는 공유하고, 기록기는 붙이지 않고, 정규화 통계는 고정된 복사본)
+    def clone(self):
+        other = copy.copy(self)
+        other.users = {i: dict(user) for i, user in self.users.items()}
+        other.history = self.history.clone()
+        other.play_wait = PlaybackBuffer(self.num_users, self.buffer_capacity,
+                                         head=self.play_wait.head.copy(), size=self.play_wait.size.copy())
+        other.channel = self.channel.clone()
+        other.recorder = None
+        other.normalizer = self.normalizer.clone() if self.normalizer is not None else None
+        other.observation = np.zeros_like(self.observation)
+        return other
+    
     def reset(self):
+        if self.time_step > 0:
+            self.episode += 1
+        self.play_wait.reset()
+        if self.population is not None:
+            self._draw_users()
+        
         for i in range(self.num_users):
-            while not self.users[i]['play_wait'].empty():
-                self.users[i]['play_wait'].get()
-                
-            self.users[i]['data_availability'] = self.data_availability
-            self.users[i]['user_bandwidth'] = []
-            self.users[i]['user_power'] = []
-            self.users[i]['user_DR'] = []
-            self.users[i]['user_distance'] = []
-            self.users[i]['video_quality'] = []
-            self.users[i]['buffer'] = []
-            self.users[i]['rebuffering_time'] = []
-            self.users[i]['buffer_off_time'] = []
-            self.users[i]['monitor_data_availability'] = []
-            self.users[i]['step_per_qoe'] = []
-            self.users[i]['step_per_download'] = []
-            self.users[i]['step_per_download_floor'] = []
+            if self.population is None:
+                self.users[i]['data_availability'] = self.data_availability
             self.users[i]['videobuffer'] = 0
             self.users[i]['current_chunk_num'] = 0
             self.users[i]['remaining_chunk'] = self.max_chunk_num
+            self.users[i]['download_sum'] = 1
+            self.users[i]['download_floor_sum'] = 0
+            self.users[i]['qoe_sum'] = 0
             
-            self.users[i]['monitor_data_availability'].append(self.users[i]['data_availability'])
+        # 기록은 인덱스만 되돌림
+        self.history.reset()
+        for i in range(self.num_users):
+            self.history.append('monitor_data_availability', i, self.users[i]['data_availability'])
             
         self.time_step = 0
+        self.channel.reset()
         
         return self._get_state()
     
-    # 유저의 위치 설정 (BS와의 거리 계산)        
-    def reset_user_location(self, current_user):
-        theta = random.uniform(0, 2 * math.pi)
-        r = random.uniform(0, 1000) # 1km의 거리 가정
-        
-        user_x = r * math.cos(theta)
-        user_y = r * math.sin(theta)
-        
-        distance = math.sqrt((self.BS_X - user_x)**2 + (self.BS_Y - user_y)**2)
-        self.users[current_user]['user_distance'].append(distance)
-        
-        return distance
+    # 이번 에피소드의 사용자를 모집단에서 뽑음 (VectorizedVideoStreaming의 환경 0과 같은 사용자 번호)
+    def _draw_users(self):
+        users = self.population.take(user_ids(self.episode, 0, 1, self.num_users))
+        caps = quality_cap(self.ladder, users['max_quality'])
+        for i in range(self.num_users):
+            self.users[i]['data_availability'] = users['data_availability'][i].item()
+            self.users[i]['quality_cap'] = caps[i].item()
+        placement = getattr(self.channel, 'placement', None)
+        if hasattr(placement, 'assign'):
+            placement.allocate((self.num_users,))
+            placement.assign(Ellipsis, users['distance'])
     
-    # Data Rate 계산
-    def calculate_user_data_rate(self, bandwidth, power, current_user):
-        distance = self.reset_user_location(current_user)
-        
-        g0 = -50 # db
-        n0 = -174 # dBm
-        θ = 2
-        
-        transmit_g0 = self.transmit_mW(g0)
-        transmit_n0 = self.transmit_mW(n0)
-        
-        channel_gain = transmit_g0 / (distance**θ) # dBm
-        transmit_channel_gain = self.transmit_mW(channel_gain)
+    # Data Rate 계산 (mask에 해당하는 모든 사용자를 한 번에, Kbps)
+    def calculate_user_data_rate(self, bandwidth, power, mask):
+        data_rate, distance = self.channel.sample(bandwidth, power, mask)
         
-        data_rate = bandwidth * (math.log2((1 + power * transmit_channel_gain / transmit_n0))) # Mbps
-        transmit_data_rate = data_rate * 1000 # Kbps
+        if self.tracer.debug:
+            for i, user_distance in zip(np.flatnonzero(mask), distance):
+                print(f"User{i} distance is {user_distance}m")
         
-        print(f"User{current_user} distance is {distance}m")
-        
-        return transmit_data_rate
-        
-    # mW 단위 변경
-    def transmit_mW(self, value):
-        transmit_value = 10 ** (value / 10)
-        
-        return transmit_value
+        return data_rate, distance
     
     # Kbps -> 화질(p)로 치환
     def transmit_qualities(self, quality):
-        transmit_quality = None
-        if 300 <= quality <= 400 or quality < 300:
-            transmit_quality = 240
-        elif 400 < quality <= 1000:
-            transmit_quality = 360
-        elif 1000 < quality <= 2000:
-            transmit_quality = 480
-        elif 2000 < quality <= 4000:
-            transmit_quality = 720
-        elif 4000 < quality <= 6000:
-            transmit_quality = 1080
-        elif 6000 < quality <= 13000 or quality > 13000:
-            transmit_quality = 1440
-        
-        return transmit_quality
+        return self.ladder.rate_quality(quality)
     
     # 액션으로 받은 화질 넘버 -> 실제 화질(p)로 치환            
     def transmit_action_quality(self, action_quality):
-        real_quality = None
-        if action_quality == 0:
-            real_quality = 240
-        elif action_quality == 1:
-            real_quality = 360
-        elif action_quality == 2:
-            real_quality = 480
-        elif action_quality == 3:
-            real_quality = 720
-        elif action_quality == 4:
-            real_quality = 1080
-        else:
-            real_quality = 1440
-            
-        return real_quality
+        return self.ladder.action_quality(action_quality)
     
     # 액션으로 받은 화질 -> kbps로 치환
     def transmit_action_kbps(self, quality):
-        transmit_kbps = None
-        if quality == 240:
-            # transmit_kbps = random.randint(300, 700)
-            transmit_kbps = 700
-        elif quality == 360:
-            # transmit_kbps = random.randint(701, 1000)
-            transmit_kbps = 1000
-        elif quality == 480:
-            # transmit_kbps = random.randint(1001, 2000)
-            transmit_kbps = 2000
-        elif quality == 720:
-            # transmit_kbps = random.randint(2001, 4000)
-            transmit_kbps = 4000
-        elif quality == 1080:
-            # transmit_kbps = random.randint(4001, 6000)
-            transmit_kbps = 6000
-        else:
-            # transmit_kbps = random.randint(6001, 13000)
-            transmit_kbps = 13000
-            
-        return transmit_kbps
+        return self.ladder.quality_kbps(quality)
     
     # 화질 -> 숫자로 치환
     def transmit_quality_number(self, quality):
-        transmit_number = None
-        if quality == 240:
-            transmit_number = 1
-        elif quality == 360:
-            transmit_number = 2
-        elif quality == 480:
-            transmit_number = 3
-        elif quality == 720:
-            transmit_number = 4
-        elif quality == 1080:
-            transmit_number = 5
-        elif quality == 1440:
-            transmit_number = 6
-        else:
-            transmit_number = 0
-            
-        return transmit_number
+        return self.ladder.quality_number(quality)
     
     def calculate_download_chunk(self, user_dr, chunk_quality, current_user):
         chunk_size = chunk_quality * self.chunk_length # 할당된 화질을 가지고 계산하는 청크 하나당 사이즈
@@ -203,9 +189,11 @@ class VideoStreaming:
             self.users[current_user]['remaining_chunk'] = remaining_chunk
             
             
-        self.users[current_user]['step_per_download'].append(Number_of_pdchunk) # 스텝별 현재 다운로드량
+        self.history.append('step_per_download', current_user, Number_of_pdchunk) # 스텝별 현재 다운로드량
+        self.users[current_user]['download_sum'] += Number_of_pdchunk
         
-        print(f"다운 가능한 청크 양: {Number_of_pdchunk}")
+        if self.tracer.debug:
+            print(f"다운 가능한 청크 양: {Number_of_pdchunk}")
             
         return Number_of_pdchunk, chunk_size
     
@@ -216,32 +204,34 @@ class VideoStreaming:
         
         for i in range(self.num_users):
             if self.users[i]['current_chunk_num'] >= self.max_chunk_num + 1:
-                print(f"User{i} has downloaded all chunks. Skipping reward calculation...")
+                if self.tracer.debug:
+                    print(f"User{i} has downloaded all chunks. Skipping reward calculation...")
                 continue
 
-            print(f"current calculation user is User{i}")
-            print(f"current time step is {self.time_step}")
+            if self.tracer.debug:
+                print(f"current calculation user is User{i}")
+                print(f"current time step is {self.time_step}")
             
             active_users += 1
             
-            current_quality = self.users[i]['video_quality'][self.time_step]
-            prev_quality = self.users[i]['video_quality'][self.time_step - 1] if self.time_step > 0 else 0
+            current_quality = self.history.get('video_quality', i, self.time_step)
+            prev_quality = self.history.get('video_quality', i, self.time_step - 1) if self.time_step > 0 else 0
             
             current_quality_number = self.transmit_quality_number(current_quality)
             prev_quality_number = self.transmit_quality_number(prev_quality)
             
             transmit_quality_kbps = self.transmit_action_kbps(current_quality)
             
-            current_buffer = self.users[i]['buffer'][self.time_step]
-            prev_buffer = self.users[i]['buffer'][self.time_step - 1] if self.time_step > 0 else 0
+            current_buffer = self.history.get('buffer', i, self.time_step)
+            prev_buffer = self.history.get('buffer', i, self.time_step - 1) if self.time_step > 0 else 0
             
-            buffer_off_time = self.users[i]['buffer_off_time'][self.time_step]
-            rebuffering_time = self.users[i]['rebuffering_time'][self.time_step]
-            data_availability = self.users[i]['monitor_data_availability'][-1]
+            buffer_off_time = self.history.get('buffer_off_time', i, self.time_step)
+            rebuffering_time = self.history.get('rebuffering_time', i, self.time_step)
+            data_availability = self.history.last('monitor_data_availability', i)
             
             low = 0.4 * data_availability
             
-            user_dr = self.users[i]['user_DR'][self.time_step]
+            user_dr = self.history.get('user_DR', i, self.time_step)
             transmit_user_dr = self.transmit_qualities(user_dr)
             
             quality_diff = -abs(prev_quality_number - current_quality_number)
@@ -267,12 +257,17 @@ class VideoStreaming:
             
             QoE = qoe + latency +penalty
             
-            self.users[i]['step_per_qoe'].append(QoE)
+            self.history.append('step_per_qoe', i, QoE)
+            if self.recorder is not None:
+                self.recorder.record(self.episode, 0, self.time_step, i, user_dr, current_quality, current_buffer,
+                                     rebuffering_time, data_availability, QoE)
+            self.users[i]['qoe_sum'] += QoE
             
             if self.users[i]['current_chunk_num'] == self.max_chunk_num:
                 self.users[i]['current_chunk_num'] += 1
             
-            print(f"User{i} QoE: {QoE}")
+            if self.tracer.debug:
+                print(f"User{i} QoE: {QoE}")
     
         return done
     
@@ -282,23 +277,29 @@ class VideoStreaming:
         total_time_step = 0
         
         for i in range(self.num_users):
-            total_qoe += sum(self.users[i]['step_per_qoe'])
-            total_time_step += len(self.users[i]['step_per_qoe'])
-            print(f"User{i} total qoe: {sum(self.users[i]['step_per_qoe'])}")
-            print(f"User{i} total time step: {len(self.users[i]['step_per_qoe'])}")
+            total_qoe += self.users[i]['qoe_sum']
+            total_time_step += self.history.count('step_per_qoe', i)
+            if self.tracer.debug:
+                print(f"User{i} total qoe: {self.users[i]['qoe_sum']}")
+                print(f"User{i} total time step: {self.history.count('step_per_qoe', i)}")
             
         reward = total_qoe / total_time_step
         
-        print(f"episode per reward: {reward}")
+        if self.tracer.debug:
+            print(f"episode per reward: {reward}")
         
         return reward
     
     def step(self, action):
+        profiler = self.profiler
+        if profiler.enabled:
+            step_start = start = profiler.start()
         done_user = 0
         action_dim_per_user = 3
         sum_bandwidth = 0
         sum_power = 0
-        print(f"action: {action}")
+        if self.tracer.debug:
+            print(f"action: {action}")
         reshape_action = action.reshape((self.num_users, action_dim_per_user))
         
         # 대역폭과 전력의 총합 계산
@@ -307,135 +308,177 @@ class VideoStreaming:
             sum_bandwidth += 0.1 * action_bandwidth + 0.05
             sum_power += 0.1 * action_power + 0.05
             
-        print(f"sum_bandwidth: {sum_bandwidth}, sum_power: {sum_power}")
+        if self.tracer.debug:
+            print(f"sum_bandwidth: {sum_bandwidth}, sum_power: {sum_power}")
+        
+        # 다운로드할 사용자 전체의 Data Rate를 한 번에 계산
+        active = np.array([self.users[i]['current_chunk_num'] < self.max_chunk_num for i in range(self.num_users)])
+        user_rates, user_distances = self.calculate_user_data_rate((0.1 * reshape_action[active, 0] + 0.05) / sum_bandwidth,
+                                                                   (0.1 * reshape_action[active, 1] + 0.05) / sum_power, active)
+        if profiler.enabled:
+            start = profiler.lap('data_rate', start)
+        k = 0
         
         for i in range(self.num_users):
             # 청크를 모두 다운로드 받은 사용자는 다운로딩 스킵
             if self.users[i]['current_chunk_num'] >= self.max_chunk_num:
-                print(f"User{i} has downloaded all chunks, Skipping...")
+                if self.tracer.debug:
+                    print(f"User{i} has downloaded all chunks, Skipping...")
                 done_user += 1
-                print(f"done user: {done_user}")
+                if self.tracer.debug:
+                    print(f"done user: {done_user}")
                 continue
             
             # 큐에 5개 이상의 청크가 차 있으면 재생 시작 (한 청크씩 재생)
             if self.users[i]['videobuffer']:
-                if self.users[i]['play_wait'].qsize() >= 5:
-                    current_chunk = self.users[i]['play_wait'].get()
+                if self.play_wait.qsize(i) >= 5:
+                    current_chunk = self.play_wait.get(i)
                     self.users[i]['videobuffer'] -= self.chunk_length
-                    print(f"User{i} Chunk[{current_chunk}] is Playing...")
+                    if self.tracer.debug:
+                        print(f"User{i} Chunk[{current_chunk}] is Playing...")
                     
             # 대역폭, 전력, 화질 할당
             user_action = reshape_action[i]
             action_bandwidth, action_power, action_chunk_quality = user_action
             bandwidth = (0.1 * action_bandwidth + 0.05) / sum_bandwidth
             power = (0.1 * action_power + 0.05) / sum_power
+            if self.population is not None:
+                action_chunk_quality = min(action_chunk_quality, self.users[i]['quality_cap'])
             chunk_quality = self.transmit_action_quality(action_chunk_quality)
             quality_kbps = self.transmit_action_kbps(chunk_quality)
             
-            self.users[i]['video_quality'].append(chunk_quality)
+            self.history.append('user_bandwidth', i, bandwidth)
+            self.history.append('user_power', i, power)
+            self.history.append('video_quality', i, chunk_quality)
             
-            # 사용자의 Data Rate 계산
-            user_dr = math.floor(self.calculate_user_data_rate(bandwidth, power, i))
-            self.users[i]['user_DR'].append(user_dr)
+            # 사용자의 Data Rate
+            user_dr = math.floor(user_rates[k])
+            self.history.append('user_DR', i, user_dr)
+            self.history.append('user_distance', i, user_distances[k])
+            k += 1
             
-            print(f"User{i} bandwidth: {bandwidth}, power: {power}")
-            print(f"User{i} DR: {user_dr}, Video Quality: {quality_kbps}Kbps, {chunk_quality}p")
+            if self.tracer.debug:
+                print(f"User{i} bandwidth: {bandwidth}, power: {power}")
+                print(f"User{i} DR: {user_dr}, Video Quality: {quality_kbps}Kbps, {chunk_quality}p")
             
             # 청크 다운로드 시작
-            print(f"User{i} Download Start, Remaining Chunk: {self.users[i]['remaining_chunk']}")
+            if self.tracer.debug:
+                print(f"User{i} Download Start, Remaining Chunk: {self.users[i]['remaining_chunk']}")
             Number_of_pdchunk, chunk_size = self.calculate_download_chunk(user_dr, quality_kbps, i)
             
             # 현 스텝에서 큐에 넣을 청크 개수 계산
+            # (누적 합은 매 스텝 다시 더하지 않고 download_sum, download_floor_sum에 유지)
             if self.time_step == 0:
                 put_queue = math.floor(Number_of_pdchunk)
-                self.users[i]['step_per_download_floor'].append(put_queue)
             else:
-                put_queue = math.floor(round(sum(self.users[i]['step_per_download'],1)) - sum(self.users[i]['step_per_download_floor']))
-                print(f"sum 현재 다운로드: {sum(self.users[i]['step_per_download'])}, floor 다운로드: {sum(self.users[i]['step_per_download_floor'])}")
-                print(f"floor 다운로드: {self.users[i]['step_per_download_floor']}")
-                self.users[i]['step_per_download_floor'].append(put_queue)
+                put_queue = math.floor(round(self.users[i]['download_sum']) - self.users[i]['download_floor_sum'])
+                if self.tracer.debug:
+                    print(f"sum 현재 다운로드: {self.users[i]['download_sum'] - 1}, floor 다운로드: {self.users[i]['download_floor_sum']}")
+                    print(f"floor 다운로드: {self.history.values('step_per_download_floor', i).tolist()}")
+            self.history.append('step_per_download_floor', i, put_queue)
+            self.users[i]['download_floor_sum'] += put_queue
             
-            print(f"현재 다운로드: {self.users[i]['step_per_download']}")
+            if self.tracer.debug:
+                print(f"현재 다운로드: {self.history.values('step_per_download', i).tolist()}")
             
-            print(f"User{i} 현스텝 다운받은 청크개수: {Number_of_pdchunk}, 완전히 다운받은 청크개수: {put_queue}")
-            print(f"User{i}의 남은 청크개수: {self.users[i]['remaining_chunk']}")
-            print(f"User{i}의 현재 청크 번호: {self.users[i]['current_chunk_num']}")
+            if self.tracer.debug:
+                print(f"User{i} 현스텝 다운받은 청크개수: {Number_of_pdchunk}, 완전히 다운받은 청크개수: {put_queue}")
+                print(f"User{i}의 남은 청크개수: {self.users[i]['remaining_chunk']}")
+                print(f"User{i}의 현재 청크 번호: {self.users[i]['current_chunk_num']}")
             
             transmit_mb = (Number_of_pdchunk * chunk_size) / 8000 # 다운로드 후 모바일 소진량
-            self.users[i]['monitor_data_availability'].append(self.users[i]['monitor_data_availability'][-1] - transmit_mb)
-            print(f"User{i} Data Usage: {transmit_mb}MB, remaining data availability: {self.users[i]['monitor_data_availability'][-1]}")       
+            data_left = self.history.last('monitor_data_availability', i) - transmit_mb
+            self.history.append('monitor_data_availability', i, data_left)
+            if self.tracer.debug:
+                print(f"User{i} Data Usage: {transmit_mb}MB, remaining data availability: {data_left}")
             
             # 비디오 버퍼에 다운받은 만큼 재생 시간 추가
             self.users[i]['videobuffer'] += self.chunk_length * Number_of_pdchunk
-            self.users[i]['buffer'].append(self.users[i]['videobuffer'])
-            print(f"User{i} current buffer: {self.users[i]['videobuffer']}sec")
+            self.history.append('buffer', i, self.users[i]['videobuffer'])
+            if self.tracer.debug:
+                print(f"User{i} current buffer: {self.users[i]['videobuffer']}sec")
             
             # buffer off time과 rebuffering time 계산
             if self.users[i]['videobuffer'] == 0 or self.time_step == 0:
                 buffer_off_time = max(max((self.users[i]['videobuffer'] - self.chunk_length), 0) + self.chunk_length - self.buffer_capacity, 0)
             else:
                 buffer_off_time = 0
-            self.users[i]['buffer_off_time'].append(buffer_off_time)
+            self.history.append('buffer_off_time', i, buffer_off_time)
             
             if self.users[i]['videobuffer'] == 0:
                 rebuffering_time = max((self.chunk_length - self.users[i]['videobuffer']), 0)
             else:
                 rebuffering_time = 0
-            self.users[i]['rebuffering_time'].append(rebuffering_time)
+            self.history.append('rebuffering_time', i, rebuffering_time)
             
-            print(f"buffer off time: {buffer_off_time}, rebuffering time: {rebuffering_time}")
+            if self.tracer.debug:
+                print(f"buffer off time: {buffer_off_time}, rebuffering time: {rebuffering_time}")
+            if self.tracer.step:
+                self.tracer.record(self.time_step, i, user_dr, chunk_quality, self.users[i]['videobuffer'],
+                                   rebuffering_time, data_left)
             
             # 큐에 다운받은 청크 개수만큼 청크 추가
-            for j in range(put_queue):
-                self.users[i]['current_chunk_num'] += 1
-                self.users[i]['play_wait'].put(self.users[i]['current_chunk_num'])
-                print(f"User{i} Input Chunk: {self.users[i]['current_chunk_num']}")
+            if put_queue > 0:
+                first_chunk = self.users[i]['current_chunk_num'] + 1
+                self.users[i]['current_chunk_num'] += put_queue
+                self.play_wait.put_many(i, first_chunk, put_queue)
+                if self.tracer.debug:
+                    for chunk in range(first_chunk, self.users[i]['current_chunk_num'] + 1):
+                        print(f"User{i} Input Chunk: {chunk}")
                     
-        print(f"Current Time Step is {self.time_step}")
+        if self.tracer.debug:
+            print(f"Current Time Step is {self.time_step}")
         
+        if profiler.enabled:
+            start = profiler.lap('download', start)
         done = self.calculate_qoe()
+        if profiler.enabled:
+            profiler.lap('qoe', start)
         
         # 모든 사용자의 다운로드가 한번씩 끝났으면 타임 스텝 추가
         self.time_step += 1
         
         if done == True:
-            return self._get_state(), -100, done, {}
-        
-        if done_user == 3:
+            reward = -100
+            if self.tracer.step:
+                self.tracer.end_episode()
+        elif done_user == self.num_users:
             reward = self.calculate_reward()
-            return self._get_state(), reward, True, {}
-        return self._get_state(), 0, False, {}
-        
-    def _get_state(self):
-        obs = []
+            done = True
+            if self.tracer.step:
+                self.tracer.end_episode()
+        else:
+            reward = 0
+        
+        observation = self._get_state()
+        if profiler.enabled:
+            profiler.lap('step', step_start)
+        return observation, reward, done, {}
+        
+    # 관측값: 사용자별 [이전 화질, 이전 버퍼, 잔여 데이터, 거리] (다운로드를 끝낸 사용자는 0)
+    # out (4 * 사용자 수, 보통 float32)이 주어지면 그 버퍼에, 없으면 self.observation에 바로 기록 (다음 호출에서 덮어씀)
+    # normalizer가 있으면 같은 버퍼에서 통계를 갱신하고 제자리 정규화
+    def _get_state(self, out=None):
+        if self.profiler.enabled:
+            start = self.profiler.start()
+        if out is None:
+            out = self.observation
+        obs = out.reshape((self.num_users, 4))
+        t = self.time_step
         
         for i in range(self.num_users):
-            if self.users[i]['current_chunk_num'] < self.max_chunk_num:
-                if self.time_step == 0:
-                    prev_quality = 0
-                    prev_buffer = 0
-                    data_availability = self.users[i]['data_availability']
-                    user_distance = 0
-                else:
-                    prev_quality = self.users[i]['video_quality'][self.time_step - 1] if self.time_step > 0 else 0
-                    prev_buffer = self.users[i]['buffer'][self.time_step - 1] if self.time_step > 0 else 0
-                    data_availability = self.users[i]['monitor_data_availability'][-1]
-                    user_distance = self.users[i]['user_distance'][self.time_step - 1]
-                
-                user_state = [prev_quality, prev_buffer, data_availability, user_distance]
+            if self.users[i]['current_chunk_num'] >= self.max_chunk_num:
+                obs[i] = 0
+            elif t == 0:
+                obs[i] = (0, 0, self.users[i]['data_availability'], 0)
             else:
-                prev_quality = 0
-                prev_buffer = 0
-                data_availability = 0
-                user_distance = 0
-                
-                user_state = [prev_quality, prev_buffer, data_availability, user_distance]
+                obs[i] = (self.history.get('video_quality', i, t - 1), self.history.get('buffer', i, t - 1),
+                          self.history.last('monitor_data_availability', i), self.history.get('user_distance', i, t - 1))
                 
-            obs.extend(user_state)
-        print(obs)
-        return np.array(obs) 
-                
-
-            
-        
-        
+        if self.tracer.debug:
+            print(out.tolist())
+        if self.normalizer is not None:
+            self.normalizer(out)
+        if self.profiler.enabled:
+            self.profiler.lap('state', start)
+        return out